@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Dict, Sequence, Tuple
+from typing import Dict, List, Sequence, Tuple
 
 import torch
 from torch import nn
@@ -36,6 +36,8 @@ class SephoraDNN(nn.Module):
         embedding_sizes: Dict[str, Tuple[int, int]],
         numeric_dim: int,
         highlight_dim: int,
+        hidden_dim: int = 256,
+        num_blocks: int = 2,
     ) -> None:
         super().__init__()
         self.categorical_features = list(categorical_features)
@@ -56,7 +58,6 @@ class SephoraDNN(nn.Module):
         input_dim = total_embed_dim + numeric_dim + highlight_dim
 
         self.input_norm = nn.LayerNorm(input_dim)
-        hidden_dim = 256
         self.feature_proj = nn.Sequential(
             nn.Linear(input_dim, hidden_dim),
             nn.LayerNorm(hidden_dim),
@@ -64,7 +65,7 @@ class SephoraDNN(nn.Module):
         )
 
         self.blocks = nn.ModuleList(
-            [ResidualBlock(hidden_dim, hidden_dim * 2, dropout=0.3) for _ in range(2)]
+            [ResidualBlock(hidden_dim, hidden_dim * 2, dropout=0.3) for _ in range(num_blocks)]
         )
 
         self.head = nn.Sequential(
@@ -94,3 +95,127 @@ class SephoraDNN(nn.Module):
             x = block(x)
         logits = self.head(x)
         return logits.squeeze(-1)
+
+
+# Columns that describe the reviewer; everything else belongs to the product tower.
+USER_CATEGORICAL_FEATURES: Tuple[str, ...] = ("author_id", "skin_type", "skin_tone", "eye_color", "hair_color")
+USER_NUMERIC_COLUMNS: Tuple[str, ...] = (
+    "interaction_recency_days",
+    "user_total_interactions",
+    "user_positive_rate",
+    "user_avg_review_rating",
+)
+
+
+class _Tower(nn.Module):
+    """Embeddings of one side's categorical columns plus its dense inputs, projected to ``out_dim``."""
+
+    def __init__(
+        self,
+        features: Sequence[str],
+        embedding_sizes: Dict[str, Tuple[int, int]],
+        dense_dim: int,
+        hidden_dim: int,
+        out_dim: int,
+    ) -> None:
+        super().__init__()
+        self.features = list(features)
+        self.embeddings = nn.ModuleDict(
+            {
+                feature: nn.Embedding(embedding_sizes[feature][0], embedding_sizes[feature][1], padding_idx=0)
+                for feature in self.features
+            }
+        )
+        input_dim = sum(embedding_sizes[feature][1] for feature in self.features) + dense_dim
+        self.embedding_dropout = nn.Dropout(0.15)
+        self.mlp = nn.Sequential(
+            nn.LayerNorm(input_dim),
+            nn.Linear(input_dim, hidden_dim),
+            nn.GELU(),
+            nn.Dropout(0.2),
+            nn.Linear(hidden_dim, out_dim),
+            nn.LayerNorm(out_dim),
+        )
+
+    def forward(self, categorical: torch.Tensor, dense: torch.Tensor) -> torch.Tensor:
+        embedded: List[torch.Tensor] = [
+            self.embeddings[feature](categorical[:, idx]) for idx, feature in enumerate(self.features)
+        ]
+        if embedded:
+            dense = torch.cat([self.embedding_dropout(torch.cat(embedded, dim=1)), dense], dim=1)
+        return self.mlp(dense)
+
+
+class TwoTowerSephoraDNN(nn.Module):
+    """User and product towers joined by a small interaction head.
+
+    Takes the same ``(categorical, numeric, highlights)`` batches as SephoraDNN, so the
+    training loop and the serving encoder are shared. The product tower only sees product
+    columns (brand, categories, price and popularity numerics, highlights), which lets
+    serving precompute ``encode_products`` for the whole catalog and score a request
+    with one ``encode_users`` pass plus ``score`` over the cached vectors.
+    """
+
+    def __init__(
+        self,
+        categorical_features: Sequence[str],
+        embedding_sizes: Dict[str, Tuple[int, int]],
+        numeric_columns: Sequence[str],
+        highlight_dim: int,
+        tower_dim: int = 64,
+        hidden_dim: int = 128,
+        user_categorical_features: Sequence[str] = USER_CATEGORICAL_FEATURES,
+        user_numeric_columns: Sequence[str] = USER_NUMERIC_COLUMNS,
+    ) -> None:
+        super().__init__()
+        categorical_features = list(categorical_features)
+        numeric_columns = list(numeric_columns)
+        user_cat = [idx for idx, name in enumerate(categorical_features) if name in user_categorical_features]
+        product_cat = [idx for idx, name in enumerate(categorical_features) if name not in user_categorical_features]
+        user_num = [idx for idx, name in enumerate(numeric_columns) if name in user_numeric_columns]
+        product_num = [idx for idx, name in enumerate(numeric_columns) if name not in user_numeric_columns]
+        self.register_buffer("user_cat_index", torch.tensor(user_cat, dtype=torch.long), persistent=False)
+        self.register_buffer("product_cat_index", torch.tensor(product_cat, dtype=torch.long), persistent=False)
+        self.register_buffer("user_num_index", torch.tensor(user_num, dtype=torch.long), persistent=False)
+        self.register_buffer("product_num_index", torch.tensor(product_num, dtype=torch.long), persistent=False)
+
+        self.user_numeric_ln = nn.LayerNorm(len(user_num)) if user_num else nn.Identity()
+        self.product_numeric_ln = nn.LayerNorm(len(product_num)) if product_num else nn.Identity()
+        self.user_tower = _Tower(
+            [categorical_features[idx] for idx in user_cat], embedding_sizes, len(user_num), hidden_dim, tower_dim
+        )
+        self.product_tower = _Tower(
+            [categorical_features[idx] for idx in product_cat],
+            embedding_sizes,
+            len(product_num) + highlight_dim,
+            hidden_dim,
+            tower_dim,
+        )
+        # Sees both vectors and their element-wise product: a few thousand MACs per candidate.
+        self.head = nn.Sequential(
+            nn.Linear(tower_dim * 3, 64),
+            nn.GELU(),
+            nn.Dropout(0.1),
+            nn.Linear(64, 1),
+        )
+
+    def encode_users(self, categorical: torch.Tensor, numeric: torch.Tensor) -> torch.Tensor:
+        dense = self.user_numeric_ln(numeric.index_select(1, self.user_num_index))
+        return self.user_tower(categorical.index_select(1, self.user_cat_index), dense)
+
+    def encode_products(self, categorical: torch.Tensor, numeric: torch.Tensor, highlights: torch.Tensor) -> torch.Tensor:
+        dense = self.product_numeric_ln(numeric.index_select(1, self.product_num_index))
+        return self.product_tower(
+            categorical.index_select(1, self.product_cat_index), torch.cat([dense, highlights], dim=1)
+        )
+
+    def score(self, user_vectors: torch.Tensor, product_vectors: torch.Tensor) -> torch.Tensor:
+        """Logits for user/product vector pairs; a single user row broadcasts over all products."""
+        user_vectors = user_vectors.expand_as(product_vectors)
+        features = torch.cat([user_vectors, product_vectors, user_vectors * product_vectors], dim=1)
+        return self.head(features).squeeze(-1)
+
+    def forward(self, categorical: torch.Tensor, numeric: torch.Tensor, highlights: torch.Tensor) -> torch.Tensor:
+        return self.score(
+            self.encode_users(categorical, numeric), self.encode_products(categorical, numeric, highlights)
+        )
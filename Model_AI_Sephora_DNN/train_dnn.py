@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import argparse
 import json
+import time
 from copy import deepcopy
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -14,15 +15,19 @@ from torch import nn
 from torch.amp import GradScaler, autocast
 from torch.utils.data import DataLoader
 
-from models.dnn import SephoraDNN
+from models.dnn import USER_CATEGORICAL_FEATURES, USER_NUMERIC_COLUMNS, SephoraDNN, TwoTowerSephoraDNN
 from utils.datasets import (
     CATEGORICAL_FEATURES,
     SephoraDataset,
     build_category_mapping,
     compute_numeric_stats,
 )
+from utils.vocabulary import load_vocabulary, save_vocabulary
 
 
+ARCHITECTURE_CONCAT = "concat"
+ARCHITECTURE_TWO_TOWER = "two_tower"
+
 BASE_DIR = Path(__file__).resolve().parent
 PROCESSED_DIR = BASE_DIR / "processed"
 ARTIFACTS_DIR = BASE_DIR / "artifacts"
@@ -48,6 +53,87 @@ def build_categorical_maps(train_df: pd.DataFrame) -> Dict[str, Dict[str, int]]:
     return maps
 
 
+def build_model(metadata: Dict[str, object]) -> nn.Module:
+    """The network described by ``dnn_metadata.pt`` (mirrors the backend's ``build_dnn``)."""
+    if metadata.get("architecture", ARCHITECTURE_CONCAT) == ARCHITECTURE_TWO_TOWER:
+        return TwoTowerSephoraDNN(
+            categorical_features=metadata["categorical_features"],
+            embedding_sizes=metadata["embedding_sizes"],
+            numeric_columns=metadata["numeric_columns"],
+            highlight_dim=len(metadata["highlight_list"]),
+            tower_dim=metadata.get("tower_dim", 64),
+            hidden_dim=metadata.get("tower_hidden_dim", 128),
+            user_categorical_features=metadata.get("user_categorical_features", USER_CATEGORICAL_FEATURES),
+            user_numeric_columns=metadata.get("user_numeric_columns", USER_NUMERIC_COLUMNS),
+        )
+    return SephoraDNN(
+        categorical_features=metadata["categorical_features"],
+        embedding_sizes=metadata["embedding_sizes"],
+        numeric_dim=len(metadata["numeric_columns"]),
+        highlight_dim=len(metadata["highlight_list"]),
+        hidden_dim=metadata.get("hidden_dim", 256),
+        num_blocks=metadata.get("num_blocks", 2),
+    )
+
+
+def load_teacher(teacher_dir: Path, device: torch.device) -> Tuple[nn.Module, Dict[str, object]]:
+    """The trained model and metadata in ``teacher_dir``, with its vocabularies as dicts."""
+    metadata = torch.load(teacher_dir / "dnn_metadata.pt", map_location="cpu")
+    if "categorical_maps" not in metadata:
+        vocab_dir = teacher_dir / metadata.get("categorical_vocab_dir", "vocab")
+        metadata["categorical_maps"] = {
+            feature: load_vocabulary(vocab_dir, f"categorical.{feature}") for feature in metadata["categorical_features"]
+        }
+    if list(metadata["categorical_features"]) != list(CATEGORICAL_FEATURES):
+        raise ValueError(f"Teacher in {teacher_dir} was trained on different categorical features")
+    teacher = build_model(metadata)
+    teacher.load_state_dict(torch.load(teacher_dir / "dnn_best_model.pt", map_location="cpu"))
+    teacher.to(device).eval()
+    for param in teacher.parameters():
+        param.requires_grad_(False)
+    return teacher, metadata
+
+
+class DistillationLoss(nn.Module):
+    """Blend of the label loss and a soft-target loss against the teacher's logits.
+
+    ``alpha`` weights the hard labels; the remainder goes to binary cross-entropy between
+    the student's and the teacher's temperature-softened probabilities, scaled by T^2 so its
+    gradients stay comparable as the temperature changes.
+    """
+
+    def __init__(self, hard_criterion: nn.Module, alpha: float, temperature: float) -> None:
+        super().__init__()
+        self.hard_criterion = hard_criterion
+        self.alpha = alpha
+        self.temperature = temperature
+
+    def forward(self, logits: torch.Tensor, labels: torch.Tensor, teacher_logits: torch.Tensor) -> torch.Tensor:
+        hard = self.hard_criterion(logits, labels)
+        soft_targets = torch.sigmoid(teacher_logits.float() / self.temperature)
+        soft = nn.functional.binary_cross_entropy_with_logits(logits.float() / self.temperature, soft_targets)
+        return self.alpha * hard + (1.0 - self.alpha) * self.temperature**2 * soft
+
+
+def measure_latency_ms(model: nn.Module, dataset: SephoraDataset, rows: int = 200, repeats: int = 50) -> float:
+    """Median CPU time of one forward pass over ``rows`` rows, i.e. one re-ranking request."""
+    categorical, numeric, highlights, _ = next(iter(DataLoader(dataset, batch_size=rows, shuffle=False)))
+    cpu_model = deepcopy(model).cpu().eval()
+    timings: List[float] = []
+    with torch.inference_mode():
+        for _ in range(5):
+            cpu_model(categorical, numeric, highlights)
+        for _ in range(repeats):
+            started = time.perf_counter()
+            cpu_model(categorical, numeric, highlights)
+            timings.append((time.perf_counter() - started) * 1000.0)
+    return float(np.median(timings))
+
+
+def count_parameters(model: nn.Module) -> int:
+    return sum(param.numel() for param in model.parameters())
+
+
 def precision_at_k(probs: np.ndarray, labels: np.ndarray, k: int = 10) -> float:
     if len(probs) == 0:
         return float("nan")
@@ -65,7 +151,9 @@ def train_one_epoch(
     device: torch.device,
     scheduler: Optional[torch.optim.lr_scheduler._LRScheduler] = None,
     grad_clip: Optional[float] = None,
+    teacher: Optional[nn.Module] = None,
 ) -> float:
+    """One pass over ``loader``; with a ``teacher``, ``criterion`` also receives its logits."""
     model.train()
     total_loss = 0.0
     for categorical, numeric, highlights, labels in loader:
@@ -77,7 +165,12 @@ def train_one_epoch(
         optimizer.zero_grad(set_to_none=True)
         with autocast("cuda", enabled=device.type == "cuda"):
             logits = model(categorical, numeric, highlights)
-            loss = criterion(logits, labels)
+            if teacher is not None:
+                with torch.no_grad():
+                    teacher_logits = teacher(categorical, numeric, highlights)
+                loss = criterion(logits, labels, teacher_logits)
+            else:
+                loss = criterion(logits, labels)
 
         scaler.scale(loss).backward()
         if grad_clip is not None:
@@ -161,8 +254,32 @@ def main() -> None:
     parser.add_argument("--patience", type=int, default=3)
     parser.add_argument("--grad-clip", type=float, default=1.0)
     parser.add_argument("--output-dir", type=str, default=str(ARTIFACTS_DIR))
+    parser.add_argument(
+        "--architecture",
+        choices=[ARCHITECTURE_CONCAT, ARCHITECTURE_TWO_TOWER],
+        default=ARCHITECTURE_CONCAT,
+        help="concat: one MLP over all features; two_tower: user/product towers with cacheable product vectors",
+    )
+    parser.add_argument("--tower-dim", type=int, default=64, help="Output size of each tower (two_tower only)")
+    parser.add_argument("--tower-hidden-dim", type=int, default=128, help="Hidden size inside each tower (two_tower only)")
+    parser.add_argument("--hidden-dim", type=int, default=256, help="Width of the residual MLP (concat only)")
+    parser.add_argument("--num-blocks", type=int, default=2, help="Number of residual blocks (concat only)")
+    parser.add_argument(
+        "--teacher-dir",
+        type=str,
+        default=None,
+        help="Distill from the trained model in this directory instead of training on labels alone",
+    )
+    parser.add_argument("--distill-alpha", type=float, default=0.3, help="Weight of the label loss when distilling")
+    parser.add_argument("--distill-temperature", type=float, default=2.0, help="Softening temperature when distilling")
+    parser.add_argument("--latency-rows", type=int, default=200, help="Rows per forward pass in the latency report")
     args = parser.parse_args()
 
+    output_dir = Path(args.output_dir)
+    teacher_dir = Path(args.teacher_dir) if args.teacher_dir else None
+    if teacher_dir is not None and teacher_dir.resolve() == output_dir.resolve():
+        parser.error("--output-dir must differ from --teacher-dir, the student would overwrite its teacher")
+
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     print(f"Using device: {device}")
 
@@ -174,9 +291,6 @@ def main() -> None:
         for feature in CATEGORICAL_FEATURES:
             frame[feature] = frame[feature].astype(str)
 
-    categorical_maps = build_categorical_maps(train_df)
-    highlight_list = load_highlights()
-
     numeric_columns = [
         "loves_count",
         "catalog_rating",
@@ -200,7 +314,22 @@ def main() -> None:
         "price_to_category_ratio",
     ]
 
-    numeric_stats = compute_numeric_stats(train_df, numeric_columns)
+    teacher: Optional[nn.Module] = None
+    if teacher_dir is None:
+        categorical_maps = build_categorical_maps(train_df)
+        highlight_list = load_highlights()
+        numeric_stats = compute_numeric_stats(train_df, numeric_columns)
+    else:
+        # The student reuses the teacher's encoding so both score the exact same inputs.
+        teacher, teacher_metadata = load_teacher(teacher_dir, device)
+        print(f"Distilling from {teacher_dir} ({count_parameters(teacher):,} parameters)")
+        categorical_maps = teacher_metadata["categorical_maps"]
+        highlight_list = list(teacher_metadata["highlight_list"])
+        numeric_columns = list(teacher_metadata["numeric_columns"])
+        numeric_stats = {
+            "mean": np.asarray(teacher_metadata["numeric_mean"], dtype=np.float32),
+            "std": np.asarray(teacher_metadata["numeric_std"], dtype=np.float32),
+        }
 
     train_dataset = SephoraDataset(train_df, categorical_maps, numeric_columns, numeric_stats, highlight_list)
     val_dataset = SephoraDataset(val_df, categorical_maps, numeric_columns, numeric_stats, highlight_list)
@@ -233,12 +362,30 @@ def main() -> None:
         for feature, mapping in categorical_maps.items()
     }
 
-    model = SephoraDNN(
-        categorical_features=CATEGORICAL_FEATURES,
-        embedding_sizes=embedding_sizes,
-        numeric_dim=len(numeric_columns),
-        highlight_dim=len(highlight_list),
-    ).to(device)
+    vocab_dir = output_dir / "vocab"
+    metadata = {
+        "categorical_features": list(CATEGORICAL_FEATURES),
+        "categorical_vocab_dir": vocab_dir.name,
+        "numeric_columns": numeric_columns,
+        "numeric_mean": numeric_stats["mean"].tolist(),
+        "numeric_std": numeric_stats["std"].tolist(),
+        "highlight_list": highlight_list,
+        "embedding_sizes": embedding_sizes,
+        "architecture": args.architecture,
+    }
+    if args.architecture == ARCHITECTURE_TWO_TOWER:
+        metadata.update(
+            {
+                "tower_dim": args.tower_dim,
+                "tower_hidden_dim": args.tower_hidden_dim,
+                "user_categorical_features": list(USER_CATEGORICAL_FEATURES),
+                "user_numeric_columns": list(USER_NUMERIC_COLUMNS),
+            }
+        )
+    else:
+        metadata.update({"hidden_dim": args.hidden_dim, "num_blocks": args.num_blocks})
+
+    model = build_model(metadata).to(device)
 
     optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr, weight_decay=args.weight_decay)
     steps_per_epoch = max(1, len(train_loader))
@@ -256,6 +403,9 @@ def main() -> None:
     pos_weight = torch.tensor(pos_weight_value, device=device, dtype=torch.float32)
 
     criterion = nn.BCEWithLogitsLoss(pos_weight=pos_weight)
+    train_criterion: nn.Module = criterion
+    if teacher is not None:
+        train_criterion = DistillationLoss(criterion, args.distill_alpha, args.distill_temperature)
     scaler = GradScaler("cuda", enabled=device.type == "cuda")
 
     class EarlyStopping:
@@ -284,12 +434,13 @@ def main() -> None:
         train_loss = train_one_epoch(
             model,
             train_loader,
-            criterion,
+            train_criterion,
             optimizer,
             scaler,
             device,
             scheduler=scheduler,
             grad_clip=args.grad_clip,
+            teacher=teacher,
         )
         val_metrics = evaluate(model, val_loader, criterion, device)
 
@@ -334,22 +485,35 @@ def main() -> None:
         )
     )
 
-    ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
-    torch.save(model.state_dict(), ARTIFACTS_DIR / "dnn_best_model.pt")
-
-    metadata = {
-        "categorical_features": list(CATEGORICAL_FEATURES),
-        "categorical_maps": categorical_maps,
-        "numeric_columns": numeric_columns,
-        "numeric_mean": numeric_stats["mean"].tolist(),
-        "numeric_std": numeric_stats["std"].tolist(),
-        "highlight_list": highlight_list,
-        "embedding_sizes": embedding_sizes,
-    }
-    torch.save(metadata, ARTIFACTS_DIR / "dnn_metadata.pt")
+    distillation = None
+    if teacher is not None:
+        teacher_metrics = evaluate(teacher, test_loader, criterion, device)
+        distillation = {
+            "teacher_dir": str(teacher_dir),
+            "alpha": args.distill_alpha,
+            "temperature": args.distill_temperature,
+            "latency_rows": args.latency_rows,
+        }
+        print(f"{'':8} {'test_auc':>9} {'test_pr_auc':>11} {f'ms/{args.latency_rows} rows':>14} {'params':>11}")
+        for name, candidate, metrics in (("teacher", teacher, teacher_metrics), ("student", model, test_metrics)):
+            report = {
+                "test_metrics": metrics,
+                "latency_ms": measure_latency_ms(candidate, test_dataset, rows=args.latency_rows),
+                "parameters": count_parameters(candidate),
+            }
+            distillation[name] = report
+            print(
+                f"{name:8} {metrics['roc_auc']:9.4f} {metrics['pr_auc']:11.4f} "
+                f"{report['latency_ms']:14.2f} {report['parameters']:11,}"
+            )
 
-    output_dir = Path(args.output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
+    torch.save(model.state_dict(), output_dir / "dnn_best_model.pt")
+
+    # Vocabularies go to compact sorted tables instead of being pickled as dicts.
+    for feature, mapping in categorical_maps.items():
+        save_vocabulary(mapping, vocab_dir, f"categorical.{feature}")
+    torch.save(metadata, output_dir / "dnn_metadata.pt")
 
     results = {
         "history": history,
@@ -357,7 +521,10 @@ def main() -> None:
         "test_metrics": test_metrics,
         "best_epoch": best_epoch,
         "pos_weight": pos_weight_value,
+        "architecture": args.architecture,
     }
+    if distillation is not None:
+        results["distillation"] = distillation
     with (output_dir / "training_metrics.json").open("w", encoding="utf-8") as f:
         json.dump(results, f, ensure_ascii=False, indent=2)
 
@@ -0,0 +1,42 @@
+"""Compact on-disk vocabularies shared with the serving backend."""
+
+from __future__ import annotations
+
+import zlib
+from pathlib import Path
+from typing import Dict, Mapping
+
+import numpy as np
+
+
+def save_vocabulary(mapping: Mapping[str, int], directory: Path, name: str) -> None:
+    """Write ``mapping`` as hashes / blob / offsets / ids ``.npy`` files.
+
+    This is the layout read by ``recommendations.services.vocabulary.Vocabulary`` in the
+    backend: UTF-8 keys ordered by ``(crc32(key), key)`` and concatenated, with
+    ``offsets[i]:offsets[i + 1]`` delimiting key ``i`` and ``ids[i]`` holding its index.
+    """
+    entries = sorted(
+        (zlib.crc32(encoded), encoded, int(value))
+        for encoded, value in ((str(key).encode("utf-8"), value) for key, value in mapping.items())
+    )
+    offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+    if entries:
+        offsets[1:] = np.cumsum([len(encoded) for _, encoded, _ in entries])
+
+    directory.mkdir(parents=True, exist_ok=True)
+    np.save(directory / f"{name}.hashes.npy", np.asarray([digest for digest, _, _ in entries], dtype=np.uint32))
+    np.save(directory / f"{name}.blob.npy", np.frombuffer(b"".join(encoded for _, encoded, _ in entries), dtype=np.uint8))
+    np.save(directory / f"{name}.offsets.npy", offsets)
+    np.save(directory / f"{name}.ids.npy", np.asarray([value for _, _, value in entries], dtype=np.int64))
+
+
+def load_vocabulary(directory: Path, name: str) -> Dict[str, int]:
+    """Read a vocabulary written by ``save_vocabulary`` back into a dict."""
+    blob = np.load(directory / f"{name}.blob.npy").tobytes()
+    offsets = np.load(directory / f"{name}.offsets.npy")
+    ids = np.load(directory / f"{name}.ids.npy")
+    return {
+        blob[offsets[idx] : offsets[idx + 1]].decode("utf-8"): int(ids[idx])
+        for idx in range(len(ids))
+    }
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import argparse
 import json
+import sys
 from pathlib import Path
 from typing import Dict, List, Sequence, Tuple, Optional
 
@@ -15,6 +16,10 @@ from sklearn.model_selection import train_test_split
 from torch import nn
 from torch.utils.data import DataLoader, Dataset
 
+# The vocabulary writer lives with the DNN trainer; both models must emit the layout the backend reads.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Model_AI_Sephora_DNN"))
+from utils.vocabulary import save_vocabulary  # noqa: E402
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Train an NCF model using review data.")
@@ -519,6 +524,8 @@ def main() -> None:
         json.dump(user_encoder, fp)
     with open(output_dir / "item_encoder.json", "w", encoding="utf-8") as fp:
         json.dump(item_encoder, fp)
+    save_vocabulary(user_encoder, output_dir / "vocab", "user")
+    save_vocabulary(item_encoder, output_dir / "vocab", "item")
 
     print(f"Artifacts stored in {output_dir}")
 
@@ -117,7 +117,9 @@ class ProductSerializer(serializers.ModelSerializer):
 
     # --- Thumbnail (ảnh đầu tiên hoặc default) ---
     def get_thumbnail(self, obj):
-        first = obj.images.first()
+        # Dùng danh sách ảnh đã prefetch (nếu có) thay vì query thêm bằng .first()
+        images = list(obj.images.all())
+        first = min(images, key=lambda img: img.pk) if images else None
         default_url = "/media/products/default.jpg"
 
         # Nếu có ảnh → trả ảnh đầu tiên
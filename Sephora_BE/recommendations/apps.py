@@ -1,7 +1,33 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RecommendationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recommendations"
 
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .services.warmup import is_serving_process
+
+        if settings.ML_ARTIFACTS.get("MODEL_REGISTRY_DIR") and is_serving_process():
+            from .views import start_model_registry
+
+            start_model_registry()
+
+        if settings.ML_ARTIFACTS.get("WARMUP_ON_STARTUP", False):
+            from .services.warmup import WARMUP
+
+            if is_serving_process():
+                from .services.content_filter import CONTENT_FILTER
+                from .services.popularity import POPULARITY
+                from .views import DNN_SERVICE, NCF_SERVICE
+
+                WARMUP.start(
+                    {
+                        "dnn": DNN_SERVICE.warm_up,
+                        "ncf": NCF_SERVICE.warm_up,
+                        "content_index": CONTENT_FILTER.warm_up,
+                        "popularity": POPULARITY.refresh,
+                    }
+                )
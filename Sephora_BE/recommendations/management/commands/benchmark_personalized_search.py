@@ -0,0 +1,476 @@
+from __future__ import annotations
+
+import json
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+import torch
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework.test import APIRequestFactory
+
+from products.models import Brand, Category, Product, ProductImage
+from recommendations import views
+from recommendations.models import PersonalizedSearchLog, ProductFeatureSnapshot
+from recommendations.services.business_rules import RULE_ENGINE
+from recommendations.services.content_filter import CONTENT_FILTER
+from recommendations.services.dnn import DNNRecommendationService, SephoraDNN, invalidate_product_features
+from recommendations.services.ncf import NCFRecommendationService, NeuMF
+from recommendations.services.product_metadata import join_ingredients
+from recommendations.services.result_cache import RESULT_CACHE
+from recommendations.services.search_log import SEARCH_LOG_WRITER
+from recommendations.services.timing import PIPELINE_METRICS
+from recommendations.services.vocabulary import Vocabulary
+
+BENCH_PREFIX = "bench-"
+
+# Same schema as Model_AI_Sephora_DNN/train_dnn.py writes into dnn_metadata.pt.
+DNN_CATEGORICAL_FEATURES = (
+    "author_id",
+    "product_id",
+    "brand_id",
+    "primary_category",
+    "secondary_category",
+    "tertiary_category",
+    "skin_type",
+    "skin_tone",
+    "eye_color",
+    "hair_color",
+)
+DNN_NUMERIC_COLUMNS = (
+    "loves_count",
+    "catalog_rating",
+    "review_rating",
+    "price_usd",
+    "child_count",
+    "limited_edition",
+    "new",
+    "online_only",
+    "out_of_stock",
+    "sephora_exclusive",
+    "interaction_recency_days",
+    "user_total_interactions",
+    "user_positive_rate",
+    "user_avg_review_rating",
+    "product_total_interactions",
+    "product_positive_rate",
+    "product_avg_review_rating",
+    "log_loves_count",
+    "log_price_usd",
+    "price_to_category_ratio",
+)
+
+CATEGORY_TREE = {
+    "Skincare": {
+        "Cleansers": ["Face Wash & Cleansers", "Makeup Removers"],
+        "Moisturizers": ["Moisturizers", "Night Creams"],
+        "Treatments": ["Face Serums", "Facial Peels"],
+        "Sunscreen": ["Face Sunscreen"],
+        "Masks": ["Face Masks", "Sheet Masks"],
+    },
+    "Makeup": {
+        "Lip": ["Lipstick", "Lip Balm & Treatment"],
+        "Face": ["Foundation", "Concealer"],
+    },
+}
+PRODUCT_WORDS = [
+    "hydrating", "gel", "cream", "serum", "cleanser", "foam", "matte", "rich", "barrier", "soothing",
+    "brightening", "oil-free", "lightweight", "water", "repair", "glow", "calming", "sunscreen", "mask", "balm",
+]
+HIGHLIGHTS = [
+    "Vegan", "Clean at Sephora", "Fragrance Free", "Hydrating", "Good for: Dryness", "Good for: Acne/Blemishes",
+    "Oil-free", "Cruelty-Free", "Without Parabens", "Good for: Dullness/Uneven Texture", "Hyaluronic Acid",
+    "Niacinamide", "Non-comedogenic", "Matte Finish", "SPF", "Good for: Anti-Aging",
+]
+INGREDIENTS = [
+    "Water", "Glycerin", "Niacinamide", "Hyaluronic Acid", "Ceramide NP", "Shea Butter", "Salicylic Acid",
+    "Retinol", "Squalane", "Panthenol", "Fragrance", "Paraben", "Alcohol Denat", "Zinc Oxide", "Centella",
+]
+SEARCH_QUERIES = [
+    "", "", "sua rua mat", "serum", "kem chong nang", "kem duong", "mat na", "son",
+    "hydrating cream", "oil-free gel", "niacinamide serum", "barrier repair", "sunscreen",
+]
+SKIN_TYPES = ["oily", "dry", "combination", "normal", "sensitive"]
+SKIN_CONCERNS = ["acne", "dryness", "dullness", "aging", "redness", "pores"]
+CLIMATES = ["", "hot_humid", "air_con", "cool_dry"]
+BUDGETS = ["", "under_500k", "500k_1m", "over_1m"]
+ROUTINES = ["", "minimal", "advanced"]
+ALLERGIES = ["", "", "", "paraben", "fragrance", "alcohol"]
+SYNTHETIC_USERS = 2000
+
+
+def _embedding_dim(cardinality: int) -> int:
+    # Same rule as train_dnn.embedding_dim.
+    return max(4, min(64, int(round(1.6 * cardinality ** 0.56))))
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a mix of personalized search requests against a synthetic catalog (products, images and "
+        "ProductFeatureSnapshot rows written to the configured database) and randomly initialized "
+        "SephoraDNN/NeuMF artifacts, then report p50/p95/p99 latency, requests/sec and per-stage "
+        "timings for each catalog size. Synthetic rows are tagged and removed afterwards; products already "
+        "in the database also take part in retrieval, so prefer a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,5000",
+            help="Danh sách kích thước catalog, phân tách bằng dấu phẩy (mặc định: 1000,5000).",
+        )
+        parser.add_argument("--requests", type=int, default=200, help="Số request đo cho mỗi kích thước.")
+        parser.add_argument("--warmup", type=int, default=20, help="Số request chạy trước khi đo.")
+        parser.add_argument("--concurrency", type=int, default=1, help="Số luồng gửi request song song.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed cho catalog, artifacts và request.")
+        parser.add_argument(
+            "--runtime",
+            default=views.INFERENCE_RUNTIME,
+            help="Runtime suy luận cho model giả lập (eager, optimized, optimized_int8).",
+        )
+        parser.add_argument(
+            "--dnn-batch-window-ms",
+            type=float,
+            default=0.0,
+            help="Cửa sổ gom batch DNN giữa các request cho model giả lập (0 = tắt).",
+        )
+        parser.add_argument(
+            "--deadline-ms",
+            type=float,
+            default=0.0,
+            help=(
+                "Ngân sách thời gian mỗi request (mặc định 0 = không giới hạn, để mọi bước đều chạy và được đo). "
+                "Đặt giá trị dương, hoặc dùng --configured-deadline, để đo chế độ suy giảm."
+            ),
+        )
+        parser.add_argument(
+            "--configured-deadline",
+            action="store_true",
+            help="Dùng DEADLINE_MS đang cấu hình trong settings thay cho --deadline-ms.",
+        )
+        parser.add_argument(
+            "--configured-artifacts",
+            action="store_true",
+            help="Dùng DNN/NCF đang cấu hình trong ML_ARTIFACTS thay vì artifacts ngẫu nhiên.",
+        )
+        parser.add_argument(
+            "--with-result-cache",
+            action="store_true",
+            help="Giữ result cache bật (mặc định tắt để mỗi request chạy toàn bộ pipeline).",
+        )
+        parser.add_argument("--keep-data", action="store_true", help="Không xóa catalog giả lập sau khi đo.")
+        parser.add_argument("--output", help="Ghi kết quả dạng JSON vào file này.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(value) for value in options["sizes"].split(",") if value.strip()]
+        except ValueError:
+            raise CommandError("--sizes phải là danh sách số nguyên, ví dụ 1000,5000.")
+        if not sizes or min(sizes) <= 0:
+            raise CommandError("--sizes phải là danh sách số nguyên dương.")
+        if Product.objects.filter(brand__brand_name__startswith=BENCH_PREFIX).exists():
+            raise CommandError("Còn catalog giả lập từ lần chạy trước; hãy xóa các brand 'bench-*' trước.")
+
+        deadline_ms = views.DEADLINE_MS if options["configured_deadline"] else options["deadline_ms"]
+        rng = random.Random(options["seed"])
+        self._session_ids: List[str] = []
+        torch.manual_seed(options["seed"])
+        report: List[Dict[str, object]] = []
+        with tempfile.TemporaryDirectory() as tmp, self._patched_runtime(
+            options["with_result_cache"], deadline_ms
+        ):
+            try:
+                for size in sizes:
+                    self._clear_catalog()
+                    self.stdout.write(f"Đang tạo catalog {size:,} sản phẩm...")
+                    external_ids = self._create_catalog(size, rng)
+                    self._refresh_indexes()
+                    if not options["configured_artifacts"]:
+                        self._install_synthetic_services(
+                            Path(tmp) / str(size), external_ids, options["runtime"], options["dnn_batch_window_ms"]
+                        )
+                    requests = self._request_mix(options["requests"] + options["warmup"], rng)
+                    self._session_ids.extend(payload["session_id"] for payload in requests)
+                    result = self._replay(requests, options["warmup"], options["concurrency"])
+                    result["catalog_size"] = size
+                    report.append(result)
+                    self._print_result(result)
+            finally:
+                if not options["keep_data"]:
+                    self._clear_catalog()
+                self._refresh_indexes()
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"Đã ghi kết quả vào {options['output']}."))
+
+    @contextmanager
+    def _patched_runtime(self, keep_result_cache: bool, deadline_ms: float) -> Iterator[None]:
+        services = (views.DNN_SERVICE, views.NCF_SERVICE)
+        configured_deadline = views.DEADLINE_MS
+        views.DEADLINE_MS = deadline_ms
+        max_entries = RESULT_CACHE.max_entries
+        if not keep_result_cache:
+            RESULT_CACHE.max_entries = 0
+        try:
+            yield
+        finally:
+            views.DNN_SERVICE, views.NCF_SERVICE = services
+            views.DEADLINE_MS = configured_deadline
+            RESULT_CACHE.max_entries = max_entries
+            RESULT_CACHE.invalidate()
+
+    @staticmethod
+    def _create_catalog(size: int, rng: random.Random) -> List[str]:
+        brands = Brand.objects.bulk_create([Brand(brand_name=f"{BENCH_PREFIX}brand-{idx}") for idx in range(max(5, size // 40))])
+        leaves = []
+        for primary, children in CATEGORY_TREE.items():
+            for secondary, tertiaries in children.items():
+                for tertiary in tertiaries:
+                    leaves.append((primary, secondary, tertiary))
+        categories = Category.objects.bulk_create(
+            [Category(category_name=f"{BENCH_PREFIX}{tertiary}") for _, _, tertiary in leaves]
+        )
+
+        products = []
+        for idx in range(size):
+            words = rng.sample(PRODUCT_WORDS, 3)
+            products.append(
+                Product(
+                    sku=f"{BENCH_PREFIX}{idx}",
+                    product_name=" ".join(words).title(),
+                    description=" ".join(rng.sample(PRODUCT_WORDS, 8)),
+                    brand=rng.choice(brands),
+                    category=rng.choice(categories),
+                    price=Decimal(rng.randint(5, 120)),
+                    skin_types=", ".join(rng.sample(SKIN_TYPES, 2)),
+                    is_new=rng.random() < 0.1,
+                    stock=rng.randint(1, 100),
+                    avg_rating=Decimal(str(round(rng.uniform(3.0, 5.0), 2))),
+                    review_count=rng.randint(0, 5000),
+                )
+            )
+        products = Product.objects.bulk_create(products, batch_size=500)
+        if any(product.pk is None for product in products):
+            # Backends without RETURNING: reload the primary keys by SKU.
+            by_sku = dict(Product.objects.filter(sku__startswith=BENCH_PREFIX).values_list("sku", "productid"))
+            for product in products:
+                product.pk = by_sku[product.sku]
+        ProductImage.objects.bulk_create(
+            [ProductImage(product=product, image_url=f"/media/bench/{product.pk}.jpg") for product in products],
+            batch_size=500,
+        )
+
+        snapshots = []
+        external_ids = []
+        for idx, product in enumerate(products):
+            primary, secondary, tertiary = leaves[categories.index(product.category)]
+            ingredients = rng.sample(INGREDIENTS, rng.randint(3, 8))
+            external_id = f"BENCH{idx:07d}"
+            external_ids.append(external_id)
+            price = Decimal(product.price)
+            snapshots.append(
+                ProductFeatureSnapshot(
+                    product=product,
+                    external_id=external_id,
+                    brand_id=str(product.brand.pk),
+                    brand_name=product.brand.brand_name,
+                    loves_count=rng.randint(0, 200_000),
+                    rating=product.avg_rating,
+                    reviews=product.review_count,
+                    price_usd=price,
+                    value_price_usd=price,
+                    sale_price_usd=price,
+                    new=bool(product.is_new),
+                    out_of_stock=rng.random() < 0.03,
+                    sephora_exclusive=rng.random() < 0.2,
+                    highlights=rng.sample(HIGHLIGHTS, rng.randint(1, 5)),
+                    ingredients=ingredients,
+                    ingredients_text=join_ingredients(ingredients),
+                    primary_category=primary,
+                    secondary_category=secondary,
+                    tertiary_category=tertiary,
+                )
+            )
+        # bulk_create skips save(), so ingredients_text is filled in above.
+        ProductFeatureSnapshot.objects.bulk_create(snapshots, batch_size=500)
+        return external_ids
+
+    def _clear_catalog(self) -> None:
+        # The writer thread may still hold a batch that flush() cannot see.
+        for session_id in self._session_ids:
+            SEARCH_LOG_WRITER.wait_for_session(session_id, timeout=5.0)
+        PersonalizedSearchLog.objects.filter(session_id__startswith=BENCH_PREFIX).delete()
+        product_ids = list(
+            Product.objects.filter(brand__brand_name__startswith=BENCH_PREFIX).values_list("productid", flat=True)
+        )
+        ProductFeatureSnapshot.objects.filter(product_id__in=product_ids).delete()
+        ProductImage.objects.filter(product_id__in=product_ids).delete()
+        Product.objects.filter(productid__in=product_ids).delete()
+        Category.objects.filter(category_name__startswith=BENCH_PREFIX).delete()
+        Brand.objects.filter(brand_name__startswith=BENCH_PREFIX).delete()
+
+    @staticmethod
+    def _refresh_indexes() -> None:
+        CONTENT_FILTER.refresh()
+        RULE_ENGINE.invalidate_products()
+        invalidate_product_features()
+        RESULT_CACHE.invalidate()
+
+    def _install_synthetic_services(
+        self,
+        directory: Path,
+        external_ids: List[str],
+        runtime: str,
+        batch_window_ms: float,
+    ) -> None:
+        dnn_dir = directory / "dnn"
+        ncf_dir = directory / "ncf"
+        self._write_dnn_artifacts(dnn_dir, external_ids)
+        self._write_ncf_artifacts(ncf_dir, external_ids)
+        views.DNN_SERVICE = DNNRecommendationService(dnn_dir, runtime=runtime, batch_window_ms=batch_window_ms)
+        views.NCF_SERVICE = NCFRecommendationService(ncf_dir, runtime=runtime)
+        views.DNN_SERVICE.warm_up()
+        views.NCF_SERVICE.warm_up()
+
+    @staticmethod
+    def _write_dnn_artifacts(directory: Path, external_ids: List[str]) -> None:
+        snapshots = ProductFeatureSnapshot.objects.filter(external_id__in=external_ids)
+        values: Dict[str, List[str]] = {
+            "author_id": [f"{BENCH_PREFIX}user-{idx}" for idx in range(SYNTHETIC_USERS)],
+            "product_id": external_ids,
+            "brand_id": sorted({snapshot.brand_id for snapshot in snapshots}),
+            "primary_category": sorted(CATEGORY_TREE),
+            "secondary_category": sorted({name for children in CATEGORY_TREE.values() for name in children}),
+            "tertiary_category": sorted(
+                {name for children in CATEGORY_TREE.values() for names in children.values() for name in names}
+            ),
+            "skin_type": SKIN_TYPES,
+            "skin_tone": ["light", "medium", "tan", "deep"],
+            "eye_color": ["brown", "blue", "green", "gray"],
+            "hair_color": ["black", "brown", "blonde", "red"],
+        }
+        vocab_dir = directory / "vocab"
+        embedding_sizes = {}
+        for feature in DNN_CATEGORICAL_FEATURES:
+            mapping = {"<unk>": 0, **{value: idx + 1 for idx, value in enumerate(values[feature])}}
+            Vocabulary.from_mapping(mapping).save(vocab_dir, f"categorical.{feature}")
+            embedding_sizes[feature] = (len(mapping), _embedding_dim(len(mapping)))
+        metadata = {
+            "categorical_features": list(DNN_CATEGORICAL_FEATURES),
+            "categorical_vocab_dir": vocab_dir.name,
+            "numeric_columns": list(DNN_NUMERIC_COLUMNS),
+            "numeric_mean": [0.0] * len(DNN_NUMERIC_COLUMNS),
+            "numeric_std": [1.0] * len(DNN_NUMERIC_COLUMNS),
+            "highlight_list": list(HIGHLIGHTS),
+            "embedding_sizes": embedding_sizes,
+        }
+        model = SephoraDNN(
+            categorical_features=DNN_CATEGORICAL_FEATURES,
+            embedding_sizes=embedding_sizes,
+            numeric_dim=len(DNN_NUMERIC_COLUMNS),
+            highlight_dim=len(HIGHLIGHTS),
+        )
+        torch.save(metadata, directory / "dnn_metadata.pt")
+        torch.save(model.state_dict(), directory / "dnn_best_model.pt")
+
+    @staticmethod
+    def _write_ncf_artifacts(directory: Path, external_ids: List[str]) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        users = {f"{BENCH_PREFIX}user-{idx}": idx for idx in range(SYNTHETIC_USERS)}
+        items = {external_id: idx for idx, external_id in enumerate(external_ids)}
+        config = {"embedding_dim": 64, "hidden_dims": [128, 64], "dropout": 0.2}
+        model = NeuMF(len(users), len(items), config["embedding_dim"], config["hidden_dims"], config["dropout"])
+        (directory / "user_encoder.json").write_text(json.dumps(users), encoding="utf-8")
+        (directory / "item_encoder.json").write_text(json.dumps(items), encoding="utf-8")
+        (directory / "ncf_metrics.json").write_text(json.dumps({"config": config}), encoding="utf-8")
+        torch.save(model.state_dict(), directory / "ncf_model.pt")
+
+    @staticmethod
+    def _request_mix(count: int, rng: random.Random) -> List[dict]:
+        requests = []
+        for idx in range(count):
+            skin_profile = {
+                "skin_type": rng.choice(SKIN_TYPES),
+                "skin_concerns": rng.sample(SKIN_CONCERNS, rng.randint(0, 3)),
+                "climate": rng.choice(CLIMATES),
+                "budget_level": rng.choice(BUDGETS),
+                "routine_focus": rng.choice(ROUTINES),
+                "allergy_info": rng.choice(ALLERGIES),
+            }
+            if rng.random() < 0.4:
+                # Returning users carry a legacy author id, which enables NCF scoring.
+                skin_profile["legacy_author_id"] = f"{BENCH_PREFIX}user-{rng.randrange(SYNTHETIC_USERS)}"
+            requests.append(
+                {
+                    "search_query": rng.choice(SEARCH_QUERIES),
+                    "session_id": f"{BENCH_PREFIX}{idx}-{rng.getrandbits(32):08x}",
+                    "skin_profile": skin_profile,
+                }
+            )
+        return requests
+
+    @staticmethod
+    def _replay(requests: List[dict], warmup: int, concurrency: int) -> Dict[str, object]:
+        # The factory's default "testserver" host is not in ALLOWED_HOSTS; "localhost" is.
+        factory = APIRequestFactory(SERVER_NAME="localhost")
+
+        def send(payload: dict) -> Tuple[float, str]:
+            request = factory.post("/api/recommendations/personalized-search/", payload, format="json")
+            started = time.perf_counter()
+            response = views.personalized_search(request)
+            elapsed = (time.perf_counter() - started) * 1000.0
+            if response.status_code != 200:
+                raise CommandError(f"Request lỗi {response.status_code}: {response.data}")
+            return elapsed, response.data["degradation"]["level"]
+
+        for payload in requests[:warmup]:
+            send(payload)
+        measured = requests[warmup:]
+        PIPELINE_METRICS.reset()
+        started = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(send, measured))
+            connections.close_all()
+        else:
+            outcomes = [send(payload) for payload in measured]
+        wall = time.perf_counter() - started
+
+        samples = np.asarray([latency for latency, _ in outcomes])
+        pipeline = PIPELINE_METRICS.snapshot()
+        return {
+            "requests": len(measured),
+            "concurrency": concurrency,
+            "p50_ms": round(float(np.percentile(samples, 50)), 2),
+            "p95_ms": round(float(np.percentile(samples, 95)), 2),
+            "p99_ms": round(float(np.percentile(samples, 99)), 2),
+            "requests_per_second": round(len(measured) / wall, 1) if wall > 0 else None,
+            # Requests that missed the deadline budget and were served degraded, per level.
+            "degradation": dict(Counter(level for _, level in outcomes)),
+            "stages_ms": {
+                name: {"mean": round(stats["sum"] / stats["count"], 2), "p95": stats["p95"]}
+                for name, stats in pipeline["stages_ms"].items()
+                if stats["count"]
+            },
+        }
+
+    def _print_result(self, result: Dict[str, object]) -> None:
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Catalog {result['catalog_size']:,}: p50 {result['p50_ms']:.1f} ms | p95 {result['p95_ms']:.1f} ms | "
+                f"p99 {result['p99_ms']:.1f} ms | {result['requests_per_second']} req/s "
+                f"({result['requests']} request, {result['concurrency']} luồng)"
+            )
+        )
+        self.stdout.write(f"    Mức suy giảm: {result['degradation']}")
+        for name, stats in result["stages_ms"].items():
+            self.stdout.write(f"    {name:<20} trung bình {stats['mean']:.2f} ms, p95 ~{stats['p95']} ms")
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import gc
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recommendations.services.vocabulary import Vocabulary
+
+
+def _rss_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as fp:
+            resident_pages = int(fp.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError, AttributeError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the compact Vocabulary against a plain dict for the NCF user encoder (or a synthetic "
+        "one): memory held and per-lookup latency. RSS deltas are indicative (the allocator reuses freed "
+        "arenas); traced allocations are exact."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=500_000, help="Số khóa khi dùng vocabulary giả lập.")
+        parser.add_argument("--lookups", type=int, default=200_000, help="Số lần tra cứu để đo độ trễ.")
+        parser.add_argument(
+            "--synthetic",
+            action="store_true",
+            help="Bỏ qua user_encoder.json thật và sinh khóa ngẫu nhiên.",
+        )
+
+    def handle(self, *args, **options):
+        raw = self._raw_encoder(options["synthetic"], options["size"])
+        keys = list(json.loads(raw).keys())
+        self.stdout.write(f"Vocabulary: {len(keys):,} khóa")
+
+        rng = random.Random(0)
+        probes = [rng.choice(keys) for _ in range(options["lookups"])]
+        probes += [f"missing-{idx}" for idx in range(options["lookups"] // 10)]
+        rng.shuffle(probes)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # Written up front so the transient dict used to build it is not charged to the loads.
+            Vocabulary.from_mapping(json.loads(raw)).save(tmp, "bench")
+            gc.collect()
+            builders: Dict[str, Callable[[], object]] = {
+                "Vocabulary (mmap)": lambda: Vocabulary.load(tmp, "bench", mmap=True),
+                "Vocabulary": lambda: Vocabulary.load(tmp, "bench", mmap=False),
+                "dict": lambda: json.loads(raw),
+            }
+            for name, build in builders.items():
+                table, rss_delta, traced = self._measure_memory(build)
+                latency_ns = self._lookup_latency(table, probes)
+                rss_text = f"{rss_delta / 1024**2:.1f} MB" if rss_delta is not None else "n/a"
+                self.stdout.write(
+                    f"  {name:<18} RSS +{rss_text:<9} traced {traced / 1024**2:.1f} MB, "
+                    f"tra cứu p50 {latency_ns:.0f} ns"
+                )
+                del table
+                gc.collect()
+
+    @staticmethod
+    def _raw_encoder(synthetic: bool, size: int) -> str:
+        path = Path(settings.ML_ARTIFACTS["NCF_DIR"]) / "user_encoder.json"
+        if not synthetic and path.exists():
+            return path.read_text(encoding="utf-8")
+        rng = random.Random(42)
+        return json.dumps({str(rng.randrange(10**9, 10**11)): idx for idx in range(size)})
+
+    @staticmethod
+    def _measure_memory(build: Callable[[], object]):
+        gc.collect()
+        rss_before = _rss_bytes()
+        tracemalloc.start()
+        table = build()
+        gc.collect()
+        traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_after = _rss_bytes()
+        rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        return table, rss_delta, traced
+
+    @staticmethod
+    def _lookup_latency(table, probes: List[str], rounds: int = 5) -> float:
+        get = table.get
+        samples = []
+        for _ in range(rounds):
+            started = time.perf_counter_ns()
+            for key in probes:
+                get(key)
+            samples.append((time.perf_counter_ns() - started) / len(probes))
+        return statistics.median(samples)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import copy
+import statistics
+import time
+from typing import Callable, Tuple
+
+import torch
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.services.dnn import DNNRecommendationService, SephoraDNN
+from recommendations.services.ncf import NCFRecommendationService, NeuMF
+from recommendations.services.runtime import RUNTIME_EAGER, RUNTIMES, prepare_for_inference
+
+
+def _synthetic_dnn() -> Tuple[SephoraDNN, Callable[[int], Tuple[torch.Tensor, ...]]]:
+    features = ["author_id", "skin_type", "skin_tone", "product_id", "brand_name", "primary_category"]
+    sizes = {feature: (500, 16) for feature in features}
+    model = SephoraDNN(features, sizes, numeric_dim=12, highlight_dim=40).eval()
+
+    def inputs(batch: int):
+        return (
+            torch.randint(0, 500, (batch, len(features))),
+            torch.randn(batch, 12),
+            (torch.rand(batch, 40) > 0.8).float(),
+        )
+
+    return model, inputs
+
+
+def _synthetic_ncf() -> Tuple[NeuMF, Callable[[int], Tuple[torch.Tensor, ...]]]:
+    model = NeuMF(num_users=5000, num_items=3000, embedding_dim=64, hidden_dims=[128, 64], dropout=0.2).eval()
+
+    def inputs(batch: int):
+        return torch.full((batch,), 7, dtype=torch.long), torch.randint(0, 3000, (batch,))
+
+    return model, inputs
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the optimized inference runtimes against the eager DNN/NeuMF models: score parity "
+        "(max |delta| after sigmoid) and CPU latency per batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200, help="Số ứng viên mỗi lần chấm điểm.")
+        parser.add_argument("--iterations", type=int, default=50, help="Số lần đo cho mỗi runtime.")
+        parser.add_argument("--tolerance", type=float, default=0.01, help="Sai lệch điểm tối đa cho phép.")
+        parser.add_argument(
+            "--synthetic",
+            action="store_true",
+            help="Dùng model khởi tạo ngẫu nhiên khi thiếu artifacts đã train.",
+        )
+
+    def handle(self, *args, **options):
+        torch.manual_seed(0)
+        failures = []
+        for name, (model, make_inputs) in self._models(options["synthetic"]).items():
+            inputs = make_inputs(options["batch_size"])
+            with torch.no_grad():
+                reference = torch.sigmoid(model(*inputs))
+            eager_ms = self._latency(model, inputs, options["iterations"], torch.no_grad)
+            self.stdout.write(f"{name}: eager p50 {eager_ms:.2f} ms / {options['batch_size']} ứng viên")
+
+            for runtime in RUNTIMES:
+                if runtime == RUNTIME_EAGER:
+                    continue
+                optimized = prepare_for_inference(copy.deepcopy(model), make_inputs(2), runtime)
+                with torch.inference_mode():
+                    scores = torch.sigmoid(optimized(*inputs))
+                delta = (scores - reference).abs().max().item()
+                latency_ms = self._latency(optimized, inputs, options["iterations"], torch.inference_mode)
+                line = (
+                    f"  {runtime}: max |delta| {delta:.6f}, p50 {latency_ms:.2f} ms "
+                    f"(x{eager_ms / latency_ms:.2f} so với eager)"
+                )
+                if delta > options["tolerance"]:
+                    failures.append(f"{name}/{runtime}")
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(self.style.SUCCESS(line))
+
+        if failures:
+            raise CommandError(f"Sai lệch vượt ngưỡng {options['tolerance']}: {', '.join(failures)}")
+
+    def _models(self, synthetic: bool):
+        loaders = {"dnn": self._dnn_from_artifacts, "ncf": self._ncf_from_artifacts}
+        fallbacks = {"dnn": _synthetic_dnn, "ncf": _synthetic_ncf}
+        models = {}
+        for name, loader in loaders.items():
+            try:
+                models[name] = loader()
+            except FileNotFoundError as exc:
+                if not synthetic:
+                    raise CommandError(f"Thiếu artifacts cho {name}: {exc}. Dùng --synthetic để kiểm tra.")
+                self.stdout.write(self.style.WARNING(f"{name}: không có artifacts, dùng model ngẫu nhiên."))
+                models[name] = fallbacks[name]()
+        return models
+
+    @staticmethod
+    def _dnn_from_artifacts():
+        model, encoder = DNNRecommendationService(settings.ML_ARTIFACTS["DNN_DIR"]).load_artifacts()
+        _, num_dim, highlight_dim = encoder.dims
+        sizes = [len(encoder.categorical_maps.get(feature, {"<unk>": 0})) for feature in encoder.categorical_features]
+
+        def inputs(batch: int):
+            categorical = torch.stack([torch.randint(0, size, (batch,)) for size in sizes], dim=1)
+            return (
+                categorical,
+                torch.randn(batch, num_dim),
+                (torch.rand(batch, highlight_dim) > 0.8).float(),
+            )
+
+        return model, inputs
+
+    @staticmethod
+    def _ncf_from_artifacts():
+        model, user_encoder, item_encoder = NCFRecommendationService(settings.ML_ARTIFACTS["NCF_DIR"]).load_artifacts()
+        num_users, num_items = len(user_encoder), len(item_encoder)
+
+        def inputs(batch: int):
+            user = torch.full((batch,), int(torch.randint(0, num_users, (1,))), dtype=torch.long)
+            return user, torch.randint(0, num_items, (batch,))
+
+        return model, inputs
+
+    @staticmethod
+    def _latency(model, inputs, iterations: int, context) -> float:
+        timings = []
+        with context():
+            for _ in range(10):
+                model(*inputs)
+            for _ in range(max(1, iterations)):
+                started = time.perf_counter()
+                model(*inputs)
+                timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
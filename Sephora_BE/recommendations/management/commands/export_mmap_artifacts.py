@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import torch
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.services.mmap_artifacts import MMAP_SUBDIR, export_mapped_artifacts, source_fingerprint
+from recommendations.services.vocabulary import categorical_vocabularies
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the trained DNN/NCF artifacts as .npy tensors and sorted vocabulary tables under "
+        "<artifacts>/mmap so every worker can memory-map them (ML_ARTIFACTS['MMAP_ARTIFACTS'])."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            choices=["dnn", "ncf", "all"],
+            default="all",
+            help="Model cần export (mặc định: cả hai).",
+        )
+
+    def handle(self, *args, **options):
+        exporters = {"dnn": self._export_dnn, "ncf": self._export_ncf}
+        selected = exporters if options["model"] == "all" else {options["model"]: exporters[options["model"]]}
+        for name, export in selected.items():
+            try:
+                target = export()
+            except FileNotFoundError as exc:
+                raise CommandError(f"Thiếu artifacts cho {name}: {exc}")
+            size_mb = sum(path.stat().st_size for path in target.rglob("*") if path.is_file()) / 1024**2
+            self.stdout.write(self.style.SUCCESS(f"Đã export {name} vào {target} ({size_mb:.1f} MB)."))
+
+    @staticmethod
+    def _export_dnn() -> Path:
+        artifacts_dir = Path(settings.ML_ARTIFACTS["DNN_DIR"])
+        metadata_path = artifacts_dir / "dnn_metadata.pt"
+        weights_path = artifacts_dir / "dnn_best_model.pt"
+        metadata = torch.load(metadata_path, map_location="cpu")
+        state = torch.load(weights_path, map_location="cpu")
+        vocabularies = {
+            f"categorical.{feature}": vocabulary
+            for feature, vocabulary in categorical_vocabularies(metadata, artifacts_dir).items()
+        }
+        plain_metadata = {
+            key: value for key, value in metadata.items() if key not in ("categorical_maps", "categorical_vocab_dir")
+        }
+        return export_mapped_artifacts(
+            artifacts_dir / MMAP_SUBDIR,
+            "dnn",
+            state,
+            vocabularies,
+            json.loads(json.dumps(plain_metadata, default=list)),
+            fingerprint=source_fingerprint([metadata_path, weights_path]),
+        )
+
+    @staticmethod
+    def _export_ncf() -> Path:
+        artifacts_dir = Path(settings.ML_ARTIFACTS["NCF_DIR"])
+        sources = [
+            artifacts_dir / "ncf_metrics.json",
+            artifacts_dir / "ncf_model.pt",
+            artifacts_dir / "user_encoder.json",
+            artifacts_dir / "item_encoder.json",
+        ]
+        metrics_path, model_path, user_encoder_path, item_encoder_path = sources
+        config = json.loads(metrics_path.read_text(encoding="utf-8")).get("config", {})
+        vocabularies = {
+            "user": json.loads(user_encoder_path.read_text(encoding="utf-8")),
+            "item": json.loads(item_encoder_path.read_text(encoding="utf-8")),
+        }
+        return export_mapped_artifacts(
+            artifacts_dir / MMAP_SUBDIR,
+            "ncf",
+            torch.load(model_path, map_location="cpu"),
+            vocabularies,
+            {"config": config},
+            fingerprint=source_fingerprint(sources),
+        )
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations import views
+from recommendations.models import ProductFeatureSnapshot
+from recommendations.services.dnn import DNNRecommendationService
+from recommendations.services.product_tower import PRODUCT_TOWER_SUBDIR, ProductTowerTable
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the product tower of a two-tower DNN over every product with a feature snapshot and "
+        "store the vectors under <DNN_DIR>/product_tower, so personalized search only runs the "
+        "user tower and the interaction head per request. Re-run after retraining or a catalog sync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=512, help="Số sản phẩm mỗi lô encode.")
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options["chunk_size"])
+        # Local weights even when the views score through the inference server.
+        service = DNNRecommendationService(settings.ML_ARTIFACTS["DNN_DIR"])
+        try:
+            service.compute_product_vectors([])
+        except FileNotFoundError as exc:
+            raise CommandError(f"Thiếu artifacts DNN: {exc}")
+        except ValueError:
+            raise CommandError("Model DNN hiện tại không phải two_tower (train với --architecture two_tower).")
+
+        started = time.perf_counter()
+        snapshots = ProductFeatureSnapshot.objects.select_related("product").order_by("pk")
+        product_ids = []
+        chunks = []
+        batch = []
+        for snapshot in snapshots.iterator(chunk_size=chunk_size):
+            batch.append(views._build_product_record(snapshot.to_metadata_row(product=snapshot.product)))
+            if len(batch) >= chunk_size:
+                chunks.append(service.compute_product_vectors(batch))
+                product_ids.extend(str(record["product_id"]) for record in batch)
+                batch = []
+        if batch:
+            chunks.append(service.compute_product_vectors(batch))
+            product_ids.extend(str(record["product_id"]) for record in batch)
+        if not chunks:
+            raise CommandError("Không có ProductFeatureSnapshot nào, hãy chạy sync_product_metadata trước.")
+
+        vectors = np.concatenate(chunks)
+        target = ProductTowerTable.save(
+            service.artifacts_dir / PRODUCT_TOWER_SUBDIR,
+            product_ids,
+            vectors,
+            fingerprint=service.artifacts_fingerprint(),
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Đã lưu {len(product_ids)} vector sản phẩm ({vectors.shape[1]} chiều) vào {target} "
+                f"trong {elapsed:.1f}s. Khởi động lại worker để dùng bảng mới."
+            )
+        )
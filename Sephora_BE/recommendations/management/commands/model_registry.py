@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.services.artifact_registry import MODELS, ArtifactRegistry, RegistryError
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage versioned DNN/NCF artifacts under ML_ARTIFACTS['MODEL_REGISTRY_DIR']: publish a trained "
+        "artifacts directory (run export_mmap_artifacts / export_product_tower on it first), list "
+        "versions with their metrics, activate one or roll back. Serving workers and the inference "
+        "server pick up the active version within MODEL_REGISTRY_POLL_SECONDS, after a canary check."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--registry", default="", help="Thư mục registry (mặc định lấy từ settings).")
+        actions = parser.add_subparsers(dest="action", required=True)
+
+        listing = actions.add_parser("list", help="Liệt kê các phiên bản và phiên bản đang dùng.")
+        listing.add_argument("model", nargs="?", choices=MODELS)
+
+        publish = actions.add_parser("publish", help="Đưa một thư mục artifacts vào registry.")
+        publish.add_argument("model", choices=MODELS)
+        publish.add_argument("source", help="Thư mục artifacts vừa train.")
+        publish.add_argument("--name", default=None, help="Tên phiên bản (mặc định: thời gian + checksum).")
+        publish.add_argument("--activate", action="store_true", help="Kích hoạt ngay sau khi publish.")
+
+        activate = actions.add_parser("activate", help="Chuyển sang một phiên bản đã publish.")
+        activate.add_argument("model", choices=MODELS)
+        activate.add_argument("version")
+
+        rollback = actions.add_parser("rollback", help="Quay lại phiên bản đang dùng trước đó.")
+        rollback.add_argument("model", choices=MODELS)
+
+        verify = actions.add_parser("verify", help="Kiểm tra checksum của một phiên bản.")
+        verify.add_argument("model", choices=MODELS)
+        verify.add_argument("version", nargs="?", help="Mặc định: phiên bản đang dùng.")
+
+    def handle(self, *args, **options):
+        root = options["registry"] or settings.ML_ARTIFACTS.get("MODEL_REGISTRY_DIR", "")
+        if not root:
+            raise CommandError("Chưa cấu hình registry (--registry hoặc MODEL_REGISTRY_DIR).")
+        registry = ArtifactRegistry(root)
+        try:
+            getattr(self, f"_{options['action']}")(registry, options)
+        except RegistryError as exc:
+            raise CommandError(str(exc)) from exc
+
+    def _list(self, registry: ArtifactRegistry, options) -> None:
+        for model in [options["model"]] if options["model"] else MODELS:
+            active = registry.active_version(model)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{model} (đang dùng: {active or '-'})"))
+            for manifest in registry.versions(model):
+                marker = "*" if manifest["version"] == active else " "
+                created = time.strftime("%Y-%m-%d %H:%M", time.localtime(manifest["created_at"]))
+                self.stdout.write(
+                    f" {marker} {manifest['version']:<28} {created}  {self._summary(manifest.get('metrics', {}))}"
+                )
+
+    def _publish(self, registry: ArtifactRegistry, options) -> None:
+        manifest = registry.publish(options["model"], options["source"], version=options["name"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Đã publish {options['model']} phiên bản {manifest['version']} ({manifest['checksum'][:19]}...)."
+            )
+        )
+        if options["activate"]:
+            self._switched(options["model"], registry.activate(options["model"], manifest["version"]))
+
+    def _activate(self, registry: ArtifactRegistry, options) -> None:
+        self._switched(options["model"], registry.activate(options["model"], options["version"]))
+
+    def _rollback(self, registry: ArtifactRegistry, options) -> None:
+        self._switched(options["model"], registry.rollback(options["model"]))
+
+    def _verify(self, registry: ArtifactRegistry, options) -> None:
+        version = options["version"] or registry.active_version(options["model"])
+        if not version:
+            raise CommandError(f"{options['model']} chưa có phiên bản đang dùng.")
+        if not registry.verify(options["model"], version):
+            raise CommandError(f"Checksum của {options['model']} {version} không khớp manifest.")
+        self.stdout.write(self.style.SUCCESS(f"{options['model']} {version}: checksum khớp."))
+
+    def _switched(self, model: str, pointer) -> None:
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{model} đang dùng phiên bản {pointer['version']}; các worker sẽ chuyển sau khi canary đạt."
+            )
+        )
+
+    @staticmethod
+    def _summary(metrics) -> str:
+        test_metrics = metrics.get("test_metrics", {})
+        parts = [f"{name}={value:.4f}" for name, value in test_metrics.items() if isinstance(value, float)]
+        if metrics.get("architecture"):
+            parts.insert(0, metrics["architecture"])
+        return " ".join(parts)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from recommendations import views
+from recommendations.models import MlEntityMap, PrecomputedRecommendation, RecommendationConfig
+from recommendations.services.content_filter import CONTENT_FILTER
+from recommendations.services.precomputed import model_version
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Score the no-query ranking of every active user with a saved skin profile or a legacy "
+        "(dataset) author id, in chunks, and store the top-N product ids and scores in "
+        "PrecomputedRecommendation for the personalized_search fast path. Meant to run nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-n", type=int, default=10, help="Số sản phẩm lưu cho mỗi người dùng.")
+        parser.add_argument("--chunk-size", type=int, default=200, help="Số người dùng mỗi lô ghi.")
+        parser.add_argument(
+            "--only-stale",
+            action="store_true",
+            help="Bỏ qua người dùng đã có kết quả mới hơn --max-age-hours với cùng model version.",
+        )
+        parser.add_argument("--max-age-hours", type=float, default=20.0, help="Ngưỡng tuổi dùng cho --only-stale.")
+        parser.add_argument("--email", action="append", dest="emails", help="Chỉ tính cho email này (lặp lại được).")
+
+    def handle(self, *args, **options):
+        top_n = max(1, options["top_n"])
+        chunk_size = max(1, options["chunk_size"])
+        config = RecommendationConfig.load()
+        version = model_version(config)
+
+        legacy_links = MlEntityMap.objects.filter(entity_type="user", user=OuterRef("pk"))
+        users = (
+            User.objects.filter(isactive=True)
+            .filter(Q(Exists(legacy_links)) | ~Q(skintype=""))
+            .order_by("pk")
+        )
+        if options["emails"]:
+            users = users.filter(email__in=options["emails"])
+        if options["only_stale"]:
+            fresh = PrecomputedRecommendation.objects.filter(
+                user=OuterRef("pk"),
+                model_version=version,
+                computed_at__gte=timezone.now() - timedelta(hours=options["max_age_hours"]),
+            )
+            users = users.exclude(Exists(fresh))
+
+        # Rows are served for a day, so score with the full pipeline: build the content
+        # index here instead of in the background and load both models up front.
+        self.stdout.write("Đang dựng content index và nạp mô hình...")
+        CONTENT_FILTER.refresh()
+        views.DNN_SERVICE.warm_up()
+        views.NCF_SERVICE.warm_up()
+
+        started = time.perf_counter()
+        processed = stored = 0
+        last_pk = 0
+        while True:
+            chunk = list(users.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            legacy_ids = dict(
+                MlEntityMap.objects.filter(entity_type="user", user__in=chunk)
+                # Oldest link wins when a user has several.
+                .order_by("-pk")
+                .values_list("user_id", "external_id")
+            )
+            rows = []
+            for user in chunk:
+                _, fingerprint, entries = views.precompute_ranking(
+                    user, config, top_n, legacy_author_id=legacy_ids.get(user.pk, "")
+                )
+                processed += 1
+                if not entries:
+                    continue
+                rows.append(
+                    PrecomputedRecommendation(
+                        user=user,
+                        model_version=version,
+                        profile_fingerprint=fingerprint,
+                        top_n=top_n,
+                        entries=entries,
+                        computed_at=timezone.now(),
+                    )
+                )
+            with transaction.atomic():
+                PrecomputedRecommendation.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=["user"],
+                    update_fields=["model_version", "profile_fingerprint", "top_n", "entries", "computed_at"],
+                )
+            stored += len(rows)
+            self.stdout.write(f"  Đã xử lý {processed} người dùng ({stored} có kết quả)...")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Hoàn tất: {stored}/{processed} người dùng, model version {version}, {elapsed:.1f}s."
+            )
+        )
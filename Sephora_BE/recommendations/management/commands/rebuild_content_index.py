@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from recommendations.services.content_filter import CONTENT_FILTER, publish_content_index_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the TF-IDF content index from ProductFeatureSnapshot and tell running workers "
+        "(through a version stamp in the database) to swap in a fresh copy on their next refresh poll."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-publish",
+            action="store_true",
+            help="Chỉ build để kiểm tra, không báo cho các worker đang chạy.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = CONTENT_FILTER.refresh()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.stdout.write(
+            f"Đã build content index: {index.size} sản phẩm, {len(index.postings)} token trong {elapsed_ms:.0f} ms."
+        )
+        if options["no_publish"]:
+            return
+        version = publish_content_index_version()
+        self.stdout.write(self.style.SUCCESS(f"Đã phát hành phiên bản index {version}."))
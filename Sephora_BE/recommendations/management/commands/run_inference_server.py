@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import os
+import signal
+import threading
+from pathlib import Path
+
+import torch
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations import views
+from recommendations.services.artifact_registry import ModelHotSwapper
+from recommendations.services.dnn import DNNRecommendationService
+from recommendations.services.inference_server import InferenceServer
+from recommendations.services.ncf import NCFRecommendationService
+
+
+def _available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the DNN and NCF models once and serve scoring to the web workers over a Unix socket "
+        "(ML_ARTIFACTS['INFERENCE_SERVER_SOCKET']). Concurrent DNN requests from all workers are "
+        "coalesced by the micro-batcher; torch intra-op threads are pinned to the usable cores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket",
+            default=settings.ML_ARTIFACTS.get("INFERENCE_SERVER_SOCKET", ""),
+            help="Đường dẫn Unix socket (mặc định lấy từ settings).",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=0,
+            help="Số luồng intra-op của torch (0 = số lõi CPU được phép dùng).",
+        )
+        parser.add_argument(
+            "--batch-window-ms",
+            type=float,
+            default=settings.ML_ARTIFACTS.get("INFERENCE_SERVER_BATCH_WINDOW_MS", 2.0),
+            help="Cửa sổ gom batch DNN giữa các worker (0 = không gom).",
+        )
+
+    def handle(self, *args, **options):
+        socket_path = options["socket"]
+        if not socket_path:
+            raise CommandError("Chưa cấu hình đường dẫn socket (--socket hoặc INFERENCE_SERVER_SOCKET).")
+
+        threads = options["threads"] or _available_cores()
+        torch.set_num_threads(threads)
+        # Request-level parallelism comes from the connection threads and the batcher.
+        torch.set_num_interop_threads(1)
+
+        runtime = settings.ML_ARTIFACTS.get("INFERENCE_RUNTIME", "eager")
+        mmap_artifacts = settings.ML_ARTIFACTS.get("MMAP_ARTIFACTS", False)
+
+        def build_dnn(directory: Path) -> DNNRecommendationService:
+            return DNNRecommendationService(
+                directory,
+                runtime=runtime,
+                mmap_artifacts=mmap_artifacts,
+                batch_window_ms=options["batch_window_ms"],
+                max_batch_rows=settings.ML_ARTIFACTS.get("DNN_BATCH_MAX_ROWS", 1024),
+            )
+
+        def build_ncf(directory: Path) -> NCFRecommendationService:
+            return NCFRecommendationService(
+                directory,
+                runtime=runtime,
+                mmap_artifacts=mmap_artifacts,
+                retrieval_n_probe=settings.ML_ARTIFACTS.get("NCF_RETRIEVAL_N_PROBE", 8),
+            )
+
+        dnn_service = build_dnn(views.active_artifacts_dir("dnn"))
+        ncf_service = build_ncf(views.active_artifacts_dir("ncf"))
+        self.stdout.write("Đang nạp model DNN và NCF...")
+        try:
+            dnn_service.warm_up()
+            ncf_service.warm_up()
+        except FileNotFoundError as exc:
+            raise CommandError(f"Thiếu artifacts: {exc}") from exc
+
+        server = InferenceServer(socket_path, dnn_service, ncf_service)
+        swapper = None
+        if views.MODEL_REGISTRY is not None:
+            swapper = self._follow_registry(server, build_dnn, build_ncf)
+
+        def stop(*_):
+            # shutdown() blocks until serve_forever returns, so it cannot run on that thread.
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Inference server lắng nghe tại {socket_path} "
+                f"({threads} luồng torch, cửa sổ batch {options['batch_window_ms']} ms)."
+            )
+        )
+        try:
+            server.serve_forever()
+        except RuntimeError as exc:
+            raise CommandError(str(exc)) from exc
+        finally:
+            if swapper is not None:
+                swapper.stop_background_refresh()
+        self.stdout.write("Đã dừng inference server.")
+
+    def _follow_registry(self, server: InferenceServer, build_dnn, build_ncf) -> ModelHotSwapper:
+        """Swap the server's models when the registry activates another version."""
+        registry = views.MODEL_REGISTRY
+
+        def install_dnn(service: DNNRecommendationService, directory: Path) -> None:
+            previous, server.dnn_service = server.dnn_service, service
+            previous.close()
+
+        def install_ncf(service: NCFRecommendationService, directory: Path) -> None:
+            server.ncf_service = service
+
+        swapper = ModelHotSwapper(
+            registry, poll_seconds=settings.ML_ARTIFACTS.get("MODEL_REGISTRY_POLL_SECONDS", 10)
+        )
+        swapper.register("dnn", registry.active_version("dnn"), build_dnn, views.dnn_canary, install_dnn)
+        swapper.register("ncf", registry.active_version("ncf"), build_ncf, views.ncf_canary, install_ncf)
+        swapper.start_background_refresh()
+        self.stdout.write(f"Theo dõi model registry tại {registry.root}.")
+        return swapper
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recommendations", "0006_personalizedfeedback_retrain_required"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recommendationconfig",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def fill_ingredients_text(apps, schema_editor):
+    ProductFeatureSnapshot = apps.get_model("recommendations", "ProductFeatureSnapshot")
+    batch = []
+    for snapshot in ProductFeatureSnapshot.objects.only("id", "ingredients").iterator(chunk_size=500):
+        snapshot.ingredients_text = " ".join(snapshot.ingredients or []).lower()
+        batch.append(snapshot)
+        if len(batch) >= 500:
+            ProductFeatureSnapshot.objects.bulk_update(batch, ["ingredients_text"])
+            batch = []
+    if batch:
+        ProductFeatureSnapshot.objects.bulk_update(batch, ["ingredients_text"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recommendations", "0007_recommendationconfig_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productfeaturesnapshot",
+            name="ingredients_text",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.RunPython(fill_ingredients_text, migrations.RunPython.noop),
+    ]
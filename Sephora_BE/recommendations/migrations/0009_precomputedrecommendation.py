@@ -0,0 +1,47 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recommendations", "0008_productfeaturesnapshot_ingredients_text"),
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PrecomputedRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model_version", models.CharField(max_length=64)),
+                ("profile_fingerprint", models.CharField(max_length=64)),
+                ("top_n", models.PositiveSmallIntegerField()),
+                ("entries", models.JSONField(default=list)),
+                (
+                    "computed_at",
+                    models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="precomputed_recommendation",
+                        to="users.user",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "precomputed_recommendation",
+            },
+        ),
+    ]
@@ -142,6 +142,8 @@ class ProductFeatureSnapshot(models.Model):
     child_count = models.IntegerField(default=0)
     child_min_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     child_max_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Derived from ``ingredients`` on save so requests never join/lowercase the list.
+    ingredients_text = models.TextField(blank=True, default="", editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -150,12 +152,23 @@ class ProductFeatureSnapshot(models.Model):
             models.Index(fields=["external_id"]),
         ]
 
-    def to_metadata_row(self):
-        from .services.product_metadata import ProductMetadataRow
+    def save(self, *args, **kwargs):
+        from .services.product_metadata import join_ingredients
 
+        self.ingredients_text = join_ingredients(self.ingredients)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "ingredients" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "ingredients_text"}
+        super().save(*args, **kwargs)
+
+    def to_metadata_row(self, product=None):
+        """Build the ML metadata row; pass ``product`` when it is already loaded."""
+        from .services.product_metadata import ProductMetadataRow, join_ingredients
+
+        product = product or self.product
         return ProductMetadataRow(
             product_id=self.external_id,
-            product_name=self.product.product_name,
+            product_name=product.product_name,
             brand_id=self.brand_id,
             brand_name=self.brand_name,
             loves_count=self.loves_count,
@@ -177,12 +190,35 @@ class ProductFeatureSnapshot(models.Model):
             child_count=self.child_count,
             child_min_price=float(self.child_min_price or 0),
             child_max_price=float(self.child_max_price or 0),
+            ingredients_text=self.ingredients_text or join_ingredients(self.ingredients),
         )
 
     def __str__(self) -> str:
         return f"{self.external_id} metadata"
 
 
+class PrecomputedRecommendation(models.Model):
+    """Top-N no-query ranking for one user, written by ``manage.py precompute_recommendations``."""
+
+    user = models.OneToOneField(
+        "users.User",
+        on_delete=models.CASCADE,
+        related_name="precomputed_recommendation",
+    )
+    model_version = models.CharField(max_length=64)
+    profile_fingerprint = models.CharField(max_length=64)
+    top_n = models.PositiveSmallIntegerField()
+    # [{"product_id", "scores", "match_percentage", "ranking"}, ...] in rank order.
+    entries = models.JSONField(default=list)
+    computed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = "precomputed_recommendation"
+
+    def __str__(self) -> str:
+        return f"{self.user_id} top-{self.top_n} ({self.model_version})"
+
+
 class RecommendationConfig(models.Model):
     """Configurable weights/settings for the recommendation pipeline."""
 
@@ -191,6 +227,7 @@ class RecommendationConfig(models.Model):
     max_results = models.IntegerField(default=10)
     updated_at = models.DateTimeField(auto_now=True)
     updated_by = models.CharField(max_length=255, blank=True)
+    version = models.PositiveIntegerField(default=1)
 
     class Meta:
         db_table = "recommendation_config"
@@ -202,6 +239,18 @@ class RecommendationConfig(models.Model):
             config = cls.objects.create()
         return config
 
+    def save(self, *args, **kwargs):
+        bump = not self._state.adding
+        if bump:
+            # Incremented in SQL so two concurrent admin saves never publish the same version.
+            self.version = models.F("version") + 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "version", "updated_at"}
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=["version"])
+
     def as_dict(self) -> dict:
         return {
             "dnn_weight": self.dnn_weight,
@@ -209,4 +258,19 @@ class RecommendationConfig(models.Model):
             "max_results": self.max_results,
             "updated_at": self.updated_at,
             "updated_by": self.updated_by,
-        }
\ No newline at end of file
+            "version": self.version,
+        }
+
+
+class RecommendationVersionStamp(models.Model):
+    """Counter shared by every worker; bumping it tells them to drop derived in-memory state."""
+
+    key = models.CharField(max_length=64, unique=True)
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "recommendation_version_stamp"
+
+    def __str__(self) -> str:
+        return f"{self.key}@{self.version}"
@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+import torch
+from django.db import close_old_connections
+
+LOGGER = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+ACTIVE_POINTER = "ACTIVE"
+# Activations remembered for rollback.
+HISTORY_LIMIT = 20
+
+# Files a version must contain; everything else in the directory (vocab/, mmap/,
+# product_tower/, training history) is copied along and covered by the checksum.
+REQUIRED_FILES: Dict[str, Sequence[str]] = {
+    "dnn": ("dnn_metadata.pt", "dnn_best_model.pt"),
+    "ncf": ("ncf_metrics.json", "ncf_model.pt", "user_encoder.json", "item_encoder.json"),
+}
+METRICS_FILES = {"dnn": "training_metrics.json", "ncf": "ncf_metrics.json"}
+MODELS = tuple(REQUIRED_FILES)
+
+
+class RegistryError(RuntimeError):
+    """The registry cannot publish, find or activate the requested version."""
+
+
+class CanaryError(RuntimeError):
+    """A freshly loaded version produced unusable scores on the canary batch."""
+
+
+def directory_checksum(directory: Path) -> str:
+    """sha256 over every file below ``directory`` (relative path and content), manifest excluded."""
+    digest = hashlib.sha256()
+    for path in sorted(directory.rglob("*")):
+        if not path.is_file() or path.name == MANIFEST_NAME:
+            continue
+        digest.update(path.relative_to(directory).as_posix().encode("utf-8") + b"\0")
+        with path.open("rb") as handle:
+            for chunk in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(chunk)
+    return f"sha256:{digest.hexdigest()}"
+
+
+def check_canary_scores(scores: Sequence[float | None], expected: int) -> None:
+    """Raise CanaryError unless ``scores`` holds ``expected`` finite probabilities."""
+    if len(scores) != expected:
+        raise CanaryError(f"expected {expected} scores, got {len(scores)}")
+    for score in scores:
+        if score is None:
+            continue
+        if not math.isfinite(score) or not 0.0 <= score <= 1.0:
+            raise CanaryError(f"score {score!r} is not a probability")
+
+
+def _write_json_atomic(path: Path, payload: Dict[str, object]) -> None:
+    staging = path.with_name(f"{path.name}.tmp")
+    staging.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(staging, path)
+
+
+class ArtifactRegistry:
+    """Versioned DNN/NCF artifacts with an active-version pointer per model.
+
+    Layout::
+
+        <root>/<model>/<version>/...            a complete artifacts directory
+        <root>/<model>/<version>/manifest.json  checksum, training metrics, schema
+        <root>/<model>/ACTIVE                   {"version": ..., "history": [...]}
+
+    Versions are immutable once published; serving processes follow the ``ACTIVE``
+    pointer (see ModelHotSwapper), which is replaced atomically on activate/rollback.
+    """
+
+    def __init__(self, root: Path | str) -> None:
+        self.root = Path(root)
+
+    def model_dir(self, model: str) -> Path:
+        if model not in REQUIRED_FILES:
+            raise RegistryError(f"Unknown model {model!r}, expected one of {', '.join(MODELS)}")
+        return self.root / model
+
+    def version_dir(self, model: str, version: str) -> Path:
+        return self.model_dir(model) / version
+
+    def manifest(self, model: str, version: str) -> Dict[str, object]:
+        path = self.version_dir(model, version) / MANIFEST_NAME
+        if not path.exists():
+            raise RegistryError(f"{model} version {version!r} is not in the registry")
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def versions(self, model: str) -> List[Dict[str, object]]:
+        """Manifests of every published version, oldest first."""
+        model_dir = self.model_dir(model)
+        if not model_dir.exists():
+            return []
+        manifests = [
+            json.loads((path / MANIFEST_NAME).read_text(encoding="utf-8"))
+            for path in model_dir.iterdir()
+            if (path / MANIFEST_NAME).is_file()
+        ]
+        return sorted(manifests, key=lambda manifest: (manifest.get("created_at", 0), manifest["version"]))
+
+    def active(self, model: str) -> Dict[str, object] | None:
+        path = self.model_dir(model) / ACTIVE_POINTER
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def active_version(self, model: str) -> str | None:
+        pointer = self.active(model)
+        return pointer["version"] if pointer else None
+
+    def active_dir(self, model: str) -> Path | None:
+        version = self.active_version(model)
+        return self.version_dir(model, version) if version else None
+
+    def publish(self, model: str, source_dir: Path | str, version: str | None = None) -> Dict[str, object]:
+        """Copy a trained artifacts directory into the registry as a new version."""
+        source_dir = Path(source_dir)
+        missing = [name for name in REQUIRED_FILES[model] if not (source_dir / name).is_file()]
+        if missing:
+            raise RegistryError(f"{source_dir} is missing {', '.join(missing)}")
+        checksum = directory_checksum(source_dir)
+        version = version or f"{time.strftime('%Y%m%d-%H%M%S')}-{checksum.split(':')[1][:8]}"
+        target = self.version_dir(model, version)
+        if target.exists():
+            raise RegistryError(f"{model} version {version!r} already exists")
+
+        staging = target.with_name(f".{version}.tmp")
+        if staging.exists():
+            shutil.rmtree(staging)
+        # copy2 keeps mtimes, so mmap/ and product_tower/ exports stay valid for the copy.
+        shutil.copytree(source_dir, staging, copy_function=shutil.copy2)
+        manifest = {
+            "model": model,
+            "version": version,
+            "created_at": time.time(),
+            "source": str(source_dir.resolve()),
+            "checksum": checksum,
+            "metrics": self._metrics(model, staging),
+            "schema": self._schema(model, staging),
+        }
+        _write_json_atomic(staging / MANIFEST_NAME, manifest)
+        staging.rename(target)
+        return manifest
+
+    def verify(self, model: str, version: str) -> bool:
+        """True when the files of ``version`` still match its manifest checksum."""
+        manifest = self.manifest(model, version)
+        return directory_checksum(self.version_dir(model, version)) == manifest["checksum"]
+
+    def activate(self, model: str, version: str) -> Dict[str, object]:
+        """Point ``model`` at ``version``; the previous active version is kept for rollback."""
+        self.manifest(model, version)
+        pointer = self.active(model) or {"version": None, "history": []}
+        history = list(pointer.get("history", []))
+        if pointer["version"] and pointer["version"] != version:
+            history = (history + [pointer["version"]])[-HISTORY_LIMIT:]
+        return self._point(model, version, history)
+
+    def rollback(self, model: str) -> Dict[str, object]:
+        """Re-activate the version that was active before the current one."""
+        pointer = self.active(model)
+        history = list(pointer.get("history", [])) if pointer else []
+        if not history:
+            raise RegistryError(f"No earlier {model} version to roll back to")
+        return self._point(model, history[-1], history[:-1])
+
+    def _point(self, model: str, version: str, history: List[str]) -> Dict[str, object]:
+        pointer = {"version": version, "history": history, "activated_at": time.time()}
+        self.model_dir(model).mkdir(parents=True, exist_ok=True)
+        _write_json_atomic(self.model_dir(model) / ACTIVE_POINTER, pointer)
+        return pointer
+
+    @staticmethod
+    def _metrics(model: str, directory: Path) -> Dict[str, object]:
+        path = directory / METRICS_FILES[model]
+        if not path.exists():
+            return {}
+        metrics = json.loads(path.read_text(encoding="utf-8"))
+        # Per-epoch history and hyper-parameters are not metrics; the latter land in the schema.
+        return {key: value for key, value in metrics.items() if key not in ("history", "config")}
+
+    @staticmethod
+    def _schema(model: str, directory: Path) -> Dict[str, object]:
+        if model == "ncf":
+            metrics = json.loads((directory / "ncf_metrics.json").read_text(encoding="utf-8"))
+            config = metrics.get("config", {})
+            return {
+                "embedding_dim": config.get("embedding_dim", 64),
+                "hidden_dims": config.get("hidden_dims", [128, 64]),
+                "num_users": metrics.get("num_users"),
+                "num_items": metrics.get("num_items"),
+            }
+        metadata = torch.load(directory / "dnn_metadata.pt", map_location="cpu")
+        schema = {
+            key: value
+            for key, value in metadata.items()
+            if key not in ("categorical_maps", "categorical_vocab_dir", "numeric_mean", "numeric_std")
+        }
+        schema.setdefault("architecture", "concat")
+        return json.loads(json.dumps(schema, default=list))
+
+
+class ModelHotSwapper:
+    """Follow the registry's ACTIVE pointers and swap models in without a restart.
+
+    For every ``register``-ed model a daemon thread polls the pointer. When it moves,
+    the new version is built (``build(directory)``), warmed up and checked with
+    ``canary(service)`` while the current one keeps serving; only then ``install``
+    publishes it, which must be a single reference assignment. A version that fails
+    is remembered and not retried until the pointer moves again.
+    """
+
+    def __init__(self, registry: ArtifactRegistry, poll_seconds: float = 10.0) -> None:
+        self.registry = registry
+        self.poll_seconds = max(0.5, float(poll_seconds))
+        self._slots: Dict[str, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def register(
+        self,
+        model: str,
+        version: str | None,
+        build: Callable[[Path], object],
+        canary: Callable[[object], None],
+        install: Callable[[object, Path], None],
+    ) -> None:
+        with self._lock:
+            self._slots[model] = {
+                "build": build,
+                "canary": canary,
+                "install": install,
+                "version": version,
+                "state": "serving" if version else "unversioned",
+                "failed_version": None,
+                "last_error": "",
+                "swapped_at": None,
+            }
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                model: {key: value for key, value in slot.items() if key not in ("build", "canary", "install")}
+                for model, slot in self._slots.items()
+            }
+
+    def check_now(self) -> Dict[str, str]:
+        """Swap every model whose pointer moved; returns model -> outcome."""
+        outcomes = {}
+        with self._swap_lock:
+            for model in list(self._slots):
+                outcome = self._check(model)
+                if outcome:
+                    outcomes[model] = outcome
+        return outcomes
+
+    def start_background_refresh(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll_loop, name="model-registry-watch", daemon=True)
+            self._thread.start()
+
+    def stop_background_refresh(self) -> None:
+        self._stop.set()
+
+    def _poll_loop(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check_now()
+            except Exception:  # pragma: no cover - keep serving the current versions
+                LOGGER.exception("Model registry poll failed")
+            finally:
+                # Canaries query the catalog from this thread.
+                close_old_connections()
+
+    def _check(self, model: str) -> str | None:
+        slot = self._slots[model]
+        version = self.registry.active_version(model)
+        if not version or version == slot["version"] or version == slot["failed_version"]:
+            return None
+        directory = self.registry.version_dir(model, version)
+        self._update(model, state="loading")
+        started = time.perf_counter()
+        service = None
+        try:
+            if not self.registry.verify(model, version):
+                raise RegistryError(f"checksum mismatch in {directory}")
+            service = slot["build"](directory)
+            service.warm_up()
+            slot["canary"](service)
+            slot["install"](service, directory)
+        except Exception as exc:
+            LOGGER.exception("Not swapping %s to version %s", model, version)
+            self._discard(service)
+            self._update(
+                model,
+                state="serving" if slot["version"] else "unversioned",
+                failed_version=version,
+                last_error=f"{type(exc).__name__}: {exc}",
+            )
+            return "failed"
+        LOGGER.info(
+            "Swapped %s from %s to %s in %.0f ms",
+            model,
+            slot["version"],
+            version,
+            (time.perf_counter() - started) * 1000.0,
+        )
+        self._update(model, version=version, state="serving", failed_version=None, last_error="", swapped_at=time.time())
+        return "swapped"
+
+    @staticmethod
+    def _discard(service: object) -> None:
+        """Close a candidate that never went live so its batcher thread does not leak."""
+        close = getattr(service, "close", None)
+        if close is None:
+            return
+        try:
+            close()
+        except Exception:
+            LOGGER.exception("Closing the rejected candidate failed")
+
+    def _update(self, model: str, **fields: object) -> None:
+        with self._lock:
+            self._slots[model].update(fields)
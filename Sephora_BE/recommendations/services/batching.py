@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import torch
+
+from .timing import COUNT_BUCKETS, LATENCY_BUCKETS_MS, Histogram
+
+BATCH_ROW_BUCKETS = (*COUNT_BUCKETS, 1000, 2000, 4000)
+# Queued by ``close`` behind the pending requests to stop the worker.
+_CLOSE = object()
+
+
+@dataclass
+class _PendingBatch:
+    tensors: Tuple[torch.Tensor, ...]
+    rows: int
+    enqueued: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+
+
+class InferenceBatcher:
+    """Coalesce concurrent forward passes into one.
+
+    Callers ``submit`` already-encoded input tensors (batch-first) and block on the
+    returned future. A daemon worker takes the first waiting request, keeps collecting
+    until ``window_ms`` has passed since that request arrived or ``max_rows`` rows are
+    gathered, concatenates the inputs, runs ``forward`` once and hands each caller its
+    slice of the output. A request larger than ``max_rows`` runs on its own. After
+    ``close`` the worker drains the queue and exits; later requests run unbatched.
+    """
+
+    def __init__(
+        self,
+        forward: Callable[..., torch.Tensor],
+        window_ms: float = 2.0,
+        max_rows: int = 1024,
+        name: str = "inference-batcher",
+    ) -> None:
+        self.forward = forward
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.max_rows = max(1, int(max_rows))
+        self.name = name
+        self._queue: "queue.Queue[_PendingBatch]" = queue.Queue()
+        self._carry: _PendingBatch | None = None
+        self._thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+        self._close_lock = threading.Lock()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._batch_rows = Histogram(BATCH_ROW_BUCKETS)
+        self._requests_per_batch = Histogram(COUNT_BUCKETS)
+        self._queue_delay_ms = Histogram(LATENCY_BUCKETS_MS)
+        self._failures = 0
+
+    def submit(self, tensors: Sequence[torch.Tensor]) -> Future:
+        item = _PendingBatch(tensors=tuple(tensors), rows=int(tensors[0].shape[0]))
+        with self._close_lock:
+            if not self._closed:
+                self._ensure_thread()
+                self._queue.put(item)
+                return item.future
+        self._execute([item], item.rows)
+        return item.future
+
+    def close(self) -> None:
+        """Let the worker finish what is queued and exit (the batcher's owner is being replaced)."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(_CLOSE)
+
+    def run(self, tensors: Sequence[torch.Tensor]) -> torch.Tensor:
+        return self.submit(tensors).result()
+
+    def stats(self) -> Dict[str, object]:
+        with self._stats_lock:
+            return {
+                "window_ms": round(self.window * 1000.0, 3),
+                "max_rows": self.max_rows,
+                "batches": self._batch_rows.count,
+                "failures": self._failures,
+                "batch_rows": self._batch_rows.snapshot(),
+                "requests_per_batch": self._requests_per_batch.snapshot(),
+                "queue_delay_ms": self._queue_delay_ms.snapshot(),
+            }
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _next(self, timeout: float | None):
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+            return item
+        try:
+            return self._queue.get(timeout=timeout) if timeout is None or timeout > 0 else self._queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _run(self) -> None:
+        while True:
+            first = self._next(None)
+            if first is _CLOSE:
+                return
+            batch: List[_PendingBatch] = [first]
+            rows = first.rows
+            deadline = first.enqueued + self.window
+            while rows < self.max_rows:
+                item = self._next(deadline - time.monotonic())
+                if item is None:
+                    break
+                if item is _CLOSE:
+                    self._carry = item
+                    break
+                if rows + item.rows > self.max_rows:
+                    self._carry = item
+                    break
+                batch.append(item)
+                rows += item.rows
+            self._execute(batch, rows)
+
+    def _execute(self, batch: List[_PendingBatch], rows: int) -> None:
+        started = time.monotonic()
+        try:
+            if len(batch) == 1:
+                inputs = batch[0].tensors
+            else:
+                inputs = tuple(torch.cat(parts, dim=0) for parts in zip(*(item.tensors for item in batch)))
+            outputs = self.forward(*inputs)
+        except Exception as exc:
+            with self._stats_lock:
+                self._failures += 1
+            for item in batch:
+                item.future.set_exception(exc)
+            return
+        offset = 0
+        for item in batch:
+            item.future.set_result(outputs[offset : offset + item.rows])
+            offset += item.rows
+        with self._stats_lock:
+            self._batch_rows.observe(rows)
+            self._requests_per_batch.observe(len(batch))
+            for item in batch:
+                self._queue_delay_ms.observe((started - item.enqueued) * 1000.0)
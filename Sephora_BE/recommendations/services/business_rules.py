@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+BUDGET_THRESHOLDS_USD = {
+    "under_500k": {"min": 0.0, "max": 22.0},
+    "500k_1m": {"min": 18.0, "max": 43.0},
+    "over_1m": {"min": 40.0, "max": None},
+}
+
+CLIMATE_KEYWORDS = {
+    "hot_humid": {
+        "positive": ["oil-free", "non-greasy", "gel", "foam", "matte", "lightweight"],
+        "negative": ["rich", "butter", "heavy"],
+    },
+    "air_con": {
+        "positive": ["hydrating", "moisture", "hyaluronic", "soothing", "calming"],
+        "negative": [],
+    },
+    "cool_dry": {
+        "positive": ["rich", "ceramide", "cream", "shea", "butter", "barrier"],
+        "negative": ["oil-free", "matte"],
+    },
+}
+
+ROUTINE_RULES = {
+    "minimal": {
+        "boost": ["cleanser", "cleaners", "moisturizer", "sunscreen"],
+        "penalize": ["serum", "treatment", "mask", "peel", "essence"],
+    },
+    "advanced": {
+        "boost": ["serum", "treatment", "essence", "ampoule", "booster"],
+        "penalize": [],
+    },
+}
+
+# Multipliers applied on top of the blended model score.
+NEW_PRODUCT_BOOST = 1.05
+HIGH_RATING_BOOST = 1.03
+POPULAR_BOOST = 1.02
+KEYWORD_BOOST = 1.03
+KEYWORD_PENALTY = 0.95
+BRAND_REPEAT_PENALTY = 0.95
+BRAND_REPEAT_ALLOWANCE = 2
+OUT_OF_STOCK_SCORE = -1.0
+
+FLAG_COLUMNS: List[str] = [
+    "out_of_stock",
+    "new",
+    "high_rating",
+    "popular",
+    *(f"climate.{climate}.{polarity}" for climate in CLIMATE_KEYWORDS for polarity in ("positive", "negative")),
+    *(f"routine.{focus}.{kind}" for focus in ROUTINE_RULES for kind in ("boost", "penalize")),
+]
+FLAG_INDEX = {name: position for position, name in enumerate(FLAG_COLUMNS)}
+
+
+@dataclass(frozen=True)
+class ProductRuleFeatures:
+    flags: np.ndarray
+    price: float
+    brand: str
+
+
+def _match_keyword(text: str, keywords: Iterable[str]) -> bool:
+    return any(keyword in text for keyword in keywords)
+
+
+def compute_product_features(metadata_row, product) -> ProductRuleFeatures:
+    """Evaluate every keyword/threshold rule for one product."""
+    flags = np.zeros(len(FLAG_COLUMNS), dtype=bool)
+    flags[FLAG_INDEX["out_of_stock"]] = bool(metadata_row.out_of_stock)
+    flags[FLAG_INDEX["new"]] = bool(getattr(product, "is_new", False) or metadata_row.new)
+    flags[FLAG_INDEX["high_rating"]] = bool(metadata_row.rating and metadata_row.rating >= 4.5)
+    flags[FLAG_INDEX["popular"]] = bool(metadata_row.reviews and metadata_row.reviews >= 1000)
+
+    text_parts = [*(metadata_row.highlights or []), *(metadata_row.ingredients or [])]
+    if getattr(product, "description", None):
+        text_parts.append(product.description)
+    text = " ".join(text_parts).lower()
+    for climate, rules in CLIMATE_KEYWORDS.items():
+        for polarity in ("positive", "negative"):
+            flags[FLAG_INDEX[f"climate.{climate}.{polarity}"]] = _match_keyword(text, rules[polarity])
+
+    category_text = " ".join(
+        filter(
+            None,
+            [
+                (metadata_row.primary_category or "").lower(),
+                (metadata_row.secondary_category or "").lower(),
+                (metadata_row.tertiary_category or "").lower(),
+            ],
+        )
+    )
+    for focus, rules in ROUTINE_RULES.items():
+        for kind in ("boost", "penalize"):
+            flags[FLAG_INDEX[f"routine.{focus}.{kind}"]] = _match_keyword(category_text, rules[kind])
+
+    return ProductRuleFeatures(
+        flags=flags,
+        price=float(metadata_row.price_usd or 0.0),
+        brand=(metadata_row.brand_name or "").lower(),
+    )
+
+
+class BusinessRuleEngine:
+    """Re-rank candidate scores with the declarative rules above.
+
+    Keyword and threshold checks are evaluated once per product and cached by product
+    id (catalog signals drop stale rows); a request only stacks the cached flags and
+    applies each rule as an array multiplication over the candidate vector.
+    """
+
+    def __init__(self) -> None:
+        self._features: Dict[int, ProductRuleFeatures] = {}
+        self._lock = threading.Lock()
+
+    def product_features(self, product_id: int, metadata_row, product) -> ProductRuleFeatures:
+        features = self._features.get(product_id)
+        if features is None:
+            features = compute_product_features(metadata_row, product)
+            with self._lock:
+                self._features[product_id] = features
+        return features
+
+    def invalidate_products(self, product_ids: Iterable[int] | None = None) -> None:
+        with self._lock:
+            if product_ids is None:
+                self._features.clear()
+                return
+            for product_id in product_ids:
+                self._features.pop(product_id, None)
+
+    def apply(
+        self,
+        scores: Sequence[float],
+        features: Sequence[ProductRuleFeatures],
+        skin_profile: dict,
+    ) -> np.ndarray:
+        scores = np.array(scores, dtype=np.float64)
+        if not len(scores):
+            return scores
+        flags = np.stack([item.flags for item in features])
+        in_stock = ~flags[:, FLAG_INDEX["out_of_stock"]]
+
+        # Multiply rule by rule (not by a folded factor) to keep the historical rounding.
+        scores *= np.where(flags[:, FLAG_INDEX["new"]], NEW_PRODUCT_BOOST, 1.0)
+        scores *= np.where(flags[:, FLAG_INDEX["high_rating"]], HIGH_RATING_BOOST, 1.0)
+        scores *= np.where(flags[:, FLAG_INDEX["popular"]], POPULAR_BOOST, 1.0)
+
+        budget_level = (skin_profile.get("budget_level") or "").lower()
+        if budget_level in BUDGET_THRESHOLDS_USD:
+            prices = np.array([item.price for item in features], dtype=np.float64)
+            scores *= self._budget_multipliers(prices, BUDGET_THRESHOLDS_USD[budget_level])
+
+        climate = (skin_profile.get("climate") or "").lower()
+        if climate in CLIMATE_KEYWORDS:
+            scores *= np.where(flags[:, FLAG_INDEX[f"climate.{climate}.positive"]], KEYWORD_BOOST, 1.0)
+            scores *= np.where(flags[:, FLAG_INDEX[f"climate.{climate}.negative"]], KEYWORD_PENALTY, 1.0)
+
+        routine_focus = (skin_profile.get("routine_focus") or "").lower()
+        if routine_focus in ROUTINE_RULES:
+            scores *= np.where(flags[:, FLAG_INDEX[f"routine.{routine_focus}.boost"]], KEYWORD_BOOST, 1.0)
+            scores *= np.where(flags[:, FLAG_INDEX[f"routine.{routine_focus}.penalize"]], KEYWORD_PENALTY, 1.0)
+
+        scores[~in_stock] = OUT_OF_STOCK_SCORE
+        brands = [item.brand for item in features]
+        self._penalize_brand_repeats(scores, brands, in_stock)
+        return scores
+
+    @staticmethod
+    def _budget_multipliers(prices: np.ndarray, bounds: dict) -> np.ndarray:
+        min_price = bounds.get("min")
+        max_price = bounds.get("max")
+        conditions = [prices <= 0]
+        choices = [1.0]
+        if max_price is not None:
+            conditions += [prices > max_price * 1.15, prices <= max_price]
+            choices += [0.9, 1.03]
+        if min_price is not None:
+            conditions += [prices < min_price * 0.7, prices >= min_price]
+            choices += [0.95, 1.01]
+        # np.select picks the first matching condition, mirroring the if/elif chain.
+        return np.select(conditions, choices, default=1.0)
+
+    @staticmethod
+    def _penalize_brand_repeats(scores: np.ndarray, brands: List[str], in_stock: np.ndarray) -> None:
+        """Beyond the first BRAND_REPEAT_ALLOWANCE products of a brand (by score), apply the penalty."""
+        eligible = in_stock & np.array([bool(brand) for brand in brands])
+        if not eligible.any():
+            return
+        _, codes = np.unique(np.array(brands, dtype=object), return_inverse=True)
+        order = np.argsort(-scores, kind="stable")
+        order = order[eligible[order]]
+        ordered_codes = codes[order]
+        by_brand = np.argsort(ordered_codes, kind="stable")
+        grouped = ordered_codes[by_brand]
+        starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+        group_sizes = np.diff(np.r_[starts, len(grouped)])
+        occurrence = np.empty(len(grouped), dtype=np.int64)
+        occurrence[by_brand] = np.arange(len(grouped)) - np.repeat(starts, group_sizes) + 1
+        scores[order[occurrence > BRAND_REPEAT_ALLOWANCE]] *= BRAND_REPEAT_PENALTY
+
+
+RULE_ENGINE = BusinessRuleEngine()
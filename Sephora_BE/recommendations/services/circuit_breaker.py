@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """The guarded operation failed recently and is not retried yet."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated failures of an expensive operation.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and ``guard``
+    raises CircuitOpenError immediately for ``reset_seconds``. Then one caller is let
+    through as a trial (half-open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 2, reset_seconds: float = 30.0) -> None:
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_seconds = float(reset_seconds)
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._rejected = 0
+        self._last_error = ""
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        self._before_call()
+        try:
+            yield
+        except Exception as exc:
+            self._record_failure(exc)
+            raise
+        self._record_success()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "rejected": self._rejected,
+                "last_error": self._last_error,
+            }
+
+    def _before_call(self) -> None:
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return
+            retry_in = self._opened_at + self.reset_seconds - time.monotonic()
+            if self._state == STATE_OPEN and retry_in <= 0:
+                self._state = STATE_HALF_OPEN
+            if self._state == STATE_HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+            self._rejected += 1
+            message = f"{self.name} unavailable (retry in {max(retry_in, 0.0):.0f}s): {self._last_error}"
+        raise CircuitOpenError(message)
+
+    def _record_success(self) -> None:
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def _record_failure(self, exc: Exception) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            self._last_error = f"{type(exc).__name__}: {exc}"
+            if self._state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = STATE_OPEN
+                self._opened_at = time.monotonic()
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from django.conf import settings
+
+from ..models import RecommendationConfig
+
+
+class RecommendationConfigCache:
+    """Keep the active RecommendationConfig in memory.
+
+    Within ``ttl_seconds`` the cached row is served as is. After that a ``version``-only
+    query is compared with the cached row and the full row is only reloaded when it
+    changed, so a save made through any worker is picked up everywhere within the TTL.
+    ``publish`` is called after a save so the saving worker switches immediately.
+    """
+
+    def __init__(self, ttl_seconds: float = 5.0) -> None:
+        self.ttl_seconds = float(ttl_seconds)
+        self._lock = threading.Lock()
+        self._config: RecommendationConfig | None = None
+        self._checked_at = 0.0
+
+    def get(self) -> RecommendationConfig:
+        now = time.monotonic()
+        with self._lock:
+            config = self._config
+            if config is not None and now - self._checked_at < self.ttl_seconds:
+                return config
+
+        if config is not None and self._current_version() == config.version:
+            with self._lock:
+                self._checked_at = now
+            return config
+
+        config = RecommendationConfig.load()
+        with self._lock:
+            self._config = config
+            self._checked_at = now
+        return config
+
+    def publish(self, config: RecommendationConfig) -> None:
+        """Drop the local copy after ``config`` was saved; other workers notice within the TTL."""
+        with self._lock:
+            self._config = None
+            self._checked_at = 0.0
+
+    @staticmethod
+    def _current_version() -> int | None:
+        return RecommendationConfig.objects.order_by("pk").values_list("version", flat=True).first()
+
+
+CONFIG_CACHE = RecommendationConfigCache(
+    ttl_seconds=settings.ML_ARTIFACTS.get("RECOMMENDATION_CONFIG_TTL_SECONDS", 5),
+)
@@ -2,16 +2,30 @@ from __future__ import annotations
 
 import logging
 import threading
-from typing import Dict, List
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
 
 import math
 import re
 
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+
 from products.models import Product
 from ..models import ProductFeatureSnapshot
+from .version_stamp import VersionStamp
 
 LOGGER = logging.getLogger(__name__)
 
+CONTENT_INDEX_POLL_SECONDS = 5.0
+# Window in which queued catalog edits are collected into one incremental update.
+UPDATE_BATCH_SECONDS = 0.5
+# Bumped by manage.py rebuild_content_index and after every committed catalog edit (see
+# signals.py); the refresher already throttles its reads.
+CONTENT_INDEX_STAMP = VersionStamp("content_index", ttl_seconds=0)
+
 
 TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
 
@@ -52,87 +66,478 @@ def _normalize_query(search_query: str, skin_profile: dict) -> str:
     return " ".join(tokens)
 
 
-class ContentBasedFilter:
-    """Lightweight TF scores to narrow candidate products without external deps."""
+def _query_vector(tokens: List[str], idf: Dict[str, float]) -> Tuple[Dict[str, float], float]:
+    counts: Dict[str, int] = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    total = sum(counts.values()) or 1
+    query_vector: Dict[str, float] = {
+        token: (count / total) * idf.get(token, 1.0) for token, count in counts.items()
+    }
+    query_norm = math.sqrt(sum(v * v for v in query_vector.values())) or 1.0
+    return query_vector, query_norm
+
+
+def _idf_value(total_docs: int, freq: int) -> float:
+    return math.log((total_docs + 1) / (freq + 1)) + 1.0
+
+
+def _count_tokens(tokens: List[str]) -> Dict[str, int]:
+    token_counts: Dict[str, int] = {}
+    for token in tokens:
+        token_counts[token] = token_counts.get(token, 0) + 1
+    return token_counts
+
+
+def _document_entry(snapshot: ProductFeatureSnapshot) -> Tuple[Dict[str, int], Tuple[str, ...]] | None:
+    tokens = _tokenize(_build_document(snapshot.product, snapshot))
+    if not tokens:
+        return None
+    ingredients = tuple((item or "").lower() for item in (snapshot.ingredients or []))
+    return _count_tokens(tokens), ingredients
+
+
+@dataclass(frozen=True)
+class ContentIndex:
+    """Immutable TF-IDF inverted index; updates return a new index instead of mutating this one.
+
+    ``base_idf``/``base_docs`` record the IDF values baked into the document weights at the
+    last full build. Incremental updates only reweight the touched document, so ``drift``
+    tracks how far the live IDF has moved away from those baked-in values.
+    """
+
+    postings: Dict[str, Tuple[np.ndarray, np.ndarray]]
+    doc_norms: np.ndarray
+    idf: Dict[str, float]
+    product_ids: Tuple[int, ...]
+    doc_ingredients: Tuple[Tuple[str, ...], ...]
+    doc_tokens: Tuple[Tuple[str, ...], ...] = ()
+    doc_freq: Dict[str, int] = field(default_factory=dict)
+    positions: Dict[int, int] = field(default_factory=dict)
+    base_idf: Dict[str, float] = field(default_factory=dict)
+    base_docs: int = 0
+    drift: float = 0.0
+    built_at: float = field(default_factory=time.time)
+
+    @property
+    def size(self) -> int:
+        return len(self.positions)
+
+    def rank(self, tokens: List[str], allergy: str = "", limit: int = 250) -> List[int]:
+        if not self.postings or not self.product_ids or not tokens:
+            return []
+        query_vector, query_norm = _query_vector(tokens, self.idf)
 
-    def __init__(self) -> None:
-        self._lock = threading.Lock()
-        self._doc_vectors: List[Dict[str, float]] = []
-        self._doc_norms: List[float] = []
-        self._idf: Dict[str, float] = {}
-        self._product_ids: List[int] = []
-        self._snapshot_by_product: Dict[int, ProductFeatureSnapshot] = {}
-        self._loaded = False
-
-    def refresh(self) -> None:
-        with self._lock:
-            self._load()
+        # Only documents sharing a token with the query can score above zero.
+        dots = np.zeros(len(self.product_ids), dtype=np.float64)
+        for token, value in query_vector.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            docs, weights = posting
+            dots[docs] += value * weights
+        similarities = dots / (self.doc_norms * query_norm)
+        matched = np.flatnonzero(similarities > 0)
+        if matched.size == 0:
+            return []
 
-    def _ensure_loaded(self) -> None:
-        if self._loaded:
-            return
-        with self._lock:
-            if not self._loaded:
-                self._load()
-                self._loaded = True
-
-    def _load(self) -> None:
-        tokens_per_doc: List[Dict[str, int]] = []
-        doc_freq: Dict[str, int] = {}
-        ids: List[int] = []
-        self._snapshot_by_product.clear()
-
-        snapshots = ProductFeatureSnapshot.objects.select_related("product").all()
-        for snapshot in snapshots:
-            product = snapshot.product
-            doc = _build_document(product, snapshot)
-            tokens = _tokenize(doc)
-            if not tokens:
+        if limit and not allergy and matched.size > limit:
+            # Keep everything tied with the limit-th score so the final order stays exact.
+            threshold = np.partition(similarities[matched], -limit)[-limit]
+            matched = matched[similarities[matched] >= threshold]
+        # Highest similarity first, ties keep catalog order (same as a stable sort).
+        ordered = matched[np.lexsort((matched, -similarities[matched]))]
+
+        ranked_ids: List[int] = []
+        for doc_idx in ordered.tolist():
+            if allergy and any(allergy in ingredient for ingredient in self.doc_ingredients[doc_idx]):
                 continue
-            token_counts: Dict[str, int] = {}
-            for token in tokens:
-                token_counts[token] = token_counts.get(token, 0) + 1
-            for token in token_counts.keys():
-                doc_freq[token] = doc_freq.get(token, 0) + 1
-            tokens_per_doc.append(token_counts)
-            ids.append(product.productid)
-            self._snapshot_by_product[product.productid] = snapshot
-
-        if not tokens_per_doc:
-            self._doc_vectors = []
-            self._doc_norms = []
-            self._idf = {}
-            self._product_ids = []
-            LOGGER.warning("ContentBasedFilter: no product documents available.")
-            return
+            ranked_ids.append(self.product_ids[doc_idx])
+            if limit and len(ranked_ids) >= limit:
+                break
+        return ranked_ids
 
-        total_docs = len(tokens_per_doc)
-        self._idf = {
-            token: math.log((total_docs + 1) / (freq + 1)) + 1.0 for token, freq in doc_freq.items()
-        }
-        self._doc_vectors = []
-        self._doc_norms = []
-        self._product_ids = ids
+    def replace_documents(
+        self,
+        entries: Dict[int, Tuple[Dict[str, int], Tuple[str, ...]] | None],
+    ) -> "ContentIndex":
+        """Return a copy with the given products' postings, document frequencies and IDFs updated.
+
+        ``entries`` maps a product id to its ``(token_counts, ingredients)`` pair, or to
+        ``None`` to drop it. The top-level containers are copied once per call, so
+        ContentBasedFilter hands over every edit queued since the last batch together;
+        a removed product leaves an empty slot until the next rebuild.
+        """
+        postings = dict(self.postings)
+        doc_freq = dict(self.doc_freq)
+        idf = dict(self.idf)
+        positions = dict(self.positions)
+        product_ids = list(self.product_ids)
+        doc_ingredients = list(self.doc_ingredients)
+        doc_tokens = list(self.doc_tokens)
+        doc_norms = self.doc_norms.copy()
+        appended_norms: List[float] = []
+        affected: set[str] = set()
+
+        for product_id, entry in entries.items():
+            slot = positions.pop(product_id, None)
+            old_tokens: Tuple[str, ...] = doc_tokens[slot] if slot is not None else ()
+            for token in old_tokens:
+                docs, weights = postings[token]
+                keep = docs != slot
+                if keep.any():
+                    postings[token] = (docs[keep], weights[keep])
+                else:
+                    del postings[token]
+                doc_freq[token] -= 1
+                if not doc_freq[token]:
+                    del doc_freq[token]
+            if slot is not None:
+                doc_tokens[slot] = ()
+                doc_ingredients[slot] = ()
+
+            token_counts, ingredients = entry if entry else ({}, ())
+            live_docs = len(positions) + (1 if token_counts else 0)
+            for token in token_counts:
+                doc_freq[token] = doc_freq.get(token, 0) + 1
+            touched = set(old_tokens) | set(token_counts)
+            for token in touched:
+                if token in doc_freq:
+                    idf[token] = _idf_value(live_docs, doc_freq[token])
+                else:
+                    idf.pop(token, None)
+            affected |= touched
+            if not token_counts:
+                continue
 
-        for token_counts in tokens_per_doc:
+            if slot is None:
+                slot = len(product_ids)
+                product_ids.append(product_id)
+                doc_ingredients.append(ingredients)
+                doc_tokens.append(tuple(token_counts))
+                appended_norms.append(1.0)
+            else:
+                product_ids[slot] = product_id
+                doc_ingredients[slot] = ingredients
+                doc_tokens[slot] = tuple(token_counts)
+            positions[product_id] = slot
             length = sum(token_counts.values()) or 1
-            vector: Dict[str, float] = {}
+            squared = 0.0
             for token, count in token_counts.items():
-                tf = count / length
-                vector[token] = tf * self._idf.get(token, 1.0)
-            norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
-            self._doc_vectors.append(vector)
-            self._doc_norms.append(norm)
-
-        LOGGER.info("ContentBasedFilter indexed %s products for candidate selection", len(ids))
-
-    def _cosine(self, vec: Dict[str, float], norm: float, query_vec: Dict[str, float], query_norm: float) -> float:
-        dot = 0.0
-        for token, value in query_vec.items():
-            dot += value * vec.get(token, 0.0)
-        if not dot or not norm or not query_norm:
-            return 0.0
-        return dot / (norm * query_norm)
+                weight = (count / length) * idf[token]
+                docs, weights = postings.get(token, (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)))
+                postings[token] = (np.append(docs, slot), np.append(weights, weight))
+                squared += weight * weight
+            norm = math.sqrt(squared) or 1.0
+            if slot < len(doc_norms):
+                doc_norms[slot] = norm
+            else:
+                appended_norms[slot - len(doc_norms)] = norm
+
+        if appended_norms:
+            doc_norms = np.concatenate([doc_norms, np.asarray(appended_norms, dtype=np.float64)])
+
+        # Every IDF shifts with the document count; touched tokens shift with their frequency too.
+        drift = max(self.drift, abs(math.log((len(positions) + 1) / (self.base_docs + 1))))
+        for token in affected:
+            base = self.base_idf.get(token)
+            if base and token in idf:
+                drift = max(drift, abs(idf[token] - base) / base)
+
+        return ContentIndex(
+            postings=postings,
+            doc_norms=doc_norms,
+            idf=idf,
+            product_ids=tuple(product_ids),
+            doc_ingredients=tuple(doc_ingredients),
+            doc_tokens=tuple(doc_tokens),
+            doc_freq=doc_freq,
+            positions=positions,
+            base_idf=self.base_idf,
+            base_docs=self.base_docs,
+            drift=drift,
+            built_at=self.built_at,
+        )
+
+
+EMPTY_INDEX = ContentIndex(
+    postings={},
+    doc_norms=np.zeros(0, dtype=np.float64),
+    idf={},
+    product_ids=(),
+    doc_ingredients=(),
+)
+
+
+def build_content_index() -> ContentIndex:
+    """Scan every ProductFeatureSnapshot and build a fresh index off to the side."""
+    tokens_per_doc: List[Dict[str, int]] = []
+    doc_freq: Dict[str, int] = {}
+    ids: List[int] = []
+    ingredients: List[Tuple[str, ...]] = []
+
+    snapshots = ProductFeatureSnapshot.objects.select_related("product").all()
+    for snapshot in snapshots:
+        entry = _document_entry(snapshot)
+        if entry is None:
+            continue
+        token_counts, doc_ingredients = entry
+        for token in token_counts.keys():
+            doc_freq[token] = doc_freq.get(token, 0) + 1
+        tokens_per_doc.append(token_counts)
+        ids.append(snapshot.product.productid)
+        ingredients.append(doc_ingredients)
+
+    if not tokens_per_doc:
+        LOGGER.warning("ContentBasedFilter: no product documents available.")
+        return EMPTY_INDEX
+
+    total_docs = len(tokens_per_doc)
+    idf = {token: _idf_value(total_docs, freq) for token, freq in doc_freq.items()}
+    posting_docs: Dict[str, List[int]] = {}
+    posting_weights: Dict[str, List[float]] = {}
+    norms: List[float] = []
+
+    for doc_idx, token_counts in enumerate(tokens_per_doc):
+        length = sum(token_counts.values()) or 1
+        squared = 0.0
+        for token, count in token_counts.items():
+            tf = count / length
+            weight = tf * idf.get(token, 1.0)
+            posting_docs.setdefault(token, []).append(doc_idx)
+            posting_weights.setdefault(token, []).append(weight)
+            squared += weight * weight
+        norms.append(math.sqrt(squared) or 1.0)
+
+    index = ContentIndex(
+        postings={
+            token: (
+                np.asarray(docs, dtype=np.int64),
+                np.asarray(posting_weights[token], dtype=np.float64),
+            )
+            for token, docs in posting_docs.items()
+        },
+        doc_norms=np.asarray(norms, dtype=np.float64),
+        idf=idf,
+        product_ids=tuple(ids),
+        doc_ingredients=tuple(ingredients),
+        doc_tokens=tuple(tuple(token_counts) for token_counts in tokens_per_doc),
+        doc_freq=doc_freq,
+        positions={product_id: slot for slot, product_id in enumerate(ids)},
+        base_idf=dict(idf),
+        base_docs=total_docs,
+    )
+    LOGGER.info("ContentBasedFilter indexed %s products for candidate selection", index.size)
+    return index
+
+
+def _load_documents(product_ids) -> Dict[int, Tuple[Dict[str, int], Tuple[str, ...]] | None]:
+    """Current document of each product in one query; ``None`` for products without a snapshot."""
+    entries: Dict[int, Tuple[Dict[str, int], Tuple[str, ...]] | None] = dict.fromkeys(product_ids)
+    snapshots = ProductFeatureSnapshot.objects.select_related("product").filter(product_id__in=entries)
+    for snapshot in snapshots:
+        entries[snapshot.product_id] = _document_entry(snapshot)
+    return entries
+
+
+class ContentBasedFilter:
+    """Serve candidate lookups from the current ContentIndex and keep it fresh.
+
+    Readers grab ``self._index`` once per query and never take a lock. Full rebuilds hold
+    ``self._lock`` only to serialize concurrent builds; product updates and the final swap
+    go through the short ``self._swap_lock``. Catalog edits only queue the product id; a
+    background thread applies everything queued within ``UPDATE_BATCH_SECONDS`` as one
+    new index, so a burst of saves costs one copy of the index instead of one per save.
+    Products updated while a rebuild is scanning the catalog are re-applied on top of
+    the new index before it goes live.
+    Until the first build finishes, lookups return no candidates and the view falls back
+    to its database queries without caching the result.
+
+    Edits committed by other processes reach this worker through ``CONTENT_INDEX_STAMP``:
+    when the refresher sees a new version it calls the catalog listeners (which drop the
+    per-product caches of the rule engine and the DNN encoders) and rebuilds the index.
+    ``index_version`` is the version the live index was built at.
+    """
+
+    def __init__(self, refresh_interval: float = 0.0, max_idf_drift: float = 0.05) -> None:
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._index: ContentIndex | None = None
+        self._pending: set[int] | None = None
+        self._queued: set[int] = set()
+        self._queued_event = threading.Event()
+        self._updater: threading.Thread | None = None
+        self._refresh_interval = max(0.0, float(refresh_interval or 0.0))
+        self._max_idf_drift = float(max_idf_drift)
+        self._refresher: threading.Thread | None = None
+        self._refresher_lock = threading.Lock()
+        self._rebuild_thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._published_version: int | None = None
+        self._catalog_listeners: List[Callable[[], None]] = []
+
+    @property
+    def index(self) -> ContentIndex | None:
+        return self._index
+
+    @property
+    def index_version(self) -> int | None:
+        return self._published_version
+
+    def add_catalog_listener(self, listener: Callable[[], None]) -> None:
+        """Call ``listener`` whenever the refresher sees a newly published catalog version."""
+        self._catalog_listeners.append(listener)
+
+    def refresh(self) -> ContentIndex:
+        """Build a new index without touching the live one, then swap the reference."""
+        with self._lock:
+            # Read before scanning: the index holds at least every edit published so far.
+            version = self._poll_published_version()
+            with self._swap_lock:
+                self._pending = set()
+            try:
+                index = build_content_index()
+            except Exception:
+                with self._swap_lock:
+                    self._pending = None
+                raise
+            with self._swap_lock:
+                pending, self._pending = self._pending, None
+                if pending:
+                    index = index.replace_documents(_load_documents(pending))
+                self._index = index
+                self._published_version = version
+        return index
+
+    def update_product(self, product_id: int) -> None:
+        """Queue one product for re-indexing from its current snapshot (or removal if it is gone)."""
+        if self._index is None and self._pending is None:
+            return
+        with self._swap_lock:
+            if self._pending is not None:
+                self._pending.add(product_id)
+            self._queued.add(product_id)
+        self._ensure_updater()
+        self._queued_event.set()
+
+    def apply_queued_updates(self) -> int:
+        """Apply every queued product update now; returns how many products were re-indexed."""
+        with self._swap_lock:
+            product_ids, self._queued = self._queued, set()
+        if not product_ids:
+            return 0
+        entries = _load_documents(product_ids)
+        with self._swap_lock:
+            index = self._index
+            if index is None:
+                return 0
+            entries = {
+                product_id: entry
+                for product_id, entry in entries.items()
+                if entry is not None or product_id in index.positions
+            }
+            if not entries:
+                return 0
+            index = index.replace_documents(entries)
+            self._index = index
+        if self._max_idf_drift and index.drift > self._max_idf_drift:
+            LOGGER.info("ContentBasedFilter: IDF drift %.3f exceeded, scheduling full rebuild", index.drift)
+            self.request_rebuild()
+        return len(entries)
+
+    def _ensure_updater(self) -> None:
+        with self._refresher_lock:
+            if self._updater is not None and self._updater.is_alive():
+                return
+            self._updater = threading.Thread(target=self._update_loop, name="content-index-update", daemon=True)
+            self._updater.start()
+
+    def _update_loop(self) -> None:
+        while not self._stop.is_set():
+            self._queued_event.wait()
+            # Let a burst of saves (catalog import, admin bulk edit) pile up into one batch.
+            self._stop.wait(UPDATE_BATCH_SECONDS)
+            self._queued_event.clear()
+            try:
+                self.apply_queued_updates()
+            except Exception:  # pragma: no cover - the next rebuild picks the products up
+                LOGGER.exception("ContentBasedFilter: incremental update failed")
+            finally:
+                close_old_connections()
+
+    def request_rebuild(self) -> None:
+        with self._refresher_lock:
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return
+            self._rebuild_thread = threading.Thread(
+                target=self._safe_refresh,
+                name="content-index-rebuild",
+                daemon=True,
+            )
+            self._rebuild_thread.start()
+
+    def start_background_refresh(self) -> None:
+        with self._refresher_lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._stop.clear()
+            self._refresher = threading.Thread(
+                target=self._refresh_loop,
+                name="content-index-refresh",
+                daemon=True,
+            )
+            self._refresher.start()
+
+    def warm_up(self) -> None:
+        """Build the first index now and keep it fresh in the background afterwards."""
+        if self._index is None:
+            self.refresh()
+        self.start_background_refresh()
+
+    def stop_background_refresh(self) -> None:
+        self._stop.set()
+
+    def _safe_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception:  # pragma: no cover - keep serving the previous index
+            LOGGER.exception("ContentBasedFilter: background rebuild failed, keeping previous index")
+
+    def _refresh_loop(self) -> None:
+        if self._index is None:
+            self._safe_refresh()
+        elif self._published_version is None:
+            self._published_version = self._poll_published_version()
+        if not self._refresh_interval:
+            close_old_connections()
+            return
+        poll = min(CONTENT_INDEX_POLL_SECONDS, self._refresh_interval)
+        last_build = time.monotonic()
+        while not self._stop.wait(poll):
+            published = self._poll_published_version()
+            due = time.monotonic() - last_build >= self._refresh_interval
+            changed = published is not None and published != self._published_version
+            if changed:
+                self._notify_catalog_listeners()
+            if due or changed:
+                self._safe_refresh()
+                last_build = time.monotonic()
+            close_old_connections()
+
+    def _notify_catalog_listeners(self) -> None:
+        for listener in self._catalog_listeners:
+            try:
+                listener()
+            except Exception:  # pragma: no cover - the other caches still get dropped
+                LOGGER.exception("ContentBasedFilter: catalog listener %r failed", listener)
+
+    @staticmethod
+    def _poll_published_version() -> int | None:
+        try:
+            return CONTENT_INDEX_STAMP.current()
+        except Exception:  # pragma: no cover - try again on the next poll
+            LOGGER.exception("ContentBasedFilter: could not read the published index version")
+            return None
 
     def select_candidates(
         self,
@@ -141,47 +546,25 @@ class ContentBasedFilter:
         allergy_term: str | None = None,
         limit: int = 250,
     ) -> List[int]:
-        self._ensure_loaded()
-        if not self._doc_vectors or not self._product_ids:
+        index = self._index
+        if index is None or self._refresher is None:
+            self.start_background_refresh()
+        if index is None:
             return []
 
         query_text = _normalize_query(search_query or "", skin_profile)
         tokens = _tokenize(query_text)
-        if not tokens:
-            return []
-
-        counts: Dict[str, int] = {}
-        for token in tokens:
-            counts[token] = counts.get(token, 0) + 1
-        total = sum(counts.values()) or 1
-        query_vector: Dict[str, float] = {
-            token: (count / total) * self._idf.get(token, 1.0) for token, count in counts.items()
-        }
-        query_norm = math.sqrt(sum(v * v for v in query_vector.values())) or 1.0
-
-        similarities: List[tuple[float, int]] = []
-        for vector, norm, product_id in zip(self._doc_vectors, self._doc_norms, self._product_ids):
-            sim = self._cosine(vector, norm, query_vector, query_norm)
-            if sim > 0:
-                similarities.append((sim, product_id))
-
-        similarities.sort(key=lambda item: item[0], reverse=True)
-        ranked_ids: List[int] = []
         allergy = (allergy_term or "").strip().lower()
+        return index.rank(tokens, allergy=allergy, limit=limit)
 
-        for sim, product_id in similarities:
-            if allergy:
-                snapshot = self._snapshot_by_product.get(product_id)
-                if snapshot and any(
-                    allergy in (ingredient or "").lower() for ingredient in (snapshot.ingredients or [])
-                ):
-                    continue
-            ranked_ids.append(product_id)
-            if limit and len(ranked_ids) >= limit:
-                break
 
-        return ranked_ids
+def publish_content_index_version() -> int:
+    """Ask every worker (through the database) to drop its catalog caches and rebuild the index."""
+    return CONTENT_INDEX_STAMP.bump()
 
 
-CONTENT_FILTER = ContentBasedFilter()
+CONTENT_FILTER = ContentBasedFilter(
+    refresh_interval=settings.ML_ARTIFACTS.get("CONTENT_INDEX_REFRESH_SECONDS", 0),
+    max_idf_drift=settings.ML_ARTIFACTS.get("CONTENT_INDEX_MAX_IDF_DRIFT", 0.05),
+)
 
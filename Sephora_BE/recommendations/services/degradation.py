@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from typing import Dict, List
+
+# Degradation levels of personalized search, least to most severe.
+LEVEL_FULL = "full"
+LEVEL_REDUCED_CANDIDATES = "reduced_candidates"
+LEVEL_NO_NCF = "no_ncf"
+LEVEL_POPULARITY = "popularity"
+LEVELS = (LEVEL_FULL, LEVEL_REDUCED_CANDIDATES, LEVEL_NO_NCF, LEVEL_POPULARITY)
+
+# Below this many rows model scoring is not worth it; rank by popularity instead.
+MIN_SCORED_ROWS = 20
+
+
+class StageCostModel:
+    """Moving average of a model stage's cost per scored row, learned from live calls."""
+
+    def __init__(self, alpha: float = 0.2) -> None:
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._ms_per_row: float | None = None
+
+    @property
+    def ms_per_row(self) -> float | None:
+        with self._lock:
+            return self._ms_per_row
+
+    def observe(self, rows: int, elapsed_ms: float) -> None:
+        if rows <= 0:
+            return
+        sample = elapsed_ms / rows
+        with self._lock:
+            if self._ms_per_row is None:
+                self._ms_per_row = sample
+            else:
+                self._ms_per_row += self.alpha * (sample - self._ms_per_row)
+
+    def estimate_ms(self, rows: int) -> float:
+        per_row = self.ms_per_row
+        return 0.0 if per_row is None else per_row * rows
+
+
+DNN_COST = StageCostModel()
+NCF_COST = StageCostModel()
+
+
+class RequestBudget:
+    """Latency budget of one personalized search and the degradations taken to keep it.
+
+    ``deadline_ms`` counts from construction; ``reserve_ms`` of it is kept for the stages
+    after scoring (business rules, serialization, logging). A zero deadline never runs
+    out, but failures still degrade (see ``degrade``).
+    """
+
+    def __init__(self, deadline_ms: float = 0.0, reserve_ms: float = 0.0) -> None:
+        self.deadline_ms = float(deadline_ms)
+        self.reserve_ms = float(reserve_ms)
+        self._started = time.perf_counter()
+        self.steps: List[str] = []
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000.0
+
+    def remaining_ms(self) -> float:
+        if self.deadline_ms <= 0:
+            return math.inf
+        return self.deadline_ms - self.reserve_ms - self.elapsed_ms()
+
+    def affordable_rows(self, cost: StageCostModel, rows: int) -> int:
+        """How many of ``rows`` the remaining budget can score at the stage's observed cost."""
+        per_row = cost.ms_per_row
+        remaining = self.remaining_ms()
+        if per_row is None or per_row <= 0 or math.isinf(remaining):
+            return rows
+        return max(0, min(rows, int(remaining / per_row)))
+
+    def can_afford(self, cost: StageCostModel, rows: int) -> bool:
+        return cost.estimate_ms(rows) <= self.remaining_ms()
+
+    def degrade(self, level: str) -> None:
+        if level not in self.steps:
+            self.steps.append(level)
+
+    @property
+    def level(self) -> str:
+        return max(self.steps, key=LEVELS.index, default=LEVEL_FULL)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "level": self.level,
+            "steps": list(self.steps),
+            "deadline_ms": self.deadline_ms or None,
+            "elapsed_ms": round(self.elapsed_ms(), 1),
+        }
+
+
+class DegradationStats:
+    """Process-wide count of responses per degradation level."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {level: 0 for level in LEVELS}
+
+    def observe(self, level: str) -> None:
+        with self._lock:
+            self._counts[level] = self._counts.get(level, 0) + 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            "responses": counts,
+            "dnn_ms_per_row": DNN_COST.ms_per_row,
+            "ncf_ms_per_row": NCF_COST.ms_per_row,
+        }
+
+
+DEGRADATION_STATS = DegradationStats()
@@ -1,12 +1,25 @@
 from __future__ import annotations
 
+import logging
+import threading
+import weakref
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Callable, Dict, Iterable, List, Sequence, Set, Tuple
 
+import numpy as np
 import torch
 from torch import nn
 
-from .feature_encoder import DNNFeatureEncoder
+from .batching import InferenceBatcher
+from .circuit_breaker import CircuitBreaker
+from .feature_encoder import USER_CATEGORICAL_FEATURES, USER_NUMERIC_COLUMNS, DNNFeatureEncoder
+from .mmap_artifacts import MMAP_SUBDIR, MappedArtifacts, load_mapped_artifacts, source_fingerprint
+from .product_tower import PRODUCT_TOWER_SUBDIR, ProductTowerTable
+from .runtime import RUNTIME_EAGER, prepare_for_inference
+from .timing import stage
+from .vocabulary import categorical_vocabularies
+
+LOGGER = logging.getLogger(__name__)
 
 
 class ResidualBlock(nn.Module):
@@ -37,6 +50,8 @@ class SephoraDNN(nn.Module):
         embedding_sizes,
         numeric_dim: int,
         highlight_dim: int,
+        hidden_dim: int = 256,
+        num_blocks: int = 2,
     ) -> None:
         super().__init__()
         self.categorical_features = list(categorical_features)
@@ -57,7 +72,6 @@ class SephoraDNN(nn.Module):
         input_dim = total_embed_dim + numeric_dim + highlight_dim
 
         self.input_norm = nn.LayerNorm(input_dim)
-        hidden_dim = 256
         self.feature_proj = nn.Sequential(
             nn.Linear(input_dim, hidden_dim),
             nn.LayerNorm(hidden_dim),
@@ -65,7 +79,7 @@ class SephoraDNN(nn.Module):
         )
 
         self.blocks = nn.ModuleList(
-            [ResidualBlock(hidden_dim, hidden_dim * 2, dropout=0.3) for _ in range(2)]
+            [ResidualBlock(hidden_dim, hidden_dim * 2, dropout=0.3) for _ in range(num_blocks)]
         )
 
         self.head = nn.Sequential(
@@ -97,45 +111,505 @@ class SephoraDNN(nn.Module):
         return logits.squeeze(-1)
 
 
+ARCHITECTURE_CONCAT = "concat"
+ARCHITECTURE_TWO_TOWER = "two_tower"
+
+
+class _Tower(nn.Module):
+    def __init__(
+        self,
+        features: Sequence[str],
+        embedding_sizes,
+        dense_dim: int,
+        hidden_dim: int,
+        out_dim: int,
+    ) -> None:
+        super().__init__()
+        self.features = list(features)
+        self.embeddings = nn.ModuleDict(
+            {
+                feature: nn.Embedding(embedding_sizes[feature][0], embedding_sizes[feature][1], padding_idx=0)
+                for feature in self.features
+            }
+        )
+        input_dim = sum(embedding_sizes[feature][1] for feature in self.features) + dense_dim
+        self.embedding_dropout = nn.Dropout(0.15)
+        self.mlp = nn.Sequential(
+            nn.LayerNorm(input_dim),
+            nn.Linear(input_dim, hidden_dim),
+            nn.GELU(),
+            nn.Dropout(0.2),
+            nn.Linear(hidden_dim, out_dim),
+            nn.LayerNorm(out_dim),
+        )
+
+    def forward(self, categorical: torch.Tensor, dense: torch.Tensor) -> torch.Tensor:
+        embedded: List[torch.Tensor] = [
+            self.embeddings[feature](categorical[:, idx]) for idx, feature in enumerate(self.features)
+        ]
+        if embedded:
+            dense = torch.cat([self.embedding_dropout(torch.cat(embedded, dim=1)), dense], dim=1)
+        return self.mlp(dense)
+
+
+class TwoTowerSephoraDNN(nn.Module):
+    """Serving copy of Model_AI_Sephora_DNN.models.dnn.TwoTowerSephoraDNN."""
+
+    def __init__(
+        self,
+        categorical_features,
+        embedding_sizes,
+        numeric_columns,
+        highlight_dim: int,
+        tower_dim: int = 64,
+        hidden_dim: int = 128,
+        user_categorical_features=USER_CATEGORICAL_FEATURES,
+        user_numeric_columns=USER_NUMERIC_COLUMNS,
+    ) -> None:
+        super().__init__()
+        categorical_features = list(categorical_features)
+        numeric_columns = list(numeric_columns)
+        user_cat = [idx for idx, name in enumerate(categorical_features) if name in user_categorical_features]
+        product_cat = [idx for idx, name in enumerate(categorical_features) if name not in user_categorical_features]
+        user_num = [idx for idx, name in enumerate(numeric_columns) if name in user_numeric_columns]
+        product_num = [idx for idx, name in enumerate(numeric_columns) if name not in user_numeric_columns]
+        self.register_buffer("user_cat_index", torch.tensor(user_cat, dtype=torch.long), persistent=False)
+        self.register_buffer("product_cat_index", torch.tensor(product_cat, dtype=torch.long), persistent=False)
+        self.register_buffer("user_num_index", torch.tensor(user_num, dtype=torch.long), persistent=False)
+        self.register_buffer("product_num_index", torch.tensor(product_num, dtype=torch.long), persistent=False)
+
+        self.user_numeric_ln = nn.LayerNorm(len(user_num)) if user_num else nn.Identity()
+        self.product_numeric_ln = nn.LayerNorm(len(product_num)) if product_num else nn.Identity()
+        self.user_tower = _Tower(
+            [categorical_features[idx] for idx in user_cat], embedding_sizes, len(user_num), hidden_dim, tower_dim
+        )
+        self.product_tower = _Tower(
+            [categorical_features[idx] for idx in product_cat],
+            embedding_sizes,
+            len(product_num) + highlight_dim,
+            hidden_dim,
+            tower_dim,
+        )
+        self.head = nn.Sequential(
+            nn.Linear(tower_dim * 3, 64),
+            nn.GELU(),
+            nn.Dropout(0.1),
+            nn.Linear(64, 1),
+        )
+
+    def encode_users(self, categorical: torch.Tensor, numeric: torch.Tensor) -> torch.Tensor:
+        dense = self.user_numeric_ln(numeric.index_select(1, self.user_num_index))
+        return self.user_tower(categorical.index_select(1, self.user_cat_index), dense)
+
+    def encode_products(self, categorical: torch.Tensor, numeric: torch.Tensor, highlights: torch.Tensor) -> torch.Tensor:
+        dense = self.product_numeric_ln(numeric.index_select(1, self.product_num_index))
+        return self.product_tower(
+            categorical.index_select(1, self.product_cat_index), torch.cat([dense, highlights], dim=1)
+        )
+
+    def score(self, user_vectors: torch.Tensor, product_vectors: torch.Tensor) -> torch.Tensor:
+        user_vectors = user_vectors.expand_as(product_vectors)
+        features = torch.cat([user_vectors, product_vectors, user_vectors * product_vectors], dim=1)
+        return self.head(features).squeeze(-1)
+
+    def forward(self, categorical: torch.Tensor, numeric: torch.Tensor, highlights: torch.Tensor) -> torch.Tensor:
+        return self.score(
+            self.encode_users(categorical, numeric), self.encode_products(categorical, numeric, highlights)
+        )
+
+
+def build_dnn(metadata: Dict[str, object]) -> nn.Module:
+    """The (untrained) network described by ``dnn_metadata.pt``."""
+    if metadata.get("architecture", ARCHITECTURE_CONCAT) == ARCHITECTURE_TWO_TOWER:
+        return TwoTowerSephoraDNN(
+            categorical_features=metadata["categorical_features"],
+            embedding_sizes=metadata["embedding_sizes"],
+            numeric_columns=metadata["numeric_columns"],
+            highlight_dim=len(metadata["highlight_list"]),
+            tower_dim=metadata.get("tower_dim", 64),
+            hidden_dim=metadata.get("tower_hidden_dim", 128),
+            user_categorical_features=metadata.get("user_categorical_features", USER_CATEGORICAL_FEATURES),
+            user_numeric_columns=metadata.get("user_numeric_columns", USER_NUMERIC_COLUMNS),
+        )
+    return SephoraDNN(
+        categorical_features=metadata["categorical_features"],
+        embedding_sizes=metadata["embedding_sizes"],
+        numeric_dim=len(metadata["numeric_columns"]),
+        highlight_dim=len(metadata["highlight_list"]),
+        hidden_dim=metadata.get("hidden_dim", 256),
+        num_blocks=metadata.get("num_blocks", 2),
+    )
+
+
+_LIVE_SERVICES: "weakref.WeakSet[DNNRecommendationService]" = weakref.WeakSet()
+
+# Invalidated rows of the product tower table tolerated before it is rebuilt in memory.
+MAX_STALE_TOWER_ROWS = 1024
+TOWER_REBUILD_CHUNK = 512
+
+
+def invalidate_product_features(product_ids: Iterable[str] | None = None) -> None:
+    """Drop cached product-side features in every DNN service of this process."""
+    ids = list(product_ids) if product_ids is not None else None
+    for service in list(_LIVE_SERVICES):
+        service.invalidate_products(ids)
+
+
 class DNNRecommendationService:
     """Lazy loader for the pre-trained DNN model + encoder."""
 
-    def __init__(self, artifacts_dir: Path | str, device: str = "cpu") -> None:
+    def __init__(
+        self,
+        artifacts_dir: Path | str,
+        device: str = "cpu",
+        runtime: str = RUNTIME_EAGER,
+        mmap_artifacts: bool = False,
+        batch_window_ms: float = 0.0,
+        max_batch_rows: int = 1024,
+        load_breaker: CircuitBreaker | None = None,
+        product_records: Callable[[], Iterable[Dict[str, object]]] | None = None,
+    ) -> None:
         self.artifacts_dir = Path(artifacts_dir)
         self.device = torch.device(device)
-        self._model: SephoraDNN | None = None
+        self.runtime = runtime
+        self.mmap_artifacts = mmap_artifacts
+        self._model: nn.Module | None = None
         self._encoder: DNNFeatureEncoder | None = None
+        # Two-tower models are scored through their towers against cached product vectors.
+        # ``product_records`` yields every catalog product so the table can be rebuilt in
+        # memory once too much of it was invalidated; without it rows are recomputed lazily.
+        self._two_tower: TwoTowerSephoraDNN | None = None
+        self._tower_table: ProductTowerTable | None = None
+        self._product_vectors: Dict[str, np.ndarray] = {}
+        self._stale_tower_rows: Set[str] = set()
+        self._tower_table_stale = False
+        self._tower_lock = threading.Lock()
+        self._tower_epoch = 0
+        self._tower_generation = 0
+        self._product_records = product_records
+        self._tower_rebuild: threading.Thread | None = None
+        self._invalidated_during_rebuild: Set[str] | None = None
+        self._load_lock = threading.Lock()
+        # A broken artifact directory fails fast instead of being re-read on every request.
+        self.load_breaker = load_breaker or CircuitBreaker("dnn-load")
+        # With a window, concurrent requests share forward passes (see InferenceBatcher).
+        self._batcher = (
+            InferenceBatcher(self._forward, batch_window_ms, max_batch_rows, name="dnn-batcher")
+            if batch_window_ms > 0
+            else None
+        )
+        _LIVE_SERVICES.add(self)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None and self._encoder is not None
 
     def _load(self) -> None:
-        if self._model is not None and self._encoder is not None:
+        if self.is_loaded:
             return
-        metadata_path = self.artifacts_dir / "dnn_metadata.pt"
-        weights_path = self.artifacts_dir / "dnn_best_model.pt"
-        metadata = torch.load(metadata_path, map_location="cpu")
+        with self._load_lock:
+            if self.is_loaded:
+                return
+            with self.load_breaker.guard():
+                model, encoder = self.load_artifacts()
+                model = model.to(self.device)
+                if isinstance(model, TwoTowerSephoraDNN):
+                    self._two_tower = model
+                    self._tower_table = ProductTowerTable.load(
+                        self.artifacts_dir / PRODUCT_TOWER_SUBDIR, self.artifacts_fingerprint()
+                    )
+                example = tuple(tensor.to(self.device) for tensor in encoder.encode_batch([{}, {}]))
+                prepared = prepare_for_inference(model, example, self.runtime)
+            self._encoder = encoder
+            self._model = prepared
+
+    def warm_up(self, batch_size: int = 8) -> None:
+        """Load the artifacts and push dummy batches through the model."""
+        self._load()
+        assert self._encoder is not None
+        # Traced graphs specialise on the first couple of calls.
+        for _ in range(2):
+            self._predict(*self._encoder.encode_batch([{}] * batch_size))
+
+    def load_artifacts(self) -> Tuple[nn.Module, DNNFeatureEncoder]:
+        """Read the eager model (in eval mode, on CPU) and its encoder from ``artifacts_dir``.
+
+        With ``mmap_artifacts`` and an up-to-date export in ``artifacts_dir/mmap`` the
+        weights and vocabularies stay memory-mapped instead of being unpickled.
+        """
+        mapped = self._mapped_artifacts()
+        metadata = self._read_metadata(mapped)
+        state = mapped.tensors if mapped is not None else torch.load(self._weights_path, map_location="cpu")
         encoder = DNNFeatureEncoder(metadata)
-        embedding_sizes = metadata["embedding_sizes"]
-        model = SephoraDNN(
-            categorical_features=metadata["categorical_features"],
-            embedding_sizes=embedding_sizes,
-            numeric_dim=len(metadata["numeric_columns"]),
-            highlight_dim=len(metadata["highlight_list"]),
-        )
-        model.load_state_dict(torch.load(weights_path, map_location="cpu"))
+        model = build_dnn(metadata)
+        # assign=True keeps the mapped tensors instead of copying them into fresh parameters.
+        model.load_state_dict(state, assign=mapped is not None)
         model.eval()
-        self._model = model.to(self.device)
-        self._encoder = encoder
+        return model, encoder
+
+    def load_encoder(self) -> DNNFeatureEncoder:
+        """Only the feature encoder, for processes that send the model work elsewhere."""
+        return DNNFeatureEncoder(self._read_metadata(self._mapped_artifacts()))
+
+    def artifacts_fingerprint(self) -> str | None:
+        return source_fingerprint([self._metadata_path, self._weights_path])
+
+    @property
+    def _metadata_path(self) -> Path:
+        return self.artifacts_dir / "dnn_metadata.pt"
+
+    @property
+    def _weights_path(self) -> Path:
+        return self.artifacts_dir / "dnn_best_model.pt"
+
+    def _mapped_artifacts(self) -> MappedArtifacts | None:
+        if not self.mmap_artifacts:
+            return None
+        return load_mapped_artifacts(
+            self.artifacts_dir / MMAP_SUBDIR,
+            fingerprint=self.artifacts_fingerprint(),
+        )
+
+    def _read_metadata(self, mapped: MappedArtifacts | None) -> Dict[str, object]:
+        if mapped is not None:
+            metadata = dict(mapped.metadata)
+            metadata["categorical_maps"] = {
+                feature: mapped.vocabularies[f"categorical.{feature}"] for feature in metadata["categorical_features"]
+            }
+            return metadata
+        metadata = torch.load(self._metadata_path, map_location="cpu")
+        metadata["categorical_maps"] = categorical_vocabularies(metadata, self.artifacts_dir)
+        return metadata
 
     def score_records(self, records: Iterable[Dict[str, object]]) -> List[float]:
         self._load()
-        assert self._model is not None and self._encoder is not None
-        categorical, numeric, highlights = self._encoder.encode_batch(records)
+        assert self._encoder is not None
+        return self._predict(*self._encoder.encode_batch(records))
+
+    def score_candidates(
+        self,
+        user_record: Dict[str, object],
+        product_records: Sequence[Dict[str, object]],
+    ) -> List[float]:
+        """Score many products for one user, encoding product columns once per product."""
+        self._load()
+        assert self._encoder is not None
+        if self._two_tower is not None:
+            return self._score_two_tower(user_record, product_records)
+        with stage("feature_encoding"):
+            tensors = self._encoder.encode_for_user(user_record, product_records)
+        with stage("dnn_forward"):
+            return self.score_encoded(*tensors)
+
+    def compute_product_vectors(self, product_records: Sequence[Dict[str, object]]) -> np.ndarray:
+        """Product-tower outputs for ``product_records`` (two-tower models only)."""
+        self._load()
+        assert self._encoder is not None
+        if self._two_tower is None:
+            raise ValueError("The loaded DNN is not a two-tower model")
+        categorical, numeric, highlights = self._encoder.encode_for_user({}, product_records)
+        with torch.inference_mode():
+            vectors = self._two_tower.encode_products(
+                categorical.to(self.device), numeric.to(self.device), highlights.to(self.device)
+            )
+        return vectors.cpu().numpy()
+
+    def tower_stats(self) -> Dict[str, object] | None:
+        if self._two_tower is None:
+            return None
+        return {
+            "persisted_products": len(self._tower_table) if self._tower_table is not None else 0,
+            "computed_products": len(self._product_vectors),
+            "stale_rows": len(self._stale_tower_rows),
+            "table_stale": self._tower_table_stale,
+            "rebuilding": self._tower_rebuild is not None and self._tower_rebuild.is_alive(),
+        }
+
+    def rebuild_tower_table(self) -> ProductTowerTable | None:
+        """Recompute the product vectors of the whole catalog and swap them in as the table.
+
+        Products invalidated while the rebuild runs stay marked stale afterwards; live
+        vectors the new table covers are dropped. A whole-catalog invalidation during the
+        rebuild restarts it. Needs ``product_records``.
+        """
+        if self._product_records is None:
+            return None
+        self._load()
+        if self._two_tower is None:
+            return None
+        while True:
+            with self._tower_lock:
+                generation = self._tower_generation
+                self._invalidated_during_rebuild = set()
+            try:
+                table = self._compute_tower_table()
+            except Exception:
+                with self._tower_lock:
+                    self._invalidated_during_rebuild = None
+                raise
+            with self._tower_lock:
+                if generation != self._tower_generation:
+                    continue
+                invalidated, self._invalidated_during_rebuild = self._invalidated_during_rebuild or set(), None
+                self._tower_table = table
+                self._tower_table_stale = False
+                self._stale_tower_rows = invalidated
+                self._product_vectors = {
+                    key: vector
+                    for key, vector in self._product_vectors.items()
+                    if key in invalidated or key not in table.rows
+                }
+                break
+        LOGGER.info("Rebuilt the product tower table for %s products", len(table))
+        return table
+
+    def _compute_tower_table(self) -> ProductTowerTable:
+        assert self._product_records is not None
+        product_ids: List[str] = []
+        chunks: List[np.ndarray] = []
+        batch: List[Dict[str, object]] = []
+        for record in self._product_records():
+            batch.append(record)
+            if len(batch) >= TOWER_REBUILD_CHUNK:
+                chunks.append(self.compute_product_vectors(batch))
+                product_ids.extend(str(item.get("product_id") or "") for item in batch)
+                batch = []
+        if batch:
+            chunks.append(self.compute_product_vectors(batch))
+            product_ids.extend(str(item.get("product_id") or "") for item in batch)
+        vectors = np.concatenate(chunks).astype(np.float32, copy=False) if chunks else np.zeros((0, 0), np.float32)
+        return ProductTowerTable(vectors, {product_id: row for row, product_id in enumerate(product_ids) if product_id})
+
+    def _request_tower_rebuild(self) -> None:
+        """Start a background rebuild unless one is running (call with ``_tower_lock`` held)."""
+        if self._product_records is None:
+            return
+        if self._tower_rebuild is not None and self._tower_rebuild.is_alive():
+            return
+        self._tower_rebuild = threading.Thread(target=self._background_rebuild, name="product-tower-rebuild", daemon=True)
+        self._tower_rebuild.start()
+
+    def _background_rebuild(self) -> None:
+        from django.db import close_old_connections
+
+        try:
+            self.rebuild_tower_table()
+        except Exception:  # pragma: no cover - keep computing stale rows on demand
+            LOGGER.exception("Rebuilding the product tower table failed")
+        finally:
+            close_old_connections()
+
+    def _score_two_tower(
+        self,
+        user_record: Dict[str, object],
+        product_records: Sequence[Dict[str, object]],
+    ) -> List[float]:
+        """One user-tower pass plus the interaction head over cached product vectors."""
+        assert self._two_tower is not None and self._encoder is not None
+        if not product_records:
+            return []
+        with stage("feature_encoding"):
+            categorical, numeric, _ = self._encoder.encode_batch([user_record])
+            product_vectors = torch.from_numpy(self._cached_product_vectors(product_records))
+        with stage("dnn_forward"):
+            with torch.inference_mode():
+                user_vector = self._two_tower.encode_users(categorical.to(self.device), numeric.to(self.device))
+                logits = self._two_tower.score(user_vector, product_vectors.to(self.device))
+                return [float(score) for score in torch.sigmoid(logits).cpu().tolist()]
+
+    def _cached_product_vectors(self, product_records: Sequence[Dict[str, object]]) -> np.ndarray:
+        keys = [str(record.get("product_id") or "") for record in product_records]
+        rows: List[np.ndarray | None] = []
+        missing: List[int] = []
+        with self._tower_lock:
+            epoch = self._tower_epoch
+            live = self._product_vectors
+            table = None if self._tower_table_stale else self._tower_table
+            stale = self._stale_tower_rows
+            for position, key in enumerate(keys):
+                vector = live.get(key) if key else None
+                if vector is None and table is not None and key and key not in stale:
+                    vector = table.get(key)
+                if vector is None:
+                    missing.append(position)
+                rows.append(vector)
+        if missing:
+            # Products added or changed since the table was built: compute once and keep.
+            computed = self.compute_product_vectors([product_records[position] for position in missing])
+            for position, vector in zip(missing, computed):
+                rows[position] = vector
+            with self._tower_lock:
+                # An invalidation while computing may have made these records outdated.
+                if epoch == self._tower_epoch:
+                    for position in missing:
+                        if keys[position]:
+                            self._product_vectors[keys[position]] = rows[position]
+        return np.stack(rows).astype(np.float32, copy=False)
+
+    def score_encoded(self, categorical: torch.Tensor, numeric: torch.Tensor, highlights: torch.Tensor) -> List[float]:
+        """Scores for already-encoded rows, through the micro-batcher when one is configured."""
+        if self._batcher is None or categorical.shape[0] == 0:
+            return self._predict(categorical, numeric, highlights)
+        return [float(score) for score in self._batcher.run((categorical, numeric, highlights)).tolist()]
+
+    def close(self) -> None:
+        """Release the batcher thread once this service has been replaced."""
+        if self._batcher is not None:
+            self._batcher.close()
+
+    def batcher_stats(self) -> Dict[str, object] | None:
+        return self._batcher.stats() if self._batcher is not None else None
+
+    def known_value(self, feature: str, value: object) -> str | None:
+        """``value`` or ``<unk>`` as the encoder sees it; None while the encoder is not loaded.
+
+        Never loads the artifacts, so it is safe before the request budget is checked.
+        """
+        encoder = self._encoder
+        return encoder.known_value(feature, value) if encoder is not None else None
+
+    def invalidate_products(self, product_ids: Iterable[str] | None = None) -> None:
+        if product_ids is not None:
+            product_ids = [str(product_id) for product_id in product_ids]
+        if self._encoder is not None:
+            self._encoder.invalidate_products(product_ids)
+        if self._two_tower is None:
+            return
+        with self._tower_lock:
+            self._tower_epoch += 1
+            if product_ids is None:
+                self._product_vectors = {}
+                self._stale_tower_rows = set()
+                self._tower_table_stale = True
+                # A running rebuild may have read outdated records already: make it start over.
+                self._tower_generation += 1
+                self._request_tower_rebuild()
+                return
+            for product_id in product_ids:
+                self._product_vectors.pop(product_id, None)
+                if self._invalidated_during_rebuild is not None:
+                    self._invalidated_during_rebuild.add(product_id)
+                if not self._tower_table_stale:
+                    self._stale_tower_rows.add(product_id)
+            if len(self._stale_tower_rows) > MAX_STALE_TOWER_ROWS:
+                if self._product_records is None:
+                    # Nothing to rebuild from: stop consulting the table instead of growing the set.
+                    self._stale_tower_rows = set()
+                    self._tower_table_stale = True
+                else:
+                    self._request_tower_rebuild()
+
+    def _predict(self, categorical: torch.Tensor, numeric: torch.Tensor, highlights: torch.Tensor) -> List[float]:
         if categorical.shape[0] == 0:
             return []
+        return [float(score) for score in self._forward(categorical, numeric, highlights).tolist()]
+
+    def _forward(self, categorical: torch.Tensor, numeric: torch.Tensor, highlights: torch.Tensor) -> torch.Tensor:
+        """Sigmoid scores on CPU for one (possibly cross-request) batch."""
+        assert self._model is not None
         categorical = categorical.to(self.device)
         numeric = numeric.to(self.device)
         highlights = highlights.to(self.device)
-        with torch.no_grad():
+        with torch.inference_mode():
             logits = self._model(categorical, numeric, highlights)
-            scores = torch.sigmoid(logits).cpu().tolist()
-        return [float(score) for score in scores]
-
+            return torch.sigmoid(logits).cpu()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+SEARCH_BLOCK_ROWS = 16384
+IVF_MIN_ITEMS = 20000
+KMEANS_ITERATIONS = 8
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the ``k`` largest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+        block = vectors[start : start + SEARCH_BLOCK_ROWS]
+        assignments[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+class ItemEmbeddingIndex:
+    """Top-K inner-product search over L2-normalized item embeddings.
+
+    Small catalogs are scanned in fixed-size blocks (one matrix-vector product per block,
+    partial top-K per block). From ``IVF_MIN_ITEMS`` items on, a spherical k-means
+    inverted file with ``sqrt(n)`` lists is built once and a query only scans the
+    ``n_probe`` lists whose centroids are closest, so search cost grows sublinearly.
+    """
+
+    def __init__(self, vectors: np.ndarray, n_lists: int = 0, n_probe: int = 8, seed: int = 0) -> None:
+        self.vectors = _normalize(vectors)
+        self.n_probe = max(1, int(n_probe))
+        self.centroids: np.ndarray | None = None
+        self._list_members = np.empty(0, dtype=np.int64)
+        self._list_offsets = np.zeros(1, dtype=np.int64)
+        if n_lists > 1 and len(self.vectors) > n_lists:
+            self._build_ivf(int(n_lists), np.random.default_rng(seed))
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, n_probe: int = 8, min_ivf_items: int = IVF_MIN_ITEMS) -> "ItemEmbeddingIndex":
+        n_lists = int(math.sqrt(len(vectors))) if len(vectors) >= min_ivf_items else 0
+        return cls(vectors, n_lists=n_lists, n_probe=n_probe)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        """Item indices of the ``k`` best inner products with ``query``, best first."""
+        if k <= 0 or not len(self.vectors):
+            return np.empty(0, dtype=np.int64)
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if self.centroids is None:
+            return self._scan(query, k)
+        probe = _top_k(self.centroids @ query, min(self.n_probe, len(self.centroids)))
+        members = np.concatenate(
+            [self._list_members[self._list_offsets[idx] : self._list_offsets[idx + 1]] for idx in probe]
+        )
+        if not len(members):
+            return self._scan(query, k)
+        scores = self.vectors[members] @ query
+        return members[_top_k(scores, k)]
+
+    def _scan(self, query: np.ndarray, k: int) -> np.ndarray:
+        best_indices = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, len(self.vectors), SEARCH_BLOCK_ROWS):
+            scores = self.vectors[start : start + SEARCH_BLOCK_ROWS] @ query
+            local = _top_k(scores, k)
+            best_indices = np.concatenate([best_indices, local + start])
+            best_scores = np.concatenate([best_scores, scores[local]])
+            if len(best_indices) > k:
+                keep = _top_k(best_scores, k)
+                best_indices, best_scores = best_indices[keep], best_scores[keep]
+        return best_indices[_top_k(best_scores, k)]
+
+    def _build_ivf(self, n_lists: int, rng: np.random.Generator) -> None:
+        vectors = self.vectors
+        centroids = vectors[rng.choice(len(vectors), size=n_lists, replace=False)].copy()
+        assignments = np.zeros(len(vectors), dtype=np.int64)
+        for _ in range(KMEANS_ITERATIONS):
+            assignments = _nearest_centroids(vectors, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            counts = np.bincount(assignments, minlength=n_lists)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty lists from random items instead of dropping them.
+                sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+            centroids = _normalize(sums)
+        assignments = _nearest_centroids(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        self.centroids = centroids
+        self._list_members = order
+        self._list_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]
+        ).astype(np.int64)
@@ -1,64 +1,171 @@
 from __future__ import annotations
 
-from typing import Dict, Iterable, List
+import threading
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
 
+import numpy as np
 import torch
 
 
+# Columns that depend on the requesting user; everything else is product-side.
+USER_CATEGORICAL_FEATURES = ("author_id", "skin_type", "skin_tone", "eye_color", "hair_color")
+USER_NUMERIC_COLUMNS = (
+    "interaction_recency_days",
+    "user_total_interactions",
+    "user_positive_rate",
+    "user_avg_review_rating",
+)
+
+ProductFeatures = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _to_float(value: object) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
 class DNNFeatureEncoder:
     """Encode python dictionaries into tensor triplets for the DNN."""
 
     def __init__(self, metadata: Dict[str, object]) -> None:
         self.categorical_features: List[str] = list(metadata["categorical_features"])
-        self.categorical_maps: Dict[str, Dict[str, int]] = metadata["categorical_maps"]
+        self.categorical_maps: Dict[str, Mapping[str, int]] = metadata["categorical_maps"]
+        self._unknown_indices = {
+            feature: mapping.get("<unk>", 0) for feature, mapping in self.categorical_maps.items()
+        }
         self.numeric_columns: List[str] = list(metadata["numeric_columns"])
-        self.numeric_mean = torch.tensor(metadata["numeric_mean"], dtype=torch.float32)
-        self.numeric_std = torch.tensor(metadata["numeric_std"], dtype=torch.float32)
+        self.numeric_mean = np.asarray(metadata["numeric_mean"], dtype=np.float32)
+        numeric_std = np.asarray(metadata["numeric_std"], dtype=np.float32)
+        self.numeric_std = np.where(numeric_std == 0, 1.0, numeric_std).astype(np.float32)
         self.highlight_list: List[str] = list(metadata["highlight_list"])
         self.highlight_positions = {tag: idx for idx, tag in enumerate(self.highlight_list)}
 
+        self._user_cat_positions = [
+            idx for idx, feature in enumerate(self.categorical_features) if feature in USER_CATEGORICAL_FEATURES
+        ]
+        self._product_cat_positions = [
+            idx for idx, feature in enumerate(self.categorical_features) if feature not in USER_CATEGORICAL_FEATURES
+        ]
+        self._user_num_positions = [
+            idx for idx, column in enumerate(self.numeric_columns) if column in USER_NUMERIC_COLUMNS
+        ]
+        self._product_num_positions = [
+            idx for idx, column in enumerate(self.numeric_columns) if column not in USER_NUMERIC_COLUMNS
+        ]
+        self._product_cache: Dict[str, ProductFeatures] = {}
+        self._cache_lock = threading.Lock()
+
+    @property
+    def dims(self) -> Tuple[int, int, int]:
+        return len(self.categorical_features), len(self.numeric_columns), len(self.highlight_list)
+
     def encode_batch(self, records: Iterable[Dict[str, object]]):
-        cat_rows = []
-        numeric_rows = []
-        highlight_rows = []
-        for record in records:
-            cat_rows.append(self._encode_categorical(record))
-            numeric_rows.append(self._encode_numeric(record))
-            highlight_rows.append(self._encode_highlights(record))
-        categorical = torch.stack(cat_rows) if cat_rows else torch.zeros((0, len(self.categorical_features)))
-        numeric = torch.stack(numeric_rows) if numeric_rows else torch.zeros((0, len(self.numeric_columns)))
-        highlights = torch.stack(highlight_rows) if highlight_rows else torch.zeros((0, len(self.highlight_list)))
-        return categorical.long(), numeric.float(), highlights.float()
-
-    def _encode_categorical(self, record: Dict[str, object]) -> torch.Tensor:
+        """Encode arbitrary records column by column into preallocated arrays."""
+        records = list(records)
+        cat_dim, num_dim, highlight_dim = self.dims
+        categorical = np.zeros((len(records), cat_dim), dtype=np.int64)
+        numeric = np.zeros((len(records), num_dim), dtype=np.float32)
+        highlights = np.zeros((len(records), highlight_dim), dtype=np.float32)
+        all_cat = range(cat_dim)
+        all_num = range(num_dim)
+        for row, record in enumerate(records):
+            categorical[row] = self._categorical_indices(record, all_cat)
+            numeric[row] = self._numeric_values(record, all_num)
+            highlights[row, self._highlight_indices(record)] = 1.0
+        numeric -= self.numeric_mean
+        numeric /= self.numeric_std
+        return self._to_tensors(categorical, numeric, highlights)
+
+    def encode_for_user(
+        self,
+        user_record: Dict[str, object],
+        product_records: Sequence[Dict[str, object]],
+    ):
+        """Encode one user against many products, reusing cached product-side columns."""
+        cat_dim, num_dim, highlight_dim = self.dims
+        size = len(product_records)
+        categorical = np.empty((size, cat_dim), dtype=np.int64)
+        numeric = np.empty((size, num_dim), dtype=np.float32)
+        highlights = np.empty((size, highlight_dim), dtype=np.float32)
+        for row, record in enumerate(product_records):
+            cat_row, num_row, highlight_row = self._product_features(record)
+            categorical[row] = cat_row
+            numeric[row] = num_row
+            highlights[row] = highlight_row
+
+        if self._user_cat_positions:
+            categorical[:, self._user_cat_positions] = self._categorical_indices(
+                user_record, self._user_cat_positions
+            )
+        if self._user_num_positions:
+            positions = self._user_num_positions
+            raw = np.asarray(self._numeric_values(user_record, positions), dtype=np.float32)
+            numeric[:, positions] = (raw - self.numeric_mean[positions]) / self.numeric_std[positions]
+        return self._to_tensors(categorical, numeric, highlights)
+
+    def known_value(self, feature: str, value: object) -> str:
+        """Return ``value`` if the feature vocabulary contains it, otherwise ``<unk>``."""
+        value_str = str(value).strip() if value not in (None, "") else "<unk>"
+        return value_str if value_str in self.categorical_maps.get(feature, {}) else "<unk>"
+
+    def invalidate_products(self, product_ids: Iterable[str] | None = None) -> None:
+        with self._cache_lock:
+            if product_ids is None:
+                self._product_cache.clear()
+                return
+            for product_id in product_ids:
+                self._product_cache.pop(str(product_id), None)
+
+    def _product_features(self, record: Dict[str, object]) -> ProductFeatures:
+        key = str(record.get("product_id") or "")
+        cached = self._product_cache.get(key) if key else None
+        if cached is not None:
+            return cached
+
+        cat_dim, num_dim, highlight_dim = self.dims
+        cat_row = np.zeros(cat_dim, dtype=np.int64)
+        num_row = np.zeros(num_dim, dtype=np.float32)
+        highlight_row = np.zeros(highlight_dim, dtype=np.float32)
+        if self._product_cat_positions:
+            cat_row[self._product_cat_positions] = self._categorical_indices(record, self._product_cat_positions)
+        if self._product_num_positions:
+            positions = self._product_num_positions
+            raw = np.asarray(self._numeric_values(record, positions), dtype=np.float32)
+            num_row[positions] = (raw - self.numeric_mean[positions]) / self.numeric_std[positions]
+        highlight_row[self._highlight_indices(record)] = 1.0
+
+        features = (cat_row, num_row, highlight_row)
+        if key:
+            with self._cache_lock:
+                self._product_cache[key] = features
+        return features
+
+    def _categorical_indices(self, record: Dict[str, object], positions: Iterable[int]) -> List[int]:
         indices = []
-        for feature in self.categorical_features:
-            mapping = self.categorical_maps.get(feature, {"<unk>": 0})
+        for idx in positions:
+            feature = self.categorical_features[idx]
+            unknown = self._unknown_indices.get(feature, 0)
             value = record.get(feature)
-            value_str = str(value).strip() if value not in (None, "") else "<unk>"
-            idx = mapping.get(value_str, mapping.get("<unk>", 0))
-            indices.append(idx)
-        return torch.tensor(indices, dtype=torch.long)
-
-    def _encode_numeric(self, record: Dict[str, object]) -> torch.Tensor:
-        values = []
-        for idx, column in enumerate(self.numeric_columns):
-            raw = record.get(column, 0.0)
-            try:
-                numeric_value = float(raw)
-            except (TypeError, ValueError):
-                numeric_value = 0.0
-            mean = float(self.numeric_mean[idx])
-            std = float(self.numeric_std[idx]) or 1.0
-            values.append((numeric_value - mean) / std)
-        return torch.tensor(values, dtype=torch.float32)
-
-    def _encode_highlights(self, record: Dict[str, object]) -> torch.Tensor:
-        vec = torch.zeros(len(self.highlight_list), dtype=torch.float32)
-        highlights = record.get("filtered_highlights") or []
-        for tag in highlights:
+            if value in (None, ""):
+                indices.append(unknown)
+                continue
+            mapping = self.categorical_maps.get(feature)
+            indices.append(mapping.get(str(value).strip(), unknown) if mapping is not None else unknown)
+        return indices
+
+    def _numeric_values(self, record: Dict[str, object], positions: Iterable[int]) -> List[float]:
+        return [_to_float(record.get(self.numeric_columns[idx], 0.0)) for idx in positions]
+
+    def _highlight_indices(self, record: Dict[str, object]) -> List[int]:
+        indices = []
+        for tag in record.get("filtered_highlights") or []:
             idx = self.highlight_positions.get(str(tag))
             if idx is not None:
-                vec[idx] = 1.0
-        return vec
+                indices.append(idx)
+        return indices
 
+    @staticmethod
+    def _to_tensors(categorical: np.ndarray, numeric: np.ndarray, highlights: np.ndarray):
+        return torch.from_numpy(categorical), torch.from_numpy(numeric), torch.from_numpy(highlights)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import socket
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+
+from . import inference_protocol as protocol
+from .circuit_breaker import CircuitBreaker
+from .dnn import DNNRecommendationService
+from .ncf import NCFRecommendationService
+
+
+class InferenceServerError(RuntimeError):
+    """The inference server could not be reached or failed the request."""
+
+
+class InferenceClient:
+    """Request/response calls to ``manage.py run_inference_server`` over its Unix socket.
+
+    Each thread keeps its own persistent connection. A call that finds the connection
+    dropped (server restart) reconnects once; every op is idempotent, so resending is safe.
+    While the server keeps failing, ``breaker`` rejects calls without waiting on the socket.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 2.0, breaker: CircuitBreaker | None = None) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker("inference-server")
+        self._local = threading.local()
+
+    def call(self, op: int, payload: bytes = b"") -> bytearray:
+        with self.breaker.guard():
+            return self._call(op, payload)
+
+    def _call(self, op: int, payload: bytes) -> bytearray:
+        for attempt in range(2):
+            sock = self._connection()
+            try:
+                protocol.send_frame(sock, op, payload)
+                reply_op, reply_status, reply = protocol.recv_frame(sock)
+            except socket.timeout as exc:
+                # A late reply would desynchronise the stream; start over next time.
+                self._close()
+                raise InferenceServerError(f"Inference server timed out after {self.timeout}s") from exc
+            except (ConnectionError, OSError, protocol.InferenceProtocolError) as exc:
+                self._close()
+                if attempt:
+                    raise InferenceServerError(f"Inference server connection failed: {exc}") from exc
+                continue
+            if reply_op != op:
+                self._close()
+                raise InferenceServerError("Inference server answered a different request")
+            if reply_status != protocol.STATUS_OK:
+                raise InferenceServerError(reply.decode("utf-8", "replace"))
+            return reply
+        raise AssertionError("unreachable")
+
+    def status(self) -> Dict[str, object]:
+        return protocol.unpack_json(self.call(protocol.OP_STATUS))
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            return sock
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as exc:
+            sock.close()
+            raise InferenceServerError(f"Cannot connect to inference server at {self.socket_path}: {exc}") from exc
+        self._local.sock = sock
+        return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+
+class RemoteDNNService(DNNRecommendationService):
+    """DNN service whose forward passes run in the inference server.
+
+    Feature encoding (vocabularies and the per-product cache) stays in the worker, so only
+    dense arrays cross the socket; the model weights are never loaded here.
+    """
+
+    def __init__(
+        self,
+        client: InferenceClient,
+        artifacts_dir: Path | str,
+        mmap_artifacts: bool = False,
+        load_breaker: CircuitBreaker | None = None,
+    ) -> None:
+        super().__init__(artifacts_dir, mmap_artifacts=mmap_artifacts, load_breaker=load_breaker)
+        self.client = client
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._encoder is not None
+
+    def _load(self) -> None:
+        if self.is_loaded:
+            return
+        with self._load_lock:
+            if not self.is_loaded:
+                with self.load_breaker.guard():
+                    self._encoder = self.load_encoder()
+
+    def warm_up(self, batch_size: int = 8) -> None:
+        """Load the encoder and check that the server answers."""
+        self._load()
+        assert self._encoder is not None
+        self._predict(*self._encoder.encode_batch([{}] * batch_size))
+
+    def _forward(self, categorical: torch.Tensor, numeric: torch.Tensor, highlights: torch.Tensor) -> torch.Tensor:
+        reply = self.client.call(
+            protocol.OP_DNN_SCORE,
+            protocol.pack_dnn_inputs(categorical.numpy(), numeric.numpy(), highlights.numpy()),
+        )
+        return torch.from_numpy(np.frombuffer(reply, dtype="<f4"))
+
+
+class RemoteNCFService(NCFRecommendationService):
+    """NCF service backed by the inference server; it loads no artifacts itself."""
+
+    def __init__(self, client: InferenceClient, artifacts_dir: Path | str) -> None:
+        super().__init__(artifacts_dir)
+        self.client = client
+        self._reachable = False
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._reachable
+
+    def warm_up(self, batch_size: int = 8) -> None:
+        status = self.client.status()
+        if not status.get("models", {}).get("ncf"):
+            raise InferenceServerError("Inference server has not loaded the NCF model")
+        self._reachable = True
+
+    def retrieve(self, user_identifier: str | None, k: int) -> List[str]:
+        if not user_identifier or k <= 0:
+            return []
+        reply = self.client.call(protocol.OP_NCF_RETRIEVE, protocol.pack_ncf_retrieve(str(user_identifier), k))
+        self._reachable = True
+        return protocol.unpack_strings(reply)[0]
+
+    def score(self, user_identifier: str | None, product_external_id: str | None) -> Optional[float]:
+        return self.score_many(user_identifier, [product_external_id])[0]
+
+    def score_many(
+        self,
+        user_identifier: str | None,
+        product_ids: Sequence[str | None],
+    ) -> List[Optional[float]]:
+        if not user_identifier or not product_ids:
+            return [None] * len(product_ids)
+        reply = self.client.call(
+            protocol.OP_NCF_SCORE,
+            protocol.pack_ncf_score(str(user_identifier), [str(pid) if pid else None for pid in product_ids]),
+        )
+        self._reachable = True
+        return protocol.unpack_scores(reply)
@@ -0,0 +1,140 @@
+"""Binary framing for the local inference server (``manage.py run_inference_server``).
+
+Every message is an 8-byte header ``<2sBBI`` (magic ``b"RI"``, op code, status, payload
+length) followed by the payload. Arrays travel as raw little-endian buffers and strings
+as a count, a table of uint32 lengths and one UTF-8 blob, so neither side pickles.
+"""
+
+from __future__ import annotations
+
+import json
+import socket
+import struct
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b"RI"
+HEADER = struct.Struct("<2sBBI")
+DIMS = struct.Struct("<IHHH")
+UINT32 = struct.Struct("<I")
+MAX_PAYLOAD_BYTES = 256 * 1024 * 1024
+
+OP_STATUS = 1
+OP_DNN_SCORE = 2
+OP_NCF_SCORE = 3
+OP_NCF_RETRIEVE = 4
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+class InferenceProtocolError(RuntimeError):
+    """Malformed frame, or the peer reported an error."""
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytearray:
+    # A writable buffer, so arrays decoded from it can back tensors without a copy.
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            raise ConnectionError("Inference socket closed")
+        received += count
+    return buffer
+
+
+def send_frame(sock: socket.socket, op: int, payload: bytes = b"", status: int = STATUS_OK) -> None:
+    sock.sendall(HEADER.pack(MAGIC, op, status, len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket) -> Tuple[int, int, bytearray]:
+    """Return (op, status, payload)."""
+    magic, op, status, length = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if magic != MAGIC or length > MAX_PAYLOAD_BYTES:
+        raise InferenceProtocolError("Unexpected frame on inference socket")
+    return op, status, _recv_exact(sock, length) if length else bytearray()
+
+
+def pack_strings(values: Sequence[str]) -> bytes:
+    encoded = [value.encode("utf-8") for value in values]
+    lengths = np.asarray([len(item) for item in encoded], dtype="<u4")
+    return UINT32.pack(len(encoded)) + lengths.tobytes() + b"".join(encoded)
+
+
+def unpack_strings(payload: bytes, offset: int = 0) -> Tuple[List[str], int]:
+    """Decode a string list starting at ``offset``; return it and the offset after it."""
+    (count,) = UINT32.unpack_from(payload, offset)
+    offset += UINT32.size
+    lengths = np.frombuffer(payload, dtype="<u4", count=count, offset=offset)
+    offset += 4 * count
+    values = []
+    for length in lengths.tolist():
+        values.append(payload[offset : offset + length].decode("utf-8"))
+        offset += length
+    return values, offset
+
+
+def pack_dnn_inputs(categorical: np.ndarray, numeric: np.ndarray, highlights: np.ndarray) -> bytes:
+    rows = categorical.shape[0]
+    return b"".join(
+        [
+            DIMS.pack(rows, categorical.shape[1], numeric.shape[1], highlights.shape[1]),
+            np.ascontiguousarray(categorical, dtype="<i8").tobytes(),
+            np.ascontiguousarray(numeric, dtype="<f4").tobytes(),
+            np.ascontiguousarray(highlights, dtype="<f4").tobytes(),
+        ]
+    )
+
+
+def unpack_dnn_inputs(payload: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rows, cat_dim, num_dim, highlight_dim = DIMS.unpack_from(payload)
+    offset = DIMS.size
+    categorical = np.frombuffer(payload, dtype="<i8", count=rows * cat_dim, offset=offset).reshape(rows, cat_dim)
+    offset += categorical.nbytes
+    numeric = np.frombuffer(payload, dtype="<f4", count=rows * num_dim, offset=offset).reshape(rows, num_dim)
+    offset += numeric.nbytes
+    highlights = np.frombuffer(payload, dtype="<f4", count=rows * highlight_dim, offset=offset).reshape(
+        rows, highlight_dim
+    )
+    return categorical, numeric, highlights
+
+
+def pack_scores(scores: Sequence[float | None]) -> bytes:
+    """float32 scores; ``None`` (unknown user/item) travels as NaN."""
+    return np.asarray([np.nan if score is None else score for score in scores], dtype="<f4").tobytes()
+
+
+def unpack_scores(payload: bytes) -> List[float | None]:
+    values = np.frombuffer(payload, dtype="<f4").tolist()
+    return [None if value != value else float(value) for value in values]
+
+
+def pack_ncf_score(user_identifier: str, product_ids: Sequence[str | None]) -> bytes:
+    return pack_strings([user_identifier]) + pack_strings([product_id or "" for product_id in product_ids])
+
+
+def unpack_ncf_score(payload: bytes) -> Tuple[str, List[str | None]]:
+    (user_identifier,), offset = unpack_strings(payload)
+    product_ids, _ = unpack_strings(payload, offset)
+    return user_identifier, [product_id or None for product_id in product_ids]
+
+
+def pack_ncf_retrieve(user_identifier: str, k: int) -> bytes:
+    return pack_strings([user_identifier]) + UINT32.pack(k)
+
+
+def unpack_ncf_retrieve(payload: bytes) -> Tuple[str, int]:
+    (user_identifier,), offset = unpack_strings(payload)
+    (k,) = UINT32.unpack_from(payload, offset)
+    return user_identifier, k
+
+
+def pack_json(value: object) -> bytes:
+    return json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def unpack_json(payload: bytes) -> object:
+    return json.loads(payload.decode("utf-8")) if payload else None
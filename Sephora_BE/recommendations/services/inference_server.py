@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict
+
+import torch
+
+from . import inference_protocol as protocol
+from .dnn import DNNRecommendationService
+from .ncf import NCFRecommendationService
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    """One persistent client connection: answer frames until the peer hangs up."""
+
+    server: "_UnixServer"
+
+    def handle(self) -> None:
+        while True:
+            try:
+                op, _, payload = protocol.recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            except protocol.InferenceProtocolError:
+                LOGGER.warning("Dropping inference client after a malformed frame")
+                return
+            try:
+                response = self.server.owner.dispatch(op, payload)
+            except Exception as exc:
+                LOGGER.exception("Inference op %s failed", op)
+                protocol.send_frame(self.request, op, str(exc).encode("utf-8"), status=protocol.STATUS_ERROR)
+                continue
+            protocol.send_frame(self.request, op, response)
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    owner: "InferenceServer"
+
+
+class InferenceServer:
+    """Own the DNN and NCF models for every web worker on this host.
+
+    Workers keep one connection per thread (see ``inference_client``) and send encoded
+    feature arrays or id lists; each connection gets a server thread, and the DNN
+    service's micro-batcher merges concurrent requests from all of them into shared
+    forward passes.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        dnn_service: DNNRecommendationService,
+        ncf_service: NCFRecommendationService,
+    ) -> None:
+        self.socket_path = socket_path
+        self.dnn_service = dnn_service
+        self.ncf_service = ncf_service
+        self._started = time.time()
+        self._stats_lock = threading.Lock()
+        self._requests: Dict[str, int] = {}
+        self._server: _UnixServer | None = None
+
+    def dispatch(self, op: int, payload: bytearray) -> bytes:
+        if op == protocol.OP_DNN_SCORE:
+            self._count("dnn_score")
+            categorical, numeric, highlights = protocol.unpack_dnn_inputs(payload)
+            scores = self.dnn_service.score_encoded(
+                torch.from_numpy(categorical), torch.from_numpy(numeric), torch.from_numpy(highlights)
+            )
+            return protocol.pack_scores(scores)
+        if op == protocol.OP_NCF_SCORE:
+            self._count("ncf_score")
+            user_identifier, product_ids = protocol.unpack_ncf_score(payload)
+            return protocol.pack_scores(self.ncf_service.score_many(user_identifier, product_ids))
+        if op == protocol.OP_NCF_RETRIEVE:
+            self._count("ncf_retrieve")
+            user_identifier, k = protocol.unpack_ncf_retrieve(payload)
+            return protocol.pack_strings(self.ncf_service.retrieve(user_identifier, k))
+        if op == protocol.OP_STATUS:
+            return protocol.pack_json(self.status())
+        raise ValueError(f"Unknown inference op {op}")
+
+    def status(self) -> Dict[str, object]:
+        with self._stats_lock:
+            requests = dict(self._requests)
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self._started, 1),
+            "intra_op_threads": torch.get_num_threads(),
+            "models": {"dnn": self.dnn_service.is_loaded, "ncf": self.ncf_service.is_loaded},
+            "artifacts": {"dnn": str(self.dnn_service.artifacts_dir), "ncf": str(self.ncf_service.artifacts_dir)},
+            "requests": requests,
+            "dnn_batcher": self.dnn_service.batcher_stats(),
+        }
+
+    def serve_forever(self) -> None:
+        self._claim_socket_path()
+        self._server = _UnixServer(self.socket_path, _ConnectionHandler)
+        self._server.owner = self
+        os.chmod(self.socket_path, 0o660)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+
+    def _claim_socket_path(self) -> None:
+        """Remove a socket file left by a crashed server; refuse to start next to a live one."""
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+        else:
+            raise RuntimeError(f"An inference server is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._requests[name] = self._requests.get(name, 0) + 1
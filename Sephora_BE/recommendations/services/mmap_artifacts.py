@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import shutil
+import warnings
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Mapping
+
+import numpy as np
+import torch
+
+from .vocabulary import Vocabulary, load_array
+
+LOGGER = logging.getLogger(__name__)
+
+MMAP_SUBDIR = "mmap"
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 2
+
+
+@dataclass(frozen=True)
+class MappedArtifacts:
+    metadata: Dict[str, object]
+    tensors: Dict[str, torch.Tensor]
+    vocabularies: Dict[str, Vocabulary]
+
+
+def source_fingerprint(paths: Iterable[Path]) -> str | None:
+    """Fingerprint of the trained artifacts an export was made from (None if any is missing)."""
+    stamps = []
+    for path in paths:
+        if not path.exists():
+            return None
+        stat = path.stat()
+        stamps.append(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}")
+    return hashlib.sha1("|".join(stamps).encode("utf-8")).hexdigest()
+
+
+def export_mapped_artifacts(
+    target_dir: Path | str,
+    model_name: str,
+    state_dict: Mapping[str, torch.Tensor],
+    vocabularies: Mapping[str, Mapping[str, int]],
+    metadata: Dict[str, object],
+    fingerprint: str | None = None,
+) -> Path:
+    """Write tensors and vocabularies as ``.npy`` files plus a manifest, replacing ``target_dir`` atomically."""
+    target_dir = Path(target_dir)
+    staging = target_dir.with_name(f"{target_dir.name}.tmp")
+    if staging.exists():
+        shutil.rmtree(staging)
+    (staging / "tensors").mkdir(parents=True)
+
+    tensors = {}
+    for key, tensor in state_dict.items():
+        filename = f"tensors/{key}.npy"
+        np.save(staging / filename, tensor.detach().cpu().contiguous().numpy())
+        tensors[key] = filename
+    for name, mapping in vocabularies.items():
+        vocabulary = mapping if isinstance(mapping, Vocabulary) else Vocabulary.from_mapping(mapping)
+        vocabulary.save(staging / "vocab", name)
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "model": model_name,
+        "source_fingerprint": fingerprint,
+        "tensors": tensors,
+        "vocabularies": sorted(vocabularies),
+        "metadata": metadata,
+    }
+    (staging / MANIFEST_NAME).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    previous = target_dir.with_name(f"{target_dir.name}.old")
+    if target_dir.exists():
+        if previous.exists():
+            shutil.rmtree(previous)
+        target_dir.rename(previous)
+    staging.rename(target_dir)
+    if previous.exists():
+        shutil.rmtree(previous)
+    return target_dir
+
+
+def load_mapped_artifacts(directory: Path | str, fingerprint: str | None = None) -> MappedArtifacts | None:
+    """Map an export into memory; None when it is missing or older than the trained files."""
+    directory = Path(directory)
+    manifest_path = directory / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("format") != FORMAT_VERSION:
+        LOGGER.warning("Ignoring %s: unsupported format %s", directory, manifest.get("format"))
+        return None
+    if fingerprint is not None and manifest.get("source_fingerprint") not in (None, fingerprint):
+        LOGGER.warning("Ignoring stale memory-mapped export in %s, re-run export_mmap_artifacts", directory)
+        return None
+
+    tensors = {}
+    with warnings.catch_warnings():
+        # The mapping is read-only on purpose; inference never writes to weights.
+        warnings.simplefilter("ignore", UserWarning)
+        for key, filename in manifest["tensors"].items():
+            tensors[key] = torch.from_numpy(load_array(directory / filename, mmap=True))
+    vocabularies = {name: Vocabulary.load(directory / "vocab", name) for name in manifest["vocabularies"]}
+    return MappedArtifacts(metadata=manifest["metadata"], tensors=tensors, vocabularies=vocabularies)
@@ -1,12 +1,22 @@
 from __future__ import annotations
 
 import json
+import logging
+import threading
 from pathlib import Path
-from typing import Dict, Iterable, Optional
+from typing import Iterable, List, Mapping, Optional, Sequence, Tuple
 
 import torch
 from torch import nn
 
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .embedding_index import ItemEmbeddingIndex
+from .mmap_artifacts import MMAP_SUBDIR, load_mapped_artifacts, source_fingerprint
+from .runtime import RUNTIME_EAGER, prepare_for_inference
+from .vocabulary import Vocabulary
+
+LOGGER = logging.getLogger(__name__)
+
 
 class NeuMF(nn.Module):
     def __init__(self, num_users: int, num_items: int, embedding_dim: int, hidden_dims: Iterable[int], dropout: float) -> None:
@@ -45,39 +55,156 @@ class NeuMF(nn.Module):
 class NCFRecommendationService:
     """Wrapper around the NeuMF model saved inside Model_AI_Sephora_NCF/artifacts."""
 
-    def __init__(self, artifacts_dir: Path | str, device: str = "cpu") -> None:
+    def __init__(
+        self,
+        artifacts_dir: Path | str,
+        device: str = "cpu",
+        runtime: str = RUNTIME_EAGER,
+        mmap_artifacts: bool = False,
+        retrieval_n_probe: int = 8,
+        load_breaker: CircuitBreaker | None = None,
+    ) -> None:
         self.artifacts_dir = Path(artifacts_dir)
         self.device = torch.device(device)
-        self._model: Optional[NeuMF] = None
-        self._user_encoder: Dict[str, int] | None = None
-        self._item_encoder: Dict[str, int] | None = None
+        self.runtime = runtime
+        self.mmap_artifacts = mmap_artifacts
+        self.retrieval_n_probe = retrieval_n_probe
+        self._model: Optional[nn.Module] = None
+        self._user_encoder: Mapping[str, int] | None = None
+        self._item_encoder: Mapping[str, int] | None = None
+        self._load_lock = threading.Lock()
+        self.load_breaker = load_breaker or CircuitBreaker("ncf-load")
+        # Embedding tables of the eager model (the optimized runtime may freeze them away).
+        self._user_vectors: torch.Tensor | None = None
+        self._item_vectors: torch.Tensor | None = None
+        self._retrieval: Tuple[ItemEmbeddingIndex, List[str]] | None = None
+        self._background_lock = threading.Lock()
+        self._background_load: threading.Thread | None = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
 
     def _load(self) -> None:
         if self._model is not None:
             return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            with self.load_breaker.guard():
+                model, user_encoder, item_encoder = self.load_artifacts()
+                example = torch.zeros(2, dtype=torch.long, device=self.device)
+                prepared = prepare_for_inference(model.to(self.device), (example, example), self.runtime)
+            self._user_encoder = user_encoder
+            self._item_encoder = item_encoder
+            self._user_vectors = model.user_embedding.weight.detach()
+            self._item_vectors = model.item_embedding.weight.detach()
+            self._model = prepared
+
+    def warm_up(self, batch_size: int = 8) -> None:
+        """Load the artifacts and push dummy batches through the model."""
+        self._load()
+        assert self._model is not None
+        indices = torch.zeros(batch_size, dtype=torch.long, device=self.device)
+        with torch.inference_mode():
+            for _ in range(2):
+                self._model(indices, indices)
+        self._retrieval_index()
+
+    def start_background_load(self) -> None:
+        """Run ``warm_up`` on a daemon thread unless one is already running."""
+        with self._background_lock:
+            if self._background_load is not None and self._background_load.is_alive():
+                return
+            self._background_load = threading.Thread(target=self._background_warm_up, name="ncf-load", daemon=True)
+            self._background_load.start()
+
+    def _background_warm_up(self) -> None:
+        try:
+            self.warm_up()
+        except Exception as exc:  # pragma: no cover - the next request tries again
+            LOGGER.warning("Background NCF load failed: %s", exc, exc_info=not isinstance(exc, CircuitOpenError))
+
+    def load_artifacts(self) -> Tuple[NeuMF, Mapping[str, int], Mapping[str, int]]:
+        """Read the eager NeuMF model (in eval mode, on CPU) and both id encoders.
+
+        With ``mmap_artifacts`` and an up-to-date export in ``artifacts_dir/mmap`` the
+        embedding tables and encoders stay memory-mapped instead of being loaded per worker.
+        """
         metrics_path = self.artifacts_dir / "ncf_metrics.json"
         model_path = self.artifacts_dir / "ncf_model.pt"
         user_encoder_path = self.artifacts_dir / "user_encoder.json"
         item_encoder_path = self.artifacts_dir / "item_encoder.json"
-        if not metrics_path.exists():
-            raise FileNotFoundError(f"Missing NCF artifacts in {self.artifacts_dir}")
-        config = json.loads(metrics_path.read_text(encoding="utf-8")).get("config", {})
+        mapped = None
+        if self.mmap_artifacts:
+            mapped = load_mapped_artifacts(
+                self.artifacts_dir / MMAP_SUBDIR,
+                fingerprint=source_fingerprint([metrics_path, model_path, user_encoder_path, item_encoder_path]),
+            )
+        if mapped is not None:
+            config = mapped.metadata.get("config", {})
+            user_encoder = mapped.vocabularies["user"]
+            item_encoder = mapped.vocabularies["item"]
+            state = mapped.tensors
+        else:
+            if not metrics_path.exists():
+                raise FileNotFoundError(f"Missing NCF artifacts in {self.artifacts_dir}")
+            config = json.loads(metrics_path.read_text(encoding="utf-8")).get("config", {})
+            user_encoder = self._read_encoder(user_encoder_path, "user")
+            item_encoder = self._read_encoder(item_encoder_path, "item")
+            state = torch.load(model_path, map_location="cpu")
         embedding_dim = config.get("embedding_dim", 64)
         hidden_dims = config.get("hidden_dims", [128, 64])
         dropout = config.get("dropout", 0.2)
-        self._user_encoder = json.loads(user_encoder_path.read_text(encoding="utf-8"))
-        self._item_encoder = json.loads(item_encoder_path.read_text(encoding="utf-8"))
         model = NeuMF(
-            num_users=len(self._user_encoder),
-            num_items=len(self._item_encoder),
+            num_users=len(user_encoder),
+            num_items=len(item_encoder),
             embedding_dim=embedding_dim,
             hidden_dims=hidden_dims,
             dropout=dropout,
         )
-        state = torch.load(model_path, map_location="cpu")
-        model.load_state_dict(state)
+        model.load_state_dict(state, assign=mapped is not None)
         model.eval()
-        self._model = model.to(self.device)
+        return model, user_encoder, item_encoder
+
+    def _read_encoder(self, json_path: Path, name: str) -> Vocabulary:
+        """Prefer the compact tables written by train_ncf.py; convert older JSON encoders."""
+        vocab_dir = self.artifacts_dir / "vocab"
+        if Vocabulary.exists(vocab_dir, name):
+            return Vocabulary.load(vocab_dir, name, mmap=False)
+        return Vocabulary.from_mapping(json.loads(json_path.read_text(encoding="utf-8")))
+
+    def retrieve(self, user_identifier: str | None, k: int) -> List[str]:
+        """Product ids of the ``k`` items whose embeddings best match the user's, best first.
+
+        NeuMF scores the concatenated embeddings with an MLP, so the inner product is only a
+        recall signal; callers rescore the retrieved items with ``score_many``.
+        """
+        if not user_identifier or k <= 0:
+            return []
+        self._load()
+        assert self._user_encoder is not None and self._user_vectors is not None
+        user_idx = self._user_encoder.get(str(user_identifier))
+        if user_idx is None:
+            return []
+        index, item_keys = self._retrieval_index()
+        query = self._user_vectors[user_idx].float().cpu().numpy()
+        return [item_keys[position] for position in index.search(query, k)]
+
+    def _retrieval_index(self) -> Tuple[ItemEmbeddingIndex, List[str]]:
+        if self._retrieval is not None:
+            return self._retrieval
+        with self._load_lock:
+            if self._retrieval is None:
+                assert self._item_vectors is not None and self._item_encoder is not None
+                item_keys = [""] * len(self._item_encoder)
+                for key, position in self._item_encoder.items():
+                    item_keys[position] = key
+                index = ItemEmbeddingIndex.build(
+                    self._item_vectors.float().cpu().numpy(), n_probe=self.retrieval_n_probe
+                )
+                self._retrieval = (index, item_keys)
+        return self._retrieval
 
     def score(self, user_identifier: str | None, product_external_id: str | None) -> Optional[float]:
         if not user_identifier or not product_external_id:
@@ -90,8 +217,44 @@ class NCFRecommendationService:
             return None
         user_tensor = torch.tensor([user_idx], dtype=torch.long, device=self.device)
         item_tensor = torch.tensor([item_idx], dtype=torch.long, device=self.device)
-        with torch.no_grad():
+        with torch.inference_mode():
             logits = self._model(user_tensor, item_tensor)
             score = torch.sigmoid(logits).item()
         return float(score)
 
+    def score_many(
+        self,
+        user_identifier: str | None,
+        product_ids: Sequence[str | None],
+    ) -> List[Optional[float]]:
+        """Score every candidate for one user in a single batched forward pass."""
+        scores: List[Optional[float]] = [None] * len(product_ids)
+        if not user_identifier or not product_ids:
+            return scores
+        self._load()
+        assert self._model is not None and self._user_encoder is not None and self._item_encoder is not None
+        user_idx = self._user_encoder.get(str(user_identifier))
+        if user_idx is None:
+            return scores
+
+        positions: List[int] = []
+        item_indices: List[int] = []
+        for position, product_id in enumerate(product_ids):
+            if not product_id:
+                continue
+            item_idx = self._item_encoder.get(str(product_id))
+            if item_idx is None:
+                continue
+            positions.append(position)
+            item_indices.append(item_idx)
+        if not item_indices:
+            return scores
+
+        item_tensor = torch.tensor(item_indices, dtype=torch.long, device=self.device)
+        user_tensor = torch.full_like(item_tensor, user_idx)
+        with torch.inference_mode():
+            logits = self._model(user_tensor, item_tensor)
+            batch_scores = torch.sigmoid(logits).cpu().tolist()
+        for position, score in zip(positions, batch_scores):
+            scores[position] = float(score)
+        return scores
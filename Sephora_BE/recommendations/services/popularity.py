@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Dict
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from products.models import Product
+
+LOGGER = logging.getLogger(__name__)
+
+# Pseudo-review count pulling products with few reviews towards the catalog mean rating.
+RATING_PRIOR_REVIEWS = 20
+# Seconds before a failed refresh is tried again.
+FAILURE_RETRY_SECONDS = 30.0
+
+
+class PopularityRanking:
+    """Model-free product scores from ``Product.avg_rating`` and ``review_count``.
+
+    The score is a Bayesian average rating scaled to 0-1 (a handful of 5-star reviews
+    does not beat hundreds of 4.7s). Scores for every in-stock product are computed in one
+    query by a single background thread once the snapshot is older than
+    ``refresh_seconds``; requests keep reading the previous snapshot meanwhile (empty
+    before the first one lands, i.e. every product scores 0), so the degraded paths of
+    personalized search never wait on anything but a dict lookup.
+    """
+
+    def __init__(self, refresh_seconds: float = 600.0) -> None:
+        self.refresh_seconds = float(refresh_seconds)
+        self._lock = threading.Lock()
+        self._scores: Dict[int, float] = {}
+        self._computed_at: float | None = None
+        self._refreshing = False
+
+    def score(self, product_id: int) -> float:
+        self._refresh_if_stale()
+        return self._scores.get(product_id, 0.0)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._computed_at = None
+
+    def refresh(self) -> Dict[int, float]:
+        """Recompute the scores now (warm-up) and swap them in."""
+        rows = list(Product.objects.filter(stock__gt=0).values_list("productid", "avg_rating", "review_count"))
+        rated = [(float(rating), count or 0) for _, rating, count in rows if rating is not None and count]
+        total_reviews = sum(count for _, count in rated)
+        mean_rating = sum(rating * count for rating, count in rated) / total_reviews if total_reviews else 0.0
+        scores: Dict[int, float] = {}
+        for product_id, rating, count in rows:
+            count = count or 0
+            rating = float(rating) if rating is not None else mean_rating
+            bayesian = (RATING_PRIOR_REVIEWS * mean_rating + count * rating) / (RATING_PRIOR_REVIEWS + count)
+            scores[product_id] = bayesian / 5.0
+        with self._lock:
+            self._scores = scores
+            self._computed_at = time.monotonic()
+        return scores
+
+    def _refresh_if_stale(self) -> None:
+        with self._lock:
+            computed_at = self._computed_at
+            if self._refreshing or (
+                computed_at is not None and time.monotonic() - computed_at < self.refresh_seconds
+            ):
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="popularity-refresh", daemon=True).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception:  # pragma: no cover - keep serving the previous snapshot
+            LOGGER.exception("Popularity refresh failed, keeping the previous scores")
+            with self._lock:
+                self._computed_at = time.monotonic() - self.refresh_seconds + FAILURE_RETRY_SECONDS
+        finally:
+            with self._lock:
+                self._refreshing = False
+            close_old_connections()
+
+
+POPULARITY = PopularityRanking(
+    refresh_seconds=settings.ML_ARTIFACTS.get("POPULARITY_REFRESH_SECONDS", 600),
+)
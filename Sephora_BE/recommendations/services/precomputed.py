@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from datetime import timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import PrecomputedRecommendation, RecommendationConfig
+from .result_cache import RESULT_CACHE
+
+
+def profile_fingerprint(skin_profile: dict, allergy_term: str | None, author_id: str) -> str:
+    """Hash of everything besides the catalog and models that shapes a no-query ranking."""
+    profile = {
+        key: value
+        for key, value in skin_profile.items()
+        if key != "save_profile" and value not in (None, "", [])
+    }
+    canonical = json.dumps(
+        {
+            "profile": profile,
+            "allergy": (allergy_term or "").strip().lower(),
+            "author": author_id,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def model_version(config: RecommendationConfig) -> str:
+    """Blend weights version plus the fingerprint of the DNN/NCF artifacts."""
+    return f"cfg{config.version}:{RESULT_CACHE.artifact_fingerprint()}"
+
+
+class PrecomputedRecommendationStore:
+    """Serve nightly rankings written by ``precompute_recommendations``.
+
+    An entry is only used when it was computed for the same profile fingerprint and
+    model version, is younger than ``max_age_hours`` and holds at least ``limit`` items
+    (or every candidate there was); anything else falls back to online scoring.
+    """
+
+    def __init__(self, enabled: bool = True, max_age_hours: float = 26.0) -> None:
+        self.enabled = enabled
+        self.max_age = timedelta(hours=float(max_age_hours))
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"hits": 0, "missing": 0, "stale": 0, "mismatched": 0, "unavailable": 0}
+
+    def lookup(
+        self,
+        user_id: int,
+        fingerprint: str,
+        config: RecommendationConfig,
+        limit: int,
+    ) -> List[dict] | None:
+        """Stored entries for the top ``limit`` items, or None; the caller records the hit."""
+        if not self.enabled:
+            return None
+        row = (
+            PrecomputedRecommendation.objects.filter(user_id=user_id)
+            .only("model_version", "profile_fingerprint", "top_n", "entries", "computed_at")
+            .first()
+        )
+        if row is None:
+            self._count("missing")
+            return None
+        if row.computed_at < timezone.now() - self.max_age or row.model_version != model_version(config):
+            self._count("stale")
+            return None
+        if row.profile_fingerprint != fingerprint or (row.top_n < limit and len(row.entries) >= row.top_n):
+            self._count("mismatched")
+            return None
+        return list(row.entries[:limit])
+
+    def record(self, outcome: str) -> None:
+        """Count ``hits``, or ``unavailable`` when a stored product can no longer be served."""
+        self._count(outcome)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = sum(counters.values())
+        return {
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+            "enabled": self.enabled,
+            "max_age_hours": self.max_age.total_seconds() / 3600.0,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + 1
+
+
+PRECOMPUTED_STORE = PrecomputedRecommendationStore(
+    enabled=settings.ML_ARTIFACTS.get("PRECOMPUTED_RECOMMENDATIONS", True),
+    max_age_hours=settings.ML_ARTIFACTS.get("PRECOMPUTED_MAX_AGE_HOURS", 26),
+)
@@ -27,6 +27,11 @@ def _to_float(value: str | None) -> float:
         return 0.0
 
 
+def join_ingredients(ingredients) -> str:
+    """Lowercased ingredient text used for allergy checks and reason matching."""
+    return " ".join(ingredients or []).lower()
+
+
 def _to_int(value: str | None) -> int:
     try:
         return int(float(value))
@@ -59,6 +64,7 @@ class ProductMetadataRow:
     child_count: int
     child_min_price: float
     child_max_price: float
+    ingredients_text: str = ""
 
     def to_feature_dict(self) -> Dict[str, object]:
         return {
@@ -110,6 +116,7 @@ class ProductMetadataRepository:
                     product_name = (row.get("product_name") or "").strip()
                     if not product_id:
                         continue
+                    ingredients = _parse_list(row.get("ingredients"))
                     entry = ProductMetadataRow(
                         product_id=product_id,
                         product_name=product_name,
@@ -127,13 +134,14 @@ class ProductMetadataRepository:
                         out_of_stock=_to_int(row.get("out_of_stock")),
                         sephora_exclusive=_to_int(row.get("sephora_exclusive")),
                         highlights=_parse_list(row.get("highlights")),
-                        ingredients=_parse_list(row.get("ingredients")),
+                        ingredients=ingredients,
                         primary_category=(row.get("primary_category") or "").strip(),
                         secondary_category=(row.get("secondary_category") or "").strip(),
                         tertiary_category=(row.get("tertiary_category") or "").strip(),
                         child_count=_to_int(row.get("child_count")),
                         child_min_price=_to_float(row.get("child_min_price")),
                         child_max_price=_to_float(row.get("child_max_price")),
+                        ingredients_text=join_ingredients(ingredients),
                     )
                     self._by_product_id[product_id.upper()] = entry
                     key = product_name.lower()
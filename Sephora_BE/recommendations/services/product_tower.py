@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import Mapping, Sequence
+
+import numpy as np
+
+from .vocabulary import Vocabulary, load_array
+
+LOGGER = logging.getLogger(__name__)
+
+PRODUCT_TOWER_SUBDIR = "product_tower"
+MANIFEST_NAME = "manifest.json"
+
+
+class ProductTowerTable:
+    """Product-tower outputs of a two-tower DNN for the whole catalog.
+
+    Stored next to the DNN artifacts as ``vectors.npy`` (float32, one row per product),
+    a Vocabulary from product id to row and a manifest with the fingerprint of the
+    weights that produced them, so a retrained model never reads vectors of the old one.
+    Both arrays are memory-mapped and shared between workers.
+    """
+
+    def __init__(self, vectors: np.ndarray, rows: Mapping[str, int]) -> None:
+        self.vectors = vectors
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def get(self, product_id: str) -> np.ndarray | None:
+        row = self.rows.get(product_id)
+        return None if row is None else self.vectors[row]
+
+    @classmethod
+    def load(cls, directory: Path | str, fingerprint: str | None) -> "ProductTowerTable | None":
+        """The table in ``directory``; None when missing or built from other weights."""
+        directory = Path(directory)
+        manifest_path = directory / MANIFEST_NAME
+        if not manifest_path.exists():
+            return None
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if fingerprint is None or manifest.get("source_fingerprint") != fingerprint:
+            LOGGER.warning("Ignoring stale product tower table in %s, re-run export_product_tower", directory)
+            return None
+        return cls(load_array(directory / "vectors.npy", mmap=True), Vocabulary.load(directory, "products"))
+
+    @staticmethod
+    def save(
+        directory: Path | str,
+        product_ids: Sequence[str],
+        vectors: np.ndarray,
+        fingerprint: str | None,
+    ) -> Path:
+        """Write the table to a staging directory and swap it in place of ``directory``."""
+        directory = Path(directory)
+        staging = directory.with_name(f"{directory.name}.tmp")
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
+        np.save(staging / "vectors.npy", np.ascontiguousarray(vectors, dtype=np.float32))
+        Vocabulary.from_mapping({product_id: row for row, product_id in enumerate(product_ids)}).save(
+            staging, "products"
+        )
+        manifest = {"source_fingerprint": fingerprint, "products": len(product_ids), "dim": int(vectors.shape[1])}
+        (staging / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+        previous = directory.with_name(f"{directory.name}.old")
+        if directory.exists():
+            if previous.exists():
+                shutil.rmtree(previous)
+            directory.rename(previous)
+        staging.rename(directory)
+        if previous.exists():
+            shutil.rmtree(previous)
+        return directory
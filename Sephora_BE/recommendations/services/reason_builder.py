@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Dict, List, Sequence
+from typing import Dict, List
 
 
 class RecommendationReasonBuilder:
@@ -23,14 +23,16 @@ class RecommendationReasonBuilder:
         similar_user_count: int | None = None,
         allergy_match: bool = True,
     ) -> List[str]:
+        """``product_metadata["ingredients_text"]`` is expected lowercased (see ``join_ingredients``)."""
         reasons: List[str] = []
         skin_type = (skin_profile.get("skin_type") or "").lower()
         product_skin = (product_metadata.get("skin_types") or "").lower()
         if skin_type and skin_type in product_skin:
             reasons.append(f"Dành cho da {skin_type}")
+        ingredients_text = product_metadata.get("ingredients_text") or ""
         for concern in skin_profile.get("skin_concerns") or []:
             mapped = self.CONCERN_MAP.get(concern, concern)
-            if concern.lower() in product_metadata.get("ingredients_text", "").lower():
+            if concern.lower() in ingredients_text:
                 reasons.append(mapped)
         highlights = product_metadata.get("highlights") or []
         if highlights:
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .version_stamp import VersionStamp
+
+LOGGER = logging.getLogger(__name__)
+
+FINGERPRINT_TTL_SECONDS = 30.0
+
+
+class ResultCache:
+    """Two-level cache for personalized search results.
+
+    Level one is an in-process LRU with a TTL; level two (optional) is Django's cache
+    framework so workers can share entries. Keys embed a version stamp kept in the
+    database plus a fingerprint of the model artifacts, so bumping the version (config
+    saved, catalog edited) or retraining a model makes every old entry unreachable in
+    every worker within the stamp's TTL.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 300.0,
+        shared: bool = False,
+        watch_dirs: Iterable[Path | str] = (),
+        version_ttl_seconds: float = 2.0,
+    ) -> None:
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.shared = shared
+        self.watch_dirs = [Path(path) for path in watch_dirs]
+        self._stamp = VersionStamp("result_cache", ttl_seconds=version_ttl_seconds)
+        self._entries: OrderedDict[str, Tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = ""
+        self._fingerprint_checked = 0.0
+        self._counters: Dict[str, int] = {"local_hits": 0, "shared_hits": 0, "misses": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def make_key(self, **parts: object) -> str:
+        canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        return f"recommendations:results:{self._version()}:{self.artifact_fingerprint()}:{digest}"
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters["local_hits"] += 1
+                    return value
+                del self._entries[key]
+        if self.shared:
+            value = cache.get(key)
+            if value is not None:
+                self._store_local(key, value)
+                with self._lock:
+                    self._counters["shared_hits"] += 1
+                return value
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def set(self, key: str, value: object) -> None:
+        if not self.enabled:
+            return
+        self._store_local(key, value)
+        if self.shared:
+            cache.set(key, value, timeout=self.ttl_seconds)
+
+    def invalidate(self) -> None:
+        """Bump the shared version so every worker stops serving existing entries."""
+        self._stamp.bump()
+        with self._lock:
+            self._entries.clear()
+            self._counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+        lookups = counters["local_hits"] + counters["shared_hits"] + counters["misses"]
+        hits = counters["local_hits"] + counters["shared_hits"]
+        return {
+            **counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "local_size": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "shared": self.shared,
+            "version": self._version(),
+        }
+
+    def _store_local(self, key: str, value: object) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _version(self) -> int:
+        return self._stamp.current()
+
+    def watch(self, directories: Iterable[Path | str]) -> None:
+        """Follow other artifact directories (a new registry version went live)."""
+        self.watch_dirs = [Path(path) for path in directories]
+        self._fingerprint_checked = 0.0
+
+    def artifact_fingerprint(self) -> str:
+        """Short hash of the files in the watched artifact directories (re-checked every 30s)."""
+        now = time.monotonic()
+        if now - self._fingerprint_checked < FINGERPRINT_TTL_SECONDS and self._fingerprint:
+            return self._fingerprint
+        stamps = []
+        for directory in self.watch_dirs:
+            if not directory.exists():
+                continue
+            for path in sorted(directory.iterdir()):
+                if path.is_file():
+                    stat = path.stat()
+                    stamps.append(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}")
+        fingerprint = hashlib.sha1("|".join(stamps).encode("utf-8")).hexdigest()[:12]
+        if self._fingerprint and fingerprint != self._fingerprint:
+            LOGGER.info("Model artifacts changed, personalized search result cache reset")
+            with self._lock:
+                self._entries.clear()
+        self._fingerprint = fingerprint
+        self._fingerprint_checked = now
+        return fingerprint
+
+
+RESULT_CACHE = ResultCache(
+    max_entries=settings.ML_ARTIFACTS.get("RESULT_CACHE_MAX_ENTRIES", 512),
+    ttl_seconds=settings.ML_ARTIFACTS.get("RESULT_CACHE_TTL_SECONDS", 300),
+    shared=settings.ML_ARTIFACTS.get("RESULT_CACHE_SHARED", False),
+    watch_dirs=[settings.ML_ARTIFACTS["DNN_DIR"], settings.ML_ARTIFACTS["NCF_DIR"]],
+    version_ttl_seconds=settings.ML_ARTIFACTS.get("RESULT_CACHE_VERSION_TTL_SECONDS", 2),
+)
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import logging
+import warnings
+from typing import Tuple
+
+import torch
+from torch import nn
+
+LOGGER = logging.getLogger(__name__)
+
+RUNTIME_EAGER = "eager"
+RUNTIME_OPTIMIZED = "optimized"
+RUNTIME_OPTIMIZED_INT8 = "optimized_int8"
+RUNTIMES = (RUNTIME_EAGER, RUNTIME_OPTIMIZED, RUNTIME_OPTIMIZED_INT8)
+
+
+def prepare_for_inference(
+    model: nn.Module,
+    example_inputs: Tuple[torch.Tensor, ...],
+    runtime: str = RUNTIME_EAGER,
+) -> nn.Module:
+    """Return ``model`` ready for serving in the requested runtime.
+
+    ``optimized`` traces the module and freezes the graph (weights become constants and
+    eval-mode Dropout disappears); ``optimized_int8`` additionally swaps every
+    ``nn.Linear`` for a dynamically quantized int8 kernel first (CPU only). If tracing
+    or freezing fails the closest working module is served instead.
+    """
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown inference runtime {runtime!r}, expected one of {RUNTIMES}")
+    model.eval()
+    if runtime == RUNTIME_EAGER:
+        return model
+
+    device = next(model.parameters()).device
+    if runtime == RUNTIME_OPTIMIZED_INT8:
+        if device.type == "cpu":
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        else:
+            LOGGER.warning("Dynamic int8 quantization needs CPU, serving %s without it", device)
+
+    with warnings.catch_warnings():
+        # TorchScript and the quantized kernels emit deprecation notices on recent torch.
+        warnings.simplefilter("ignore", FutureWarning)
+        warnings.simplefilter("ignore", UserWarning)
+        try:
+            with torch.no_grad():
+                traced = torch.jit.trace(model, example_inputs, check_trace=False)
+        except Exception:
+            LOGGER.exception("Tracing %s failed, serving the eager module", type(model).__name__)
+            return model
+        try:
+            return torch.jit.freeze(traced)
+        except RuntimeError:
+            LOGGER.exception("Freezing %s failed, serving the unfrozen trace", type(model).__name__)
+            return traced
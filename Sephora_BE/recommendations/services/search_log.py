@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from ..models import PersonalizedSearchLog
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class PendingLog:
+    log: PersonalizedSearchLog
+    after: Optional[Callable[[], None]] = None
+
+
+class SearchLogWriter:
+    """Write-behind sink for PersonalizedSearchLog rows.
+
+    Requests enqueue unsaved log instances (``created_at`` is stamped at enqueue time)
+    and a daemon thread persists them with ``bulk_create`` every ``batch_size`` records
+    or ``flush_interval_ms``, whichever comes first. When the queue is full the caller
+    writes inline instead (backpressure), so a log is only lost if the database write
+    itself fails. ``find_log`` lets readers such as the feedback endpoint look a session
+    up even when its row is still queued here or in another worker.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_queue: int = 2000,
+        batch_size: int = 50,
+        flush_interval_ms: float = 200.0,
+    ) -> None:
+        self.enabled = enabled
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.001, float(flush_interval_ms) / 1000.0)
+        self._queue: "queue.Queue[PendingLog]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[str, int] = {}
+        self._pending_cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._counters: Dict[str, int] = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "backpressure_inline": 0,
+            "dropped": 0,
+        }
+        self._counter_lock = threading.Lock()
+
+    def submit(self, log: PersonalizedSearchLog, after: Optional[Callable[[], None]] = None) -> None:
+        item = PendingLog(log=log, after=after)
+        if not self.enabled or self._stop.is_set():
+            self._write([item])
+            return
+        self._ensure_thread()
+        self._mark_pending(log.session_id, 1)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._mark_pending(log.session_id, -1)
+            self._count("backpressure_inline")
+            self._write([item])
+            return
+        self._count("enqueued")
+
+    def flush(self) -> int:
+        """Synchronously drain everything currently queued."""
+        written = 0
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def wait_for_session(self, session_id: str, timeout: float | None = None) -> bool:
+        """Make sure a queued log for ``session_id`` is persisted; True if nothing is pending."""
+        with self._pending_cond:
+            if not self._pending.get(session_id):
+                return True
+        self.flush()
+        deadline = time.monotonic() + (timeout if timeout is not None else self.flush_interval * 5)
+        with self._pending_cond:
+            while self._pending.get(session_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._pending_cond.wait(remaining)
+        return True
+
+    @property
+    def max_write_delay(self) -> float:
+        """How long a queued row can take to reach the database in a healthy writer."""
+        return self.flush_interval * 5 if self.enabled else 0.0
+
+    def find_log(self, session_id: str) -> PersonalizedSearchLog | None:
+        """Latest log row of ``session_id``, allowing for rows that are not written yet.
+
+        A row queued in this process is flushed first. When another worker served the
+        search its row may still sit in that worker's queue, so a miss is retried against
+        the database with backoff for up to ``max_write_delay`` seconds.
+        """
+        self.wait_for_session(session_id)
+        deadline = time.monotonic() + self.max_write_delay
+        delay = 0.02
+        while True:
+            log = PersonalizedSearchLog.objects.filter(session_id=session_id).order_by("-created_at").first()
+            remaining = deadline - time.monotonic()
+            if log is not None or remaining <= 0:
+                return log
+            time.sleep(min(delay, remaining))
+            delay *= 2
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=self.flush_interval * 5)
+        self.flush()
+
+    def stats(self) -> Dict[str, object]:
+        with self._counter_lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "queued": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": round(self.flush_interval * 1000, 1),
+            "enabled": self.enabled,
+        }
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="search-log-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            close_old_connections()
+
+    def _drain(self, limit: int) -> List[PendingLog]:
+        batch: List[PendingLog] = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[PendingLog]) -> int:
+        written = 0
+        with self._flush_lock:
+            try:
+                PersonalizedSearchLog.objects.bulk_create([item.log for item in batch])
+                written = len(batch)
+                self._count("written", written)
+                self._count("batches")
+            except Exception:
+                LOGGER.exception("Failed to persist %s personalized search logs", len(batch))
+                self._count("dropped", len(batch))
+            finally:
+                for item in batch:
+                    self._mark_pending(item.log.session_id, -1)
+        for item in batch:
+            if item.after is None:
+                continue
+            try:
+                item.after()
+            except Exception:
+                LOGGER.exception("Post-log callback failed for session %s", item.log.session_id)
+        return written
+
+    def _mark_pending(self, session_id: str, delta: int) -> None:
+        with self._pending_cond:
+            count = self._pending.get(session_id, 0) + delta
+            if count > 0:
+                self._pending[session_id] = count
+            else:
+                self._pending.pop(session_id, None)
+                self._pending_cond.notify_all()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._counter_lock:
+            self._counters[name] += amount
+
+
+SEARCH_LOG_WRITER = SearchLogWriter(
+    enabled=settings.ML_ARTIFACTS.get("SEARCH_LOG_ASYNC", True),
+    max_queue=settings.ML_ARTIFACTS.get("SEARCH_LOG_QUEUE_SIZE", 2000),
+    batch_size=settings.ML_ARTIFACTS.get("SEARCH_LOG_BATCH_SIZE", 50),
+    flush_interval_ms=settings.ML_ARTIFACTS.get("SEARCH_LOG_FLUSH_MS", 200),
+)
+atexit.register(SEARCH_LOG_WRITER.shutdown)
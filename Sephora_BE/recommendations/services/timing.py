@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import ContextManager, Dict, Iterator, List, Sequence
+
+# Stages of personalized_search, in pipeline order (also the Server-Timing order).
+STAGES = (
+    "profile",
+    "result_cache",
+    "precomputed",
+    "content_filter",
+    "embedding_retrieval",
+    "candidate_query",
+    "metadata",
+    "feature_encoding",
+    "dnn_forward",
+    "ncf",
+    "business_rules",
+    "serialization",
+    "log_write",
+)
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 150, 200, 250, 500)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_CURRENT: ContextVar["RequestTimings | None"] = ContextVar("recommendation_timings", default=None)
+
+
+class RequestTimings:
+    """Wall time per pipeline stage and item counts for one request."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._started = time.perf_counter()
+        self.total_ms = 0.0
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000.0
+            # A stage entered twice (e.g. two model calls) accumulates.
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def count(self, name: str, value: int) -> None:
+        self.counts[name] = int(value)
+
+    def finish(self) -> None:
+        self.total_ms = (time.perf_counter() - self._started) * 1000.0
+
+    def server_timing(self) -> str:
+        """Value for the ``Server-Timing`` response header."""
+        ordered = [name for name in STAGES if name in self.stages]
+        ordered += [name for name in self.stages if name not in STAGES]
+        parts = [f"{name};dur={self.stages[name]:.2f}" for name in ordered]
+        parts.append(f"total;dur={self.total_ms:.2f}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "stages_ms": {name: round(value, 3) for name, value in self.stages.items()},
+            "counts": dict(self.counts),
+            "total_ms": round(self.total_ms, 3),
+        }
+
+
+@contextmanager
+def track_request() -> Iterator[RequestTimings]:
+    """Make a fresh RequestTimings current for the duration of the block."""
+    timings = RequestTimings()
+    token = _CURRENT.set(timings)
+    try:
+        yield timings
+    finally:
+        timings.finish()
+        _CURRENT.reset(token)
+
+
+def stage(name: str) -> ContextManager[None]:
+    """Time ``name`` on the current request; a no-op outside ``track_request``."""
+    timings = _CURRENT.get()
+    return timings.stage(name) if timings is not None else nullcontext()
+
+
+def record_count(name: str, value: int) -> None:
+    timings = _CURRENT.get()
+    if timings is not None:
+        timings.count(name, value)
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus layout: cumulative ``le`` buckets, sum, count)."""
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = tuple(bounds)
+        self._buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self._buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for position, bucket_count in enumerate(self._buckets):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.bounds[position - 1] if position > 0 else 0.0
+                if position >= len(self.bounds):
+                    # Overflow bucket has no upper bound; report its lower edge.
+                    return lower
+                upper = self.bounds[position]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+    def snapshot(self) -> Dict[str, object]:
+        cumulative: List[int] = []
+        running = 0
+        for bucket_count in self._buckets:
+            running += bucket_count
+            cumulative.append(running)
+        buckets = {str(bound): cumulative[idx] for idx, bound in enumerate(self.bounds)}
+        buckets["+Inf"] = cumulative[-1]
+        estimates = {f"p{int(q * 100)}": self.quantile(q) for q in QUANTILES}
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            **{key: round(value, 3) if value is not None else None for key, value in estimates.items()},
+            "buckets": buckets,
+        }
+
+
+class PipelineMetrics:
+    """Process-wide histograms of stage latencies (ms) and candidate counts."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._stages: Dict[str, Histogram] = {}
+        self._counts: Dict[str, Histogram] = {}
+        self._total = Histogram(LATENCY_BUCKETS_MS)
+
+    def observe(self, timings: RequestTimings) -> None:
+        with self._lock:
+            for name, value in timings.stages.items():
+                self._stages.setdefault(name, Histogram(LATENCY_BUCKETS_MS)).observe(value)
+            for name, value in timings.counts.items():
+                self._counts.setdefault(name, Histogram(COUNT_BUCKETS)).observe(value)
+            self._total.observe(timings.total_ms)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            ordered = [name for name in STAGES if name in self._stages]
+            ordered += sorted(name for name in self._stages if name not in STAGES)
+            return {
+                "requests": self._total.count,
+                "total_ms": self._total.snapshot(),
+                "stages_ms": {name: self._stages[name].snapshot() for name in ordered},
+                "counts": {name: histogram.snapshot() for name, histogram in sorted(self._counts.items())},
+            }
+
+
+PIPELINE_METRICS = PipelineMetrics()
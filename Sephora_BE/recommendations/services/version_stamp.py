@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from ..models import RecommendationVersionStamp
+
+
+class VersionStamp:
+    """A counter in ``recommendation_version_stamp`` that every worker process can see.
+
+    Django's default cache is per process, so announcements that must reach all
+    gunicorn workers (and management commands) go through the database instead.
+    ``current`` re-reads the row at most every ``ttl_seconds``; ``bump`` increments it
+    atomically and is visible to this process immediately.
+    """
+
+    def __init__(self, key: str, ttl_seconds: float = 2.0) -> None:
+        self.key = key
+        self.ttl_seconds = float(ttl_seconds)
+        self._lock = threading.Lock()
+        self._version = 1
+        self._checked_at: float | None = None
+
+    def current(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.ttl_seconds:
+                return self._version
+        version = (
+            RecommendationVersionStamp.objects.filter(key=self.key).values_list("version", flat=True).first() or 1
+        )
+        with self._lock:
+            self._version = version
+            self._checked_at = now
+        return version
+
+    def bump(self) -> int:
+        stamps = RecommendationVersionStamp.objects.filter(key=self.key)
+        if not stamps.update(version=F("version") + 1):
+            try:
+                with transaction.atomic():
+                    RecommendationVersionStamp.objects.create(key=self.key, version=2)
+            except IntegrityError:
+                # Another process created the row first.
+                stamps.update(version=F("version") + 1)
+        version = stamps.values_list("version", flat=True).first()
+        with self._lock:
+            self._version = version
+            self._checked_at = time.monotonic()
+        return version
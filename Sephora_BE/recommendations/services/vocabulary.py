@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import zlib
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, Tuple
+
+import numpy as np
+
+
+class Vocabulary(Mapping[str, int]):
+    """Read-only ``str -> int`` table stored as four flat arrays.
+
+    Keys are UTF-8 encoded and ordered by ``(crc32(key), key)``: ``hashes[i]`` is the
+    CRC32 of key ``i``, ``blob[offsets[i]:offsets[i + 1]]`` its bytes and ``ids[i]`` its
+    value. A lookup bisects the hash column in C and compares the one or two keys that
+    share the hash, so the arrays can be memory-mapped from ``.npy`` files and shared
+    between worker processes through the page cache.
+    """
+
+    PARTS = ("hashes", "blob", "offsets", "ids")
+
+    def __init__(self, hashes: np.ndarray, blob: np.ndarray, offsets: np.ndarray, ids: np.ndarray) -> None:
+        self._hashes = hashes
+        self._blob = blob
+        self._offsets = offsets
+        self._ids = ids
+        # memoryview indexing returns plain ints/bytes without numpy scalar overhead.
+        self._hash_view = memoryview(np.ascontiguousarray(hashes, dtype=np.uint32))
+        self._blob_view = memoryview(blob) if blob.size else memoryview(b"")
+        self._offset_view = memoryview(np.ascontiguousarray(offsets, dtype=np.int64))
+        self._id_view = memoryview(np.ascontiguousarray(ids, dtype=np.int64))
+        self._size = len(ids)
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping[str, int]) -> "Vocabulary":
+        return cls(*encode_vocabulary(mapping))
+
+    @classmethod
+    def exists(cls, directory: Path | str, name: str) -> bool:
+        return all((Path(directory) / f"{name}.{part}.npy").exists() for part in cls.PARTS)
+
+    @classmethod
+    def load(cls, directory: Path | str, name: str, mmap: bool = True) -> "Vocabulary":
+        directory = Path(directory)
+        return cls(*[load_array(directory / f"{name}.{part}.npy", mmap) for part in cls.PARTS])
+
+    def save(self, directory: Path | str, name: str) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for part, array in zip(self.PARTS, (self._hashes, self._blob, self._offsets, self._ids)):
+            np.save(directory / f"{name}.{part}.npy", np.asarray(array))
+
+    def get(self, key: str, default=None):
+        position = self._find(key)
+        return default if position < 0 else self._id_view[position]
+
+    def __getitem__(self, key: str) -> int:
+        position = self._find(key)
+        if position < 0:
+            raise KeyError(key)
+        return self._id_view[position]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for position in range(self._size):
+            yield self._key_at(position).decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _key_at(self, position: int) -> bytes:
+        return self._blob_view[self._offset_view[position] : self._offset_view[position + 1]].tobytes()
+
+    def _find(self, key: str) -> int:
+        target = key.encode("utf-8")
+        digest = zlib.crc32(target)
+        hashes = self._hash_view
+        position = bisect_left(hashes, digest)
+        while position < self._size and hashes[position] == digest:
+            if self._key_at(position) == target:
+                return position
+            position += 1
+        return -1
+
+
+def encode_vocabulary(mapping: Mapping[str, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Arrays (hashes, blob, offsets, ids) for ``mapping`` in Vocabulary's on-disk order."""
+    entries = sorted(
+        (zlib.crc32(encoded), encoded, int(value))
+        for encoded, value in ((str(key).encode("utf-8"), value) for key, value in mapping.items())
+    )
+    hashes = np.asarray([digest for digest, _, _ in entries], dtype=np.uint32)
+    offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+    if entries:
+        offsets[1:] = np.cumsum([len(encoded) for _, encoded, _ in entries])
+    blob = np.frombuffer(b"".join(encoded for _, encoded, _ in entries), dtype=np.uint8).copy()
+    ids = np.asarray([value for _, _, value in entries], dtype=np.int64)
+    return hashes, blob, offsets, ids
+
+
+def categorical_vocabularies(
+    metadata: Mapping[str, object],
+    artifacts_dir: Path | str,
+    mmap: bool = False,
+) -> Dict[str, Vocabulary]:
+    """Vocabularies of the DNN categorical features described by ``dnn_metadata.pt``.
+
+    Current training runs write them under ``categorical_vocab_dir``; older metadata
+    still pickles ``categorical_maps`` dicts, which are converted once at load time.
+    """
+    maps = metadata.get("categorical_maps")
+    if maps is not None:
+        return {
+            feature: mapping if isinstance(mapping, Vocabulary) else Vocabulary.from_mapping(mapping)
+            for feature, mapping in maps.items()
+        }
+    vocab_dir = Path(artifacts_dir) / str(metadata.get("categorical_vocab_dir", "vocab"))
+    return {
+        feature: Vocabulary.load(vocab_dir, f"categorical.{feature}", mmap=mmap)
+        for feature in metadata["categorical_features"]
+    }
+
+
+def load_array(path: Path, mmap: bool) -> np.ndarray:
+    if not mmap:
+        return np.load(path)
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        # Zero-length arrays cannot be mapped.
+        return np.load(path)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List
+
+LOGGER = logging.getLogger(__name__)
+
+
+def is_serving_process(argv: List[str] | None = None) -> bool:
+    """False for one-off management commands (migrate, shell, ...) and Celery workers."""
+    argv = sys.argv if argv is None else argv
+    program = os.path.basename(argv[0]) if argv else ""
+    if program.startswith("celery"):
+        return False
+    if program != "manage.py":
+        return True
+    if len(argv) < 2 or argv[1] != "runserver":
+        return False
+    # With the autoreloader only the child process (RUN_MAIN) serves requests.
+    return os.environ.get("RUN_MAIN") == "true" or "--noreload" in argv
+
+
+class ModelWarmup:
+    """Warm the ML components of this worker in parallel and report readiness.
+
+    Each component is a callable that loads and exercises one piece (model, index);
+    they run in their own daemon threads so startup is bounded by the slowest one
+    rather than the sum. When warm-up was never started the worker counts as ready and
+    components keep loading lazily on first use.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._components: Dict[str, Dict[str, object]] = {}
+        self.started = False
+
+    def start(self, components: Dict[str, Callable[[], None]]) -> List[threading.Thread]:
+        threads = []
+        with self._lock:
+            self.started = True
+            for name in components:
+                self._components[name] = {"state": "pending"}
+        for name, warm in components.items():
+            thread = threading.Thread(target=self._run, args=(name, warm), name=f"warmup-{name}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def status(self) -> Dict[str, object]:
+        with self._lock:
+            components = {name: dict(state) for name, state in self._components.items()}
+            started = self.started
+        states = {state["state"] for state in components.values()}
+        if states & {"pending", "loading"}:
+            overall = "warming"
+        elif "failed" in states:
+            # Failed components keep retrying lazily on first use; requests degrade meanwhile.
+            overall = "degraded"
+        else:
+            overall = "ready"
+        return {
+            "status": overall,
+            "ready": overall == "ready",
+            "warmup_enabled": started,
+            "components": components,
+        }
+
+    def _run(self, name: str, warm: Callable[[], None]) -> None:
+        self._set(name, state="loading")
+        started = time.perf_counter()
+        try:
+            warm()
+        except Exception as exc:
+            LOGGER.exception("Warm-up of %s failed", name)
+            self._set(name, state="failed", error=str(exc))
+            return
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        LOGGER.info("Warm-up of %s finished in %.0f ms", name, duration_ms)
+        self._set(name, state="ready", duration_ms=duration_ms)
+
+    def _set(self, name: str, **state: object) -> None:
+        with self._lock:
+            self._components[name] = state
+
+
+WARMUP = ModelWarmup()
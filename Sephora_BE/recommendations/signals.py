@@ -0,0 +1,102 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from products.models import Product
+
+from .models import ProductFeatureSnapshot, RecommendationConfig
+from .services.business_rules import RULE_ENGINE
+from .services.config_cache import CONFIG_CACHE
+from .services.content_filter import CONTENT_FILTER, publish_content_index_version
+from .services.dnn import invalidate_product_features
+from .services.result_cache import RESULT_CACHE
+
+# Product columns compared before a save; updated_at changes on every write and stock only
+# matters when it crosses zero (candidates need stock > 0), so order stock decrements
+# leave the index and the result cache alone.
+_TRACKED_PRODUCT_FIELDS = [
+    (field.name, field.attname)
+    for field in Product._meta.concrete_fields
+    if not field.primary_key and field.name != "updated_at"
+]
+
+
+def _drop_product_caches():
+    RULE_ENGINE.invalidate_products()
+    invalidate_product_features()
+
+
+# Other processes' edits arrive as a new content index version: forget every product.
+CONTENT_FILTER.add_catalog_listener(_drop_product_caches)
+
+
+def _schedule_reindex(product_id, external_id=None):
+    """Re-index the product once the surrounding transaction has committed.
+
+    This process updates right away; the published version makes every other worker
+    (and this one's refresher) drop its product caches and rebuild the index.
+    """
+
+    def _reindex():
+        CONTENT_FILTER.update_product(product_id)
+        RULE_ENGINE.invalidate_products([product_id])
+        if external_id:
+            invalidate_product_features([external_id])
+        publish_content_index_version()
+        RESULT_CACHE.invalidate()
+
+    transaction.on_commit(_reindex)
+
+
+@receiver(post_save, sender=ProductFeatureSnapshot)
+def snapshot_saved(sender, instance, **kwargs):
+    _schedule_reindex(instance.product_id, instance.external_id)
+
+
+@receiver(post_delete, sender=ProductFeatureSnapshot)
+def snapshot_deleted(sender, instance, **kwargs):
+    _schedule_reindex(instance.product_id, instance.external_id)
+
+
+def _product_changed(previous: dict, instance: Product) -> bool:
+    for name, attname in _TRACKED_PRODUCT_FIELDS:
+        if name not in previous:
+            continue
+        current = getattr(instance, attname)
+        if name == "stock":
+            if ((previous[name] or 0) > 0) != ((current or 0) > 0):
+                return True
+        elif previous[name] != current:
+            return True
+    return False
+
+
+@receiver(pre_save, sender=Product)
+def product_saving(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
+        return
+    names = [name for name, _ in _TRACKED_PRODUCT_FIELDS if update_fields is None or name in update_fields]
+    previous = Product.objects.filter(pk=instance.pk).values(*names).first() if names else {}
+    instance._recommendation_fields_changed = previous is None or _product_changed(previous, instance)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    changed = instance.__dict__.pop("_recommendation_fields_changed", True)
+    if created or changed:
+        _schedule_reindex(instance.productid)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    _schedule_reindex(instance.productid)
+
+
+@receiver(post_save, sender=RecommendationConfig)
+def config_saved(sender, instance, created, **kwargs):
+    def _publish():
+        CONFIG_CACHE.publish(instance)
+        if not created:
+            RESULT_CACHE.invalidate()
+
+    transaction.on_commit(_publish)
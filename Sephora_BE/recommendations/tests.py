@@ -0,0 +1,553 @@
+import copy
+import json
+import itertools
+import math
+import random
+import tempfile
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import torch
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from products.models import Brand, Category, Product, ProductImage
+from users.models import User
+
+from . import views
+from .models import MlEntityMap, PrecomputedRecommendation, ProductFeatureSnapshot
+from .services.business_rules import (
+    BUDGET_THRESHOLDS_USD,
+    CLIMATE_KEYWORDS,
+    ROUTINE_RULES,
+    BusinessRuleEngine,
+)
+from .services.config_cache import CONFIG_CACHE
+from .services.content_filter import (
+    CONTENT_FILTER,
+    ContentBasedFilter,
+    _build_document,
+    _tokenize,
+    build_content_index,
+)
+from .services.dnn import SephoraDNN
+from .services.ncf import NeuMF
+from .services.precomputed import PRECOMPUTED_STORE
+from .services.product_metadata import ProductMetadataRow
+from .services.result_cache import RESULT_CACHE
+from .services.runtime import RUNTIME_OPTIMIZED, RUNTIME_OPTIMIZED_INT8, prepare_for_inference
+from .services.search_log import SEARCH_LOG_WRITER
+
+def create_unmanaged_tables():
+    """Create the legacy-schema tables (managed = False, or apps without migrations).
+
+    The test database does not get them, yet saving a User or deleting a Product touches
+    the tables of every related model (wishlists, reviews, cart items, ...).
+    """
+    existing = set(connection.introspection.table_names())
+    with connection.schema_editor() as editor:
+        for model in apps.get_models():
+            if model._meta.db_table not in existing and not model._meta.proxy:
+                editor.create_model(model)
+                existing.add(model._meta.db_table)
+
+
+class CatalogTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Before TestCase opens its class-wide transaction (SQLite cannot alter schema inside it).
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(brand_name="Glow Lab")
+        cls.category = Category.objects.create(category_name="Moisturizer")
+
+    @classmethod
+    def create_products(cls, count, start=0):
+        words = ["hydrating", "cream", "serum", "oil", "control", "gel", "barrier", "repair"]
+        for index in range(start, start + count):
+            product = Product.objects.create(
+                product_name=f"{words[index % len(words)]} {words[(index * 3 + 1) % len(words)]} {index}",
+                description="lightweight cream for oily and combination skin",
+                skin_types="oily combination",
+                stock=5,
+                brand=cls.brand,
+                category=cls.category,
+            )
+            ProductImage.objects.create(product=product, image_url=f"/media/products/{index}.jpg")
+            ProductFeatureSnapshot.objects.create(
+                product=product,
+                external_id=f"P{index:05d}",
+                brand_name=cls.brand.brand_name,
+                primary_category="Skincare",
+                secondary_category="Moisturizers",
+                highlights=["oil control"],
+                ingredients=["water", "glycerin"],
+                reviews=index * 10,
+            )
+
+
+class PersonalizedSearchQueryBudgetTests(CatalogTestCase):
+    """Candidate loading must not issue queries per product."""
+
+    QUERY_BUDGET = 6
+    PAYLOAD = {"search_query": "cream", "skin_profile": {"skin_type": "oily"}, "limit": 10}
+
+    def setUp(self):
+        patches = [
+            mock.patch.object(views.DNN_SERVICE, "score_candidates", side_effect=self._scores),
+            mock.patch.object(views.DNN_SERVICE, "known_value", return_value="<unk>"),
+            mock.patch.object(views, "DEADLINE_MS", 0),
+            mock.patch.object(CONTENT_FILTER, "start_background_refresh"),
+            mock.patch.object(CONFIG_CACHE, "_config", None),
+            mock.patch.object(CONFIG_CACHE, "ttl_seconds", 3600),
+            mock.patch.object(RESULT_CACHE, "max_entries", 0),
+            mock.patch.object(RESULT_CACHE._stamp, "ttl_seconds", 3600),
+            mock.patch.object(SEARCH_LOG_WRITER, "enabled", False),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _scores(user_record, product_records):
+        return [0.5 + (index % 7) / 20 for index in range(len(product_records))]
+
+    def _search(self):
+        request = APIRequestFactory().post("/api/recommendations/personalized-search/", self.PAYLOAD, format="json")
+        CONTENT_FILTER._index = build_content_index()
+        with CaptureQueriesContext(connection) as queries:
+            response = views.personalized_search(request)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries.captured_queries)
+
+    def test_query_count_does_not_grow_with_candidates(self):
+        self.addCleanup(setattr, CONTENT_FILTER, "_index", CONTENT_FILTER._index)
+        self.create_products(12)
+        self._search()  # loads the config row and the result cache version
+
+        response, small_catalog = self._search()
+        self.assertEqual(len(response.data["results"]), 10)
+
+        self.create_products(60, start=12)
+        response, large_catalog = self._search()
+        self.assertEqual(len(response.data["results"]), 10)
+
+        self.assertEqual(small_catalog, large_catalog)
+        self.assertLessEqual(large_catalog, self.QUERY_BUDGET)
+
+
+class PrecomputedRankingTests(CatalogTestCase):
+    """Nightly rankings must be found again by the online path for the same user."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_products(12)
+        allergen = ProductFeatureSnapshot.objects.get(external_id="P00003")
+        allergen.ingredients = ["water", "fragrance"]
+        allergen.save()
+        cls.user = User.objects.create(
+            email="linked@example.com",
+            passwordhash="-",
+            skintype="oily",
+            allergy_info="Fragrance",
+            firebase_uid="firebase-linked",
+        )
+        MlEntityMap.objects.create(entity_type="user", external_id="legacy-author-7", user=cls.user)
+
+    def setUp(self):
+        self.scored_authors = []
+        patches = [
+            mock.patch.object(views.DNN_SERVICE, "score_candidates", side_effect=self._scores),
+            mock.patch.object(views.DNN_SERVICE, "warm_up"),
+            mock.patch.object(views.NCF_SERVICE, "warm_up"),
+            mock.patch.object(views.NCF_SERVICE, "retrieve", return_value=[]),
+            mock.patch.object(views.NCF_SERVICE, "score_many", side_effect=lambda user, ids: [0.5] * len(ids)),
+            mock.patch.object(CONTENT_FILTER, "start_background_refresh"),
+            mock.patch.object(CONFIG_CACHE, "_config", None),
+            mock.patch.object(CONFIG_CACHE, "ttl_seconds", 3600),
+            mock.patch.object(RESULT_CACHE, "max_entries", 0),
+            mock.patch.object(SEARCH_LOG_WRITER, "enabled", False),
+            mock.patch.object(PRECOMPUTED_STORE, "enabled", True),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, CONTENT_FILTER, "_index", CONTENT_FILTER._index)
+
+    def _scores(self, user_record, product_records):
+        self.scored_authors.append(user_record["author_id"])
+        return [0.5 + (index % 7) / 20 for index in range(len(product_records))]
+
+    def test_precomputed_row_is_served_online(self):
+        call_command("precompute_recommendations", stdout=StringIO())
+        row = PrecomputedRecommendation.objects.get(user=self.user)
+        self.assertEqual(self.scored_authors, ["legacy-author-7"])
+        stored_ids = [entry["product_id"] for entry in row.entries]
+        allergen = ProductFeatureSnapshot.objects.get(external_id="P00003").product_id
+        self.assertNotIn(allergen, stored_ids)
+
+        payload = {"user_email": self.user.email, "skin_profile": {}, "limit": 5}
+        request = APIRequestFactory().post("/api/recommendations/personalized-search/", payload, format="json")
+        with mock.patch.object(views, "_rank_candidates", side_effect=AssertionError("scored online")):
+            response = views.personalized_search(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["product"]["productid"] for item in response.data["results"]], stored_ids[:5])
+
+
+def baseline_content_ranking(tokens, allergy="", limit=250):
+    """The dict-based TF-IDF cosine ranking the inverted index replaced."""
+    documents = []
+    for snapshot in ProductFeatureSnapshot.objects.select_related("product").all():
+        counts = {}
+        for token in _tokenize(_build_document(snapshot.product, snapshot)):
+            counts[token] = counts.get(token, 0) + 1
+        if counts:
+            documents.append((snapshot, counts))
+    doc_freq = {}
+    for _, counts in documents:
+        for token in counts:
+            doc_freq[token] = doc_freq.get(token, 0) + 1
+    idf = {token: math.log((len(documents) + 1) / (freq + 1)) + 1.0 for token, freq in doc_freq.items()}
+
+    query_counts = {}
+    for token in tokens:
+        query_counts[token] = query_counts.get(token, 0) + 1
+    total = sum(query_counts.values()) or 1
+    query = {token: (count / total) * idf.get(token, 1.0) for token, count in query_counts.items()}
+    query_norm = math.sqrt(sum(value * value for value in query.values())) or 1.0
+
+    similarities = []
+    for snapshot, counts in documents:
+        length = sum(counts.values()) or 1
+        vector = {token: (count / length) * idf.get(token, 1.0) for token, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        dot = 0.0
+        for token, value in query.items():
+            dot += value * vector.get(token, 0.0)
+        if dot:
+            similarities.append((dot / (norm * query_norm), snapshot))
+    similarities.sort(key=lambda item: item[0], reverse=True)
+
+    ranked = []
+    for _, snapshot in similarities:
+        if allergy and any(allergy in (item or "").lower() for item in snapshot.ingredients or []):
+            continue
+        ranked.append(snapshot.product_id)
+        if limit and len(ranked) >= limit:
+            break
+    return ranked
+
+
+class ContentIndexTests(CatalogTestCase):
+    """The inverted index must rank exactly like the cosine scan it replaced."""
+
+    QUERIES = [
+        ("hydrating cream", "", 250),
+        ("serum oil", "", 5),
+        ("barrier repair gel", "glycerin", 250),
+        ("control", "fragrance", 3),
+        ("oily combination", "", 10),
+        ("nothing matches this", "", 10),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_products(30)
+        for index, snapshot in enumerate(ProductFeatureSnapshot.objects.order_by("pk")):
+            if index % 4 == 0:
+                snapshot.ingredients = ["water", "fragrance"]
+                snapshot.highlights = ["hydrating", "repair"] * (index % 3 + 1)
+                snapshot.save()
+
+    def setUp(self):
+        # Updates are applied explicitly; a drift-triggered rebuild would race the test database.
+        for name in ("_ensure_updater", "request_rebuild"):
+            patcher = mock.patch.object(ContentBasedFilter, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def assertRanksLikeBaseline(self, index):
+        for query, allergy, limit in self.QUERIES:
+            with self.subTest(query=query, allergy=allergy, limit=limit):
+                tokens = _tokenize(query)
+                self.assertEqual(
+                    index.rank(tokens, allergy=allergy, limit=limit),
+                    baseline_content_ranking(tokens, allergy, limit),
+                )
+
+    def _edit_catalog(self, content_filter):
+        edited = ProductFeatureSnapshot.objects.order_by("pk")[1]
+        edited.highlights = ["barrier", "serum", "serum"]
+        edited.save()
+        removed = ProductFeatureSnapshot.objects.order_by("pk")[2]
+        removed.delete()
+        self.create_products(3, start=30)
+        added = ProductFeatureSnapshot.objects.order_by("-pk")[:3]
+        for product_id in [edited.product_id, removed.product_id, *(snapshot.product_id for snapshot in added)]:
+            content_filter.update_product(product_id)
+
+    def test_full_build_matches_baseline(self):
+        self.assertRanksLikeBaseline(build_content_index())
+
+    def test_incremental_update_then_rebuild_matches_scratch_build(self):
+        content_filter = ContentBasedFilter()
+        content_filter.refresh()
+        self._edit_catalog(content_filter)
+        self.assertEqual(content_filter.apply_queued_updates(), 5)
+
+        # Incremental weights use shifted IDFs, but every matching document is found.
+        scratch = build_content_index()
+        for query, allergy, _ in self.QUERIES:
+            tokens = _tokenize(query)
+            self.assertEqual(
+                sorted(content_filter.index.rank(tokens, allergy=allergy, limit=0)),
+                sorted(scratch.rank(tokens, allergy=allergy, limit=0)),
+            )
+
+        content_filter.refresh()
+        self.assertRanksLikeBaseline(content_filter.index)
+
+    def test_updates_during_a_rebuild_are_applied_on_top(self):
+        content_filter = ContentBasedFilter()
+        content_filter.refresh()
+
+        def build_then_edit():
+            index = build_content_index()
+            self._edit_catalog(content_filter)
+            return index
+
+        with mock.patch("recommendations.services.content_filter.build_content_index", side_effect=build_then_edit):
+            content_filter.refresh()
+        for query, allergy, _ in self.QUERIES:
+            tokens = _tokenize(query)
+            self.assertEqual(
+                sorted(content_filter.index.rank(tokens, allergy=allergy, limit=0)),
+                sorted(build_content_index().rank(tokens, allergy=allergy, limit=0)),
+            )
+
+
+class BenchmarkCommandTests(CatalogTestCase):
+    """The benchmark harness must keep running the full pipeline end to end."""
+
+    def setUp(self):
+        patches = [
+            mock.patch.object(CONTENT_FILTER, "start_background_refresh"),
+            mock.patch.object(CONFIG_CACHE, "_config", None),
+            mock.patch.object(SEARCH_LOG_WRITER, "enabled", False),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, CONTENT_FILTER, "_index", CONTENT_FILTER._index)
+
+    def test_tiny_catalog_runs_every_stage(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "bench.json"
+            call_command(
+                "benchmark_personalized_search",
+                sizes="40",
+                requests=8,
+                warmup=2,
+                output=str(output),
+                stdout=StringIO(),
+            )
+            [result] = json.loads(output.read_text(encoding="utf-8"))
+        self.assertEqual(result["catalog_size"], 40)
+        self.assertEqual(result["degradation"], {"full": 8})
+        self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+        for name in ("content_filter", "feature_encoding", "dnn_forward", "ncf", "business_rules"):
+            self.assertIn(name, result["stages_ms"])
+        self.assertFalse(Product.objects.filter(brand__brand_name__startswith="bench-").exists())
+
+
+def baseline_business_rules(entries, skin_profile):
+    """The per-product if/elif implementation the vectorized rule engine replaced."""
+
+    def keyword(text, keywords):
+        return any(item in text for item in keywords)
+
+    budget_level = (skin_profile.get("budget_level") or "").lower()
+    climate = (skin_profile.get("climate") or "").lower()
+    routine_focus = (skin_profile.get("routine_focus") or "").lower()
+    for entry in entries:
+        metadata, product, score = entry["metadata"], entry["product"], entry["final_score"]
+        if metadata.out_of_stock:
+            entry["final_score"] = -1.0
+            continue
+        if getattr(product, "is_new", False) or metadata.new:
+            score *= 1.05
+        if metadata.rating and metadata.rating >= 4.5:
+            score *= 1.03
+        if metadata.reviews and metadata.reviews >= 1000:
+            score *= 1.02
+        bounds = BUDGET_THRESHOLDS_USD.get(budget_level)
+        price = float(metadata.price_usd or 0.0)
+        if bounds and price > 0:
+            if bounds["max"] is not None and price > bounds["max"] * 1.15:
+                score *= 0.9
+            elif bounds["max"] is not None and price <= bounds["max"]:
+                score *= 1.03
+            elif bounds["min"] is not None and price < bounds["min"] * 0.7:
+                score *= 0.95
+            elif bounds["min"] is not None and price >= bounds["min"]:
+                score *= 1.01
+        rules = CLIMATE_KEYWORDS.get(climate)
+        if rules:
+            parts = [*metadata.highlights, *metadata.ingredients]
+            if getattr(product, "description", None):
+                parts.append(product.description)
+            text = " ".join(parts).lower()
+            if rules["positive"] and keyword(text, rules["positive"]):
+                score *= 1.03
+            if rules["negative"] and keyword(text, rules["negative"]):
+                score *= 0.95
+        rules = ROUTINE_RULES.get(routine_focus)
+        if rules:
+            categories = [metadata.primary_category, metadata.secondary_category, metadata.tertiary_category]
+            text = " ".join(filter(None, [(item or "").lower() for item in categories]))
+            if rules["boost"] and keyword(text, rules["boost"]):
+                score *= 1.03
+            if rules["penalize"] and keyword(text, rules["penalize"]):
+                score *= 0.95
+        entry["final_score"] = score
+        entry["brand_key"] = (metadata.brand_name or "").lower()
+
+    brand_seen = {}
+    for entry in sorted(entries, key=lambda item: item["final_score"], reverse=True):
+        brand = entry.get("brand_key") or ""
+        if not brand:
+            continue
+        brand_seen[brand] = brand_seen.get(brand, 0) + 1
+        if brand_seen[brand] > 2:
+            entry["final_score"] *= 0.95
+    return [entry["final_score"] for entry in entries]
+
+
+class BusinessRuleParityTests(SimpleTestCase):
+    """The vectorized rule engine must score exactly like the per-product rules."""
+
+    PRICES = [0.0, 5.0, 12.5, 18.0, 22.0, 25.0, 25.3, 30.0, 40.0, 43.0, 49.45, 60.0, 120.0]
+    WORDS = ["Oil-free gel", "Rich butter", "Hyaluronic", "Ceramide barrier", "Matte foam", "Soothing", "Water"]
+    CATEGORIES = [
+        ("Skincare", "Cleansers", "Face Wash & Cleansers"),
+        ("Skincare", "Treatments", "Face Serums"),
+        ("Skincare", "Moisturizers", "Night Creams"),
+        ("Skincare", "Masks", "Sheet Masks"),
+        ("Makeup", "Face", "Foundation"),
+    ]
+
+    def _fixture(self, rng, size=60):
+        entries = []
+        for index in range(size):
+            primary, secondary, tertiary = rng.choice(self.CATEGORIES)
+            metadata = ProductMetadataRow(
+                product_id=f"P{index}",
+                product_name=f"Product {index}",
+                brand_id=str(index % 7),
+                brand_name=rng.choice(["Glow Lab", "glow lab", "Dew", "Mist", ""]),
+                loves_count=0,
+                rating=rng.choice([0.0, 3.9, 4.5, 4.8]),
+                reviews=rng.choice([0, 999, 1000, 5000]),
+                price_usd=rng.choice(self.PRICES),
+                value_price_usd=0.0,
+                sale_price_usd=0.0,
+                limited_edition=0,
+                new=int(rng.random() < 0.2),
+                online_only=0,
+                out_of_stock=int(rng.random() < 0.1),
+                sephora_exclusive=0,
+                highlights=rng.sample(self.WORDS, 2),
+                ingredients=rng.sample(self.WORDS, 2),
+                primary_category=primary,
+                secondary_category=secondary,
+                tertiary_category=tertiary,
+                child_count=0,
+                child_min_price=0.0,
+                child_max_price=0.0,
+            )
+            product = SimpleNamespace(
+                productid=index,
+                is_new=rng.random() < 0.1,
+                description=rng.choice(["", "lightweight matte gel", "heavy cream"]),
+            )
+            # Coarse scores so ties (and their order) are exercised too.
+            entries.append({"metadata": metadata, "product": product, "final_score": rng.choice([0.2, 0.5, 0.5, 0.8])})
+        return entries
+
+    def test_matches_per_product_rules(self):
+        rng = random.Random(0)
+        profiles = itertools.product(
+            ["", "under_500k", "500k_1m", "over_1m", "unknown"],
+            ["", *CLIMATE_KEYWORDS, "unknown"],
+            ["", *ROUTINE_RULES, "unknown"],
+        )
+        for budget_level, climate, routine_focus in profiles:
+            profile = {"budget_level": budget_level, "climate": climate, "routine_focus": routine_focus}
+            with self.subTest(**profile):
+                entries = self._fixture(rng)
+                engine = BusinessRuleEngine()
+                features = [
+                    engine.product_features(entry["product"].productid, entry["metadata"], entry["product"])
+                    for entry in entries
+                ]
+                scores = engine.apply([entry["final_score"] for entry in entries], features, profile)
+                self.assertEqual(scores.tolist(), baseline_business_rules(entries, profile))
+
+
+class InferenceRuntimeParityTests(SimpleTestCase):
+    """The optimized runtimes must rank like the eager models they replace."""
+
+    TOP_K = 10
+    # (max |score delta| after sigmoid, min overlap of the eager top-k)
+    TOLERANCES = {
+        RUNTIME_OPTIMIZED: (1e-5, TOP_K),
+        RUNTIME_OPTIMIZED_INT8: (0.01, TOP_K - 2),
+    }
+
+    def setUp(self):
+        torch.manual_seed(0)
+
+    def _assert_parity(self, model, inputs):
+        model.eval()
+        with torch.no_grad():
+            reference = torch.sigmoid(model(*inputs))
+        reference_top = reference.topk(self.TOP_K).indices.tolist()
+        for runtime, (tolerance, min_overlap) in self.TOLERANCES.items():
+            with self.subTest(runtime=runtime):
+                example = tuple(tensor[:2] for tensor in inputs)
+                optimized = prepare_for_inference(copy.deepcopy(model), example, runtime)
+                with torch.inference_mode():
+                    scores = torch.sigmoid(optimized(*inputs))
+                self.assertEqual(scores.shape, reference.shape)
+                self.assertLessEqual((scores - reference).abs().max().item(), tolerance)
+                top = scores.topk(self.TOP_K).indices.tolist()
+                if min_overlap == self.TOP_K:
+                    self.assertEqual(top, reference_top)
+                else:
+                    self.assertGreaterEqual(len(set(top) & set(reference_top)), min_overlap)
+
+    def test_dnn(self):
+        features = ["author_id", "skin_type", "product_id", "brand_name"]
+        model = SephoraDNN(features, {feature: (50, 8) for feature in features}, numeric_dim=6, highlight_dim=12)
+        inputs = (
+            torch.randint(0, 50, (200, len(features))),
+            torch.randn(200, 6),
+            (torch.rand(200, 12) > 0.8).float(),
+        )
+        self._assert_parity(model, inputs)
+
+    def test_ncf(self):
+        model = NeuMF(num_users=100, num_items=300, embedding_dim=16, hidden_dims=[32, 16], dropout=0.2)
+        inputs = (torch.full((300,), 7, dtype=torch.long), torch.arange(300))
+        self._assert_parity(model, inputs)
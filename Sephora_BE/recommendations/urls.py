@@ -7,5 +7,7 @@ urlpatterns = [
     path("personalized-feedback/", views.submit_personalized_feedback, name="personalized-feedback"),
     path("feedback-summary/", views.personalized_feedback_summary, name="personalized-feedback-summary"),
     path("config/", views.recommendation_config_view, name="recommendation-config"),
+    path("health/", views.recommendation_health, name="recommendation-health"),
+    path("runtime-stats/", views.recommendation_runtime_stats, name="recommendation-runtime-stats"),
 ]
 
@@ -3,9 +3,13 @@ from __future__ import annotations
 import logging
 import math
 import numpy as np
+import time
 import unicodedata
 import uuid
-from collections import Counter, defaultdict
+from collections import Counter
+from functools import partial
+from itertools import zip_longest
+from pathlib import Path
 from typing import List, Set, Tuple
 
 from django.conf import settings
@@ -19,6 +23,7 @@ from products.serializers import ProductSerializer
 from users.models import User, get_user_role
 
 from .models import (
+    MlEntityMap,
     PersonalizedFeedback,
     PersonalizedSearchLog,
     ProductFeatureSnapshot,
@@ -31,16 +36,122 @@ from .services import (
     ProductMetadataRepository,
     RecommendationReasonBuilder,
 )
+from .services.artifact_registry import ArtifactRegistry, ModelHotSwapper, check_canary_scores
+from .services.business_rules import RULE_ENGINE
+from .services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from .services.config_cache import CONFIG_CACHE
 from .services.content_filter import CONTENT_FILTER
+from .services.degradation import (
+    DEGRADATION_STATS,
+    DNN_COST,
+    LEVEL_FULL,
+    LEVEL_NO_NCF,
+    LEVEL_POPULARITY,
+    LEVEL_REDUCED_CANDIDATES,
+    LEVELS,
+    MIN_SCORED_ROWS,
+    NCF_COST,
+    RequestBudget,
+)
+from .services.inference_client import InferenceClient, InferenceServerError, RemoteDNNService, RemoteNCFService
+from .services.popularity import POPULARITY
+from .services.precomputed import PRECOMPUTED_STORE, profile_fingerprint
+from .services.product_metadata import ProductMetadataRow
+from .services.result_cache import RESULT_CACHE
+from .services.search_log import SEARCH_LOG_WRITER
+from .services.timing import PIPELINE_METRICS, record_count, stage, track_request
+from .services.warmup import WARMUP
 from .utils.language import normalize_skin_profile_language
 
 
 METADATA_REPO = ProductMetadataRepository(
     settings.ML_ARTIFACTS.get("PRODUCT_CSV", settings.BASE_DIR / "data" / "product_info.csv")
 )
-DNN_SERVICE = DNNRecommendationService(settings.ML_ARTIFACTS["DNN_DIR"])
-NCF_SERVICE = NCFRecommendationService(settings.ML_ARTIFACTS["NCF_DIR"])
+INFERENCE_RUNTIME = settings.ML_ARTIFACTS.get("INFERENCE_RUNTIME", "eager")
+MMAP_ARTIFACTS = settings.ML_ARTIFACTS.get("MMAP_ARTIFACTS", False)
+SERVER_TIMING_HEADER = settings.ML_ARTIFACTS.get("SERVER_TIMING_HEADER", False)
+DEADLINE_MS = settings.ML_ARTIFACTS.get("RECOMMENDATION_DEADLINE_MS", 0)
+DEADLINE_RESERVE_MS = settings.ML_ARTIFACTS.get("RECOMMENDATION_DEADLINE_RESERVE_MS", 0)
+
+
+def _circuit_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_threshold=settings.ML_ARTIFACTS.get("MODEL_BREAKER_FAILURES", 2),
+        reset_seconds=settings.ML_ARTIFACTS.get("MODEL_BREAKER_RESET_SECONDS", 30),
+    )
+
+
+MODEL_REGISTRY_DIR = settings.ML_ARTIFACTS.get("MODEL_REGISTRY_DIR", "")
+MODEL_REGISTRY = ArtifactRegistry(MODEL_REGISTRY_DIR) if MODEL_REGISTRY_DIR else None
+MODEL_SWAPPER: ModelHotSwapper | None = None
+
+
+def active_artifacts_dir(model: str) -> Path:
+    """The registry's active version of ``model``, else the fixed ``<MODEL>_DIR`` setting."""
+    if MODEL_REGISTRY is not None:
+        active = MODEL_REGISTRY.active_dir(model)
+        if active is not None:
+            return active
+    return Path(settings.ML_ARTIFACTS[f"{model.upper()}_DIR"])
+
+
+INFERENCE_SERVER_SOCKET = settings.ML_ARTIFACTS.get("INFERENCE_SERVER_SOCKET", "")
+if INFERENCE_SERVER_SOCKET:
+    INFERENCE_CLIENT = InferenceClient(
+        INFERENCE_SERVER_SOCKET,
+        timeout=settings.ML_ARTIFACTS.get("INFERENCE_SERVER_TIMEOUT_SECONDS", 2.0),
+        breaker=_circuit_breaker("inference-server"),
+    )
+else:
+    INFERENCE_CLIENT = None
+
+
+def _build_dnn_service(directory: Path) -> DNNRecommendationService:
+    if INFERENCE_CLIENT is not None:
+        return RemoteDNNService(
+            INFERENCE_CLIENT,
+            directory,
+            mmap_artifacts=MMAP_ARTIFACTS,
+            load_breaker=_circuit_breaker("dnn-load"),
+        )
+    return DNNRecommendationService(
+        directory,
+        runtime=INFERENCE_RUNTIME,
+        mmap_artifacts=MMAP_ARTIFACTS,
+        batch_window_ms=settings.ML_ARTIFACTS.get("DNN_BATCH_WINDOW_MS", 0),
+        max_batch_rows=settings.ML_ARTIFACTS.get("DNN_BATCH_MAX_ROWS", 1024),
+        load_breaker=_circuit_breaker("dnn-load"),
+        product_records=_catalog_product_records,
+    )
+
+
+def _catalog_product_records():
+    """Feature records of every product with a snapshot, for rebuilding the product tower table."""
+    snapshots = ProductFeatureSnapshot.objects.select_related("product").order_by("pk")
+    for snapshot in snapshots.iterator(chunk_size=512):
+        yield _build_product_record(snapshot.to_metadata_row(product=snapshot.product))
+
+
+def _build_ncf_service(directory: Path) -> NCFRecommendationService:
+    if INFERENCE_CLIENT is not None:
+        return RemoteNCFService(INFERENCE_CLIENT, directory)
+    return NCFRecommendationService(
+        directory,
+        runtime=INFERENCE_RUNTIME,
+        mmap_artifacts=MMAP_ARTIFACTS,
+        retrieval_n_probe=settings.ML_ARTIFACTS.get("NCF_RETRIEVAL_N_PROBE", 8),
+        load_breaker=_circuit_breaker("ncf-load"),
+    )
+
+
+DNN_SERVICE = _build_dnn_service(active_artifacts_dir("dnn"))
+NCF_SERVICE = _build_ncf_service(active_artifacts_dir("ncf"))
+if MODEL_REGISTRY is not None:
+    RESULT_CACHE.watch([DNN_SERVICE.artifacts_dir, NCF_SERVICE.artifacts_dir])
+NCF_RETRIEVAL_K = settings.ML_ARTIFACTS.get("NCF_RETRIEVAL_K", 0)
 REASON_BUILDER = RecommendationReasonBuilder()
+MAX_SCORED_CANDIDATES = 200
 LOGGER = logging.getLogger(__name__)
 
 SEARCH_KEYWORD_MAP = {
@@ -106,38 +217,6 @@ SEARCH_KEYWORD_MAP = {
     },
 }
 
-BUDGET_THRESHOLDS_USD = {
-    "under_500k": {"min": 0.0, "max": 22.0},
-    "500k_1m": {"min": 18.0, "max": 43.0},
-    "over_1m": {"min": 40.0, "max": None},
-}
-
-CLIMATE_KEYWORDS = {
-    "hot_humid": {
-        "positive": ["oil-free", "non-greasy", "gel", "foam", "matte", "lightweight"],
-        "negative": ["rich", "butter", "heavy"],
-    },
-    "air_con": {
-        "positive": ["hydrating", "moisture", "hyaluronic", "soothing", "calming"],
-        "negative": [],
-    },
-    "cool_dry": {
-        "positive": ["rich", "ceramide", "cream", "shea", "butter", "barrier"],
-        "negative": ["oil-free", "matte"],
-    },
-}
-
-ROUTINE_RULES = {
-    "minimal": {
-        "boost": ["cleanser", "cleaners", "moisturizer", "sunscreen"],
-        "penalize": ["serum", "treatment", "mask", "peel", "essence"],
-    },
-    "advanced": {
-        "boost": ["serum", "treatment", "essence", "ampoule", "booster"],
-        "penalize": [],
-    },
-}
-
 
 def _strip_accents(text: str) -> str:
     normalized = unicodedata.normalize("NFD", text or "")
@@ -195,13 +274,97 @@ def _derive_skin_profile(profile_data: dict, user: User | None) -> dict:
     return normalize_skin_profile_language(profile)
 
 
+def _resolve_skin_profile(profile_data: dict, user: User | None, legacy_author_id: str | None = None) -> dict:
+    """The profile both online and precomputed rankings are scored (and fingerprinted) with.
+
+    Request fields win over the user's saved ones; a signed-in user without a
+    ``legacy_author_id`` gets the one linked in MlEntityMap. Pass ``legacy_author_id``
+    ("" for none) when it was already looked up, to skip the query.
+    """
+    skin_profile = _derive_skin_profile(profile_data, user)
+    if not skin_profile.get("legacy_author_id") and user is not None:
+        if legacy_author_id is None:
+            legacy_author_id = (
+                MlEntityMap.objects.filter(entity_type="user", user=user)
+                # Oldest link wins when a user has several.
+                .order_by("pk")
+                .values_list("external_id", flat=True)
+                .first()
+            )
+        if legacy_author_id:
+            skin_profile["legacy_author_id"] = legacy_author_id
+    return skin_profile
+
+
+def _ranking_fingerprint(skin_profile: dict, author_id: str) -> str:
+    """Profile fingerprint of a no-query ranking; the allergy is the resolved profile's."""
+    return profile_fingerprint(skin_profile, skin_profile.get("allergy_info"), author_id)
+
+
+def _embedding_candidates(legacy_author_id: str, k: int, budget: RequestBudget | None = None) -> List[int]:
+    """Catalog product ids of the user's nearest NCF item embeddings, best first.
+
+    With a ``budget`` nothing is retrieved once it is spent or while NCF is not loaded
+    (the load and the IVF build then start in the background), and failures degrade.
+    """
+    if budget is not None:
+        if not NCF_SERVICE.is_loaded:
+            NCF_SERVICE.start_background_load()
+            return []
+        if budget.remaining_ms() <= 0:
+            return []
+    try:
+        external_ids = NCF_SERVICE.retrieve(legacy_author_id, k)
+    except Exception as exc:
+        if budget is None:
+            raise
+        # An open breaker already logged the original failure.
+        LOGGER.warning(
+            "NCF retrieval unavailable, using content candidates only: %s",
+            exc,
+            exc_info=not isinstance(exc, CircuitOpenError),
+        )
+        budget.degrade(LEVEL_NO_NCF)
+        return []
+    if not external_ids:
+        return []
+    product_ids = dict(
+        ProductFeatureSnapshot.objects.filter(external_id__in=external_ids).values_list("external_id", "product_id")
+    )
+    return [product_ids[external_id] for external_id in external_ids if external_id in product_ids]
+
+
+def _merge_candidate_ids(
+    content_ids: List[int],
+    embedding_ids: List[int],
+    interleave: bool,
+    limit: int,
+) -> List[int]:
+    """Content ids first when the user searched; otherwise alternate both sources."""
+    if interleave:
+        ordered = [
+            product_id
+            for pair in zip_longest(content_ids, embedding_ids)
+            for product_id in pair
+            if product_id is not None
+        ]
+    else:
+        ordered = [*content_ids, *embedding_ids]
+    return list(dict.fromkeys(ordered))[:limit]
+
+
+def _product_queryset():
+    return Product.objects.select_related(
+        "brand", "category", "ml_feature_snapshot"
+    ).prefetch_related("images", "category__children")
+
+
 def _candidate_queryset(
     search_query: str | None,
     preferred_ids: List[int] | None = None,
     limit: int = 250,
 ) -> Tuple[List[Product], Set[str]]:
-    base_qs = Product.objects.select_related("brand", "category").prefetch_related("images")
-    qs = base_qs.filter(stock__gt=0)
+    qs = _product_queryset().filter(stock__gt=0)
     category_terms: Set[str] = set()
     if search_query:
         terms, category_terms = _expand_search_terms(search_query)
@@ -236,29 +399,88 @@ def _candidate_queryset(
                 )
             if term_query:
                 filtered = filtered_qs.filter(term_query)
-        if (not filtered or not filtered.exists()) and category_terms:
+        has_matches = filtered is not None and filtered.exists()
+        if not has_matches and category_terms:
             cat_q = Q()
             for category_term in category_terms:
                 cat_q |= Q(category__category_name__icontains=category_term)
             if cat_q:
                 filtered = (filtered_qs if filtered is None else filtered).filter(cat_q)
-        fallback_qs = filtered if filtered and filtered.exists() else filtered_qs
+                has_matches = filtered.exists()
+        fallback_qs = filtered if has_matches else filtered_qs
         fallback_list = list(fallback_qs.order_by("-is_new", "-review_count", "-created_at")[:remaining])
         collected.extend(fallback_list)
 
     return collected[:limit], category_terms
 
 
-def _metadata_for_product(product: Product):
-    snapshot = getattr(product, "ml_feature_snapshot", None)
-    if snapshot:
-        return snapshot.to_metadata_row()
-    snapshot = (
-        ProductFeatureSnapshot.objects.filter(product=product).only("external_id").first()
+def _metadata_rows(products: List[Product]) -> List[ProductMetadataRow | None]:
+    """Materialize metadata rows for already-loaded products without extra queries.
+
+    Products must come from ``_candidate_queryset`` so ``ml_feature_snapshot`` is
+    joined in; products without a snapshot fall back to the in-memory CSV catalog.
+    """
+    rows: List[ProductMetadataRow | None] = []
+    for product in products:
+        snapshot = getattr(product, "ml_feature_snapshot", None)
+        if snapshot:
+            rows.append(snapshot.to_metadata_row(product=product))
+        else:
+            rows.append(METADATA_REPO.match_product(product))
+    return rows
+
+
+CANARY_ROWS = 32
+
+
+def _canary_inputs() -> Tuple[str | None, List[dict]]:
+    """A legacy user id and a few catalog products to score a freshly loaded model with."""
+    snapshots = ProductFeatureSnapshot.objects.select_related("product").order_by("pk")[:CANARY_ROWS]
+    records = [_build_product_record(snapshot.to_metadata_row(product=snapshot.product)) for snapshot in snapshots]
+    user_id = (
+        MlEntityMap.objects.filter(entity_type="user").order_by("pk").values_list("external_id", flat=True).first()
+    )
+    return user_id, records
+
+
+def dnn_canary(service: DNNRecommendationService) -> None:
+    _, records = _canary_inputs()
+    records = records or [{}] * 8
+    check_canary_scores(service.score_candidates({}, records), len(records))
+
+
+def ncf_canary(service: NCFRecommendationService) -> None:
+    user_id, records = _canary_inputs()
+    product_ids = [record.get("product_id") for record in records]
+    check_canary_scores(service.score_many(user_id, product_ids), len(product_ids))
+
+
+def _install_dnn(service: DNNRecommendationService, directory: Path) -> None:
+    global DNN_SERVICE
+    RESULT_CACHE.watch([directory, NCF_SERVICE.artifacts_dir])
+    previous, DNN_SERVICE = DNN_SERVICE, service
+    previous.close()
+
+
+def _install_ncf(service: NCFRecommendationService, directory: Path) -> None:
+    global NCF_SERVICE
+    RESULT_CACHE.watch([DNN_SERVICE.artifacts_dir, directory])
+    NCF_SERVICE = service
+
+
+def start_model_registry() -> ModelHotSwapper | None:
+    """Swap in new DNN/NCF versions of the registry as they are activated."""
+    global MODEL_SWAPPER
+    if MODEL_REGISTRY is None or MODEL_SWAPPER is not None:
+        return MODEL_SWAPPER
+    swapper = ModelHotSwapper(
+        MODEL_REGISTRY, poll_seconds=settings.ML_ARTIFACTS.get("MODEL_REGISTRY_POLL_SECONDS", 10)
     )
-    if snapshot:
-        return snapshot.to_metadata_row()
-    return METADATA_REPO.match_product(product)
+    swapper.register("dnn", MODEL_REGISTRY.active_version("dnn"), _build_dnn_service, dnn_canary, _install_dnn)
+    swapper.register("ncf", MODEL_REGISTRY.active_version("ncf"), _build_ncf_service, ncf_canary, _install_ncf)
+    swapper.start_background_refresh()
+    MODEL_SWAPPER = swapper
+    return swapper
 
 
 def _category_allows(metadata_row, product: Product, category_filters: Set[str]) -> bool:
@@ -308,120 +530,15 @@ def _quantile_label(score: float, thresholds: dict) -> str:
     return "Khám phá thêm"
 
 
-def _product_text(metadata_row, product: Product) -> str:
-    parts = []
-    if metadata_row.highlights:
-        parts.extend(metadata_row.highlights)
-    if metadata_row.ingredients:
-        parts.extend(metadata_row.ingredients)
-    if getattr(product, "description", None):
-        parts.append(product.description)
-    return " ".join(parts).lower()
-
-
-def _apply_budget_rule(score: float, metadata_row, budget_level: str) -> float:
-    bounds = BUDGET_THRESHOLDS_USD.get(budget_level)
-    if not bounds:
-        return score
-    price = float(metadata_row.price_usd or 0.0)
-    min_price = bounds.get("min")
-    max_price = bounds.get("max")
-    if price <= 0:
-        return score
-    if max_price is not None and price > max_price * 1.15:
-        return score * 0.9
-    if max_price is not None and price <= max_price:
-        return score * 1.03
-    if min_price is not None and price < min_price * 0.7:
-        return score * 0.95
-    if min_price is not None and price >= min_price:
-        return score * 1.01
-    return score
-
-
-def _match_keyword(text: str, keywords: List[str]) -> bool:
-    return any(keyword in text for keyword in keywords)
-
-
-def _apply_climate_rule(score: float, metadata_row, product: Product, climate: str) -> float:
-    rules = CLIMATE_KEYWORDS.get(climate)
-    if not rules:
-        return score
-    text = _product_text(metadata_row, product)
-    if rules["positive"] and _match_keyword(text, rules["positive"]):
-        score *= 1.03
-    if rules["negative"] and _match_keyword(text, rules["negative"]):
-        score *= 0.95
-    return score
-
-
-def _apply_routine_rule(score: float, metadata_row, routine_focus: str) -> float:
-    rules = ROUTINE_RULES.get(routine_focus)
-    if not rules:
-        return score
-    category_text = " ".join(
-        filter(
-            None,
-            [
-                (metadata_row.primary_category or "").lower(),
-                (metadata_row.secondary_category or "").lower(),
-                (metadata_row.tertiary_category or "").lower(),
-            ],
-        )
-    )
-    if rules["boost"] and _match_keyword(category_text, rules["boost"]):
-        score *= 1.03
-    if rules["penalize"] and _match_keyword(category_text, rules["penalize"]):
-        score *= 0.95
-    return score
-
-
 def _apply_business_rules(entries: List[dict], skin_profile: dict) -> None:
     """Boost/Penalize scores based on simple business heuristics."""
-    brand_key_counts: defaultdict[str, int] = defaultdict(int)
-    budget_level = (skin_profile.get("budget_level") or "").lower()
-    climate = (skin_profile.get("climate") or "").lower()
-    routine_focus = (skin_profile.get("routine_focus") or "").lower()
-
-    for entry in entries:
-        metadata = entry["metadata"]
-        product = entry["product"]
-        score = entry["final_score"]
-
-        if metadata.out_of_stock:
-            entry["final_score"] = -1.0
-            continue
-
-        if getattr(product, "is_new", False) or metadata.new:
-            score *= 1.05
-        if metadata.rating and metadata.rating >= 4.5:
-            score *= 1.03
-        if metadata.reviews and metadata.reviews >= 1000:
-            score *= 1.02
-
-        if budget_level:
-            score = _apply_budget_rule(score, metadata, budget_level)
-        if climate:
-            score = _apply_climate_rule(score, metadata, product, climate)
-        if routine_focus:
-            score = _apply_routine_rule(score, metadata, routine_focus)
-
+    features = [
+        RULE_ENGINE.product_features(entry["product"].productid, entry["metadata"], entry["product"])
+        for entry in entries
+    ]
+    scores = RULE_ENGINE.apply([entry["final_score"] for entry in entries], features, skin_profile)
+    for entry, score in zip(entries, scores.tolist()):
         entry["final_score"] = score
-        brand = (metadata.brand_name or "").lower()
-        brand_key_counts[brand] += 0
-        entry["brand_key"] = brand
-
-    brand_seen: defaultdict[str, int] = defaultdict(int)
-    for entry in sorted(entries, key=lambda item: item["final_score"], reverse=True):
-        brand = entry.get("brand_key") or ""
-        if not brand:
-            continue
-        brand_seen[brand] += 1
-        if brand_seen[brand] > 2:
-            entry["final_score"] *= 0.95
-
-    for entry in entries:
-        entry.pop("brand_key", None)
 
 
 def _get_request_email(request) -> str | None:
@@ -445,7 +562,7 @@ def _blend_scores(dnn_score: float, ncf_score: float | None, config: Recommendat
     return ((dnn_weight * dnn_score) + (ncf_weight * ncf_score)) / total_weight
 
 
-def _build_record(metadata_row, skin_profile: dict, author_id: str) -> dict:
+def _build_product_record(metadata_row) -> dict:
     record = metadata_row.to_feature_dict()
     category_avg_price = METADATA_REPO.category_avg_price(metadata_row.primary_category)
     price_ratio = 0.0
@@ -460,15 +577,6 @@ def _build_record(metadata_row, skin_profile: dict, author_id: str) -> dict:
 
     record.update(
         {
-            "author_id": author_id,
-            "skin_type": skin_profile.get("skin_type", "<unk>") or "<unk>",
-            "skin_tone": skin_profile.get("skin_tone", "<unk>") or "<unk>",
-            "eye_color": skin_profile.get("eye_color", "<unk>") or "<unk>",
-            "hair_color": skin_profile.get("hair_color", "<unk>") or "<unk>",
-            "interaction_recency_days": 0.0,
-            "user_total_interactions": 0.0,
-            "user_positive_rate": 0.0,
-            "user_avg_review_rating": 0.0,
             "product_total_interactions": metadata_row.reviews,
             "product_positive_rate": product_positive_rate,
             "product_avg_review_rating": metadata_row.rating,
@@ -480,12 +588,25 @@ def _build_record(metadata_row, skin_profile: dict, author_id: str) -> dict:
     return record
 
 
+def _build_user_record(skin_profile: dict, author_id: str) -> dict:
+    return {
+        "author_id": author_id,
+        "skin_type": skin_profile.get("skin_type", "<unk>") or "<unk>",
+        "skin_tone": skin_profile.get("skin_tone", "<unk>") or "<unk>",
+        "eye_color": skin_profile.get("eye_color", "<unk>") or "<unk>",
+        "hair_color": skin_profile.get("hair_color", "<unk>") or "<unk>",
+        "interaction_recency_days": 0.0,
+        "user_total_interactions": 0.0,
+        "user_positive_rate": 0.0,
+        "user_avg_review_rating": 0.0,
+    }
+
+
 def _allergy_safe(profile: dict, metadata_row) -> bool:
     allergy = (profile.get("allergy_info") or "").strip()
     if not allergy:
         return True
-    ingredients_text = " ".join(metadata_row.ingredients)
-    return allergy.lower() not in ingredients_text.lower()
+    return allergy.lower() not in metadata_row.ingredients_text
 
 
 def _maybe_update_user_profile(user: User | None, skin_profile_payload: dict) -> None:
@@ -510,64 +631,187 @@ def _maybe_update_user_profile(user: User | None, skin_profile_payload: dict) ->
         user.save(update_fields=list(set(fields_to_update)))
 
 
+def _result_cache_key(
+    request,
+    payload: dict,
+    skin_profile: dict,
+    config: RecommendationConfig,
+    limit: int,
+    author_id: str,
+) -> str:
+    terms, categories = _expand_search_terms(payload.get("search_query"))
+    profile = {key: value for key, value in skin_profile.items() if key != "save_profile"}
+    return RESULT_CACHE.make_key(
+        profile=profile,
+        terms=sorted(terms),
+        categories=sorted(categories),
+        allergy=(skin_profile.get("allergy_info") or "").strip().lower(),
+        author=_cache_author(author_id),
+        limit=limit,
+        config_version=config.version,
+        # Rankings scored before this worker picked up a catalog edit must not outlive it.
+        catalog_version=CONTENT_FILTER.index_version,
+        base_url=request.build_absolute_uri("/"),
+    )
+
+
+def _cache_author(author_id: str) -> str:
+    """Authors outside the DNN vocabulary all encode to <unk>, so they can share entries.
+
+    Until the encoder is loaded (by scoring, under the request budget) the raw id is used.
+    """
+    return DNN_SERVICE.known_value("author_id", author_id) or author_id
+
+
 def _ensure_admin(request) -> bool:
     email = _get_request_email(request)
     return get_user_role(email) == "admin"
 
 
-@api_view(["POST"])
-def personalized_search(request):
-    serializer = PersonalizedSearchRequestSerializer(data=request.data)
-    serializer.is_valid(raise_exception=True)
-    payload = serializer.validated_data
-    user = _resolve_user(payload.get("user_email"))
-    session_id = payload.get("session_id") or uuid.uuid4().hex
-    skin_profile = _derive_skin_profile(payload["skin_profile"], user)
-    config = RecommendationConfig.load()
-    system_limit = min(config.max_results, 10)
-    requested_limit = payload.get("limit") or system_limit
-    limit = max(1, min(requested_limit, system_limit))
-
-    author_id = skin_profile.get("legacy_author_id") or (
-        user.firebase_uid if user and user.firebase_uid else user.email if user else session_id
-    )
-
-    preferred_ids = CONTENT_FILTER.select_candidates(
-        payload.get("search_query"),
-        skin_profile,
-        allergy_term=payload["skin_profile"].get("allergy_info"),
-        limit=250,
-    )
+def _score_candidates(
+    payload: dict,
+    skin_profile: dict,
+    config: RecommendationConfig,
+    author_id: str,
+    budget: RequestBudget | None = None,
+) -> List[dict]:
+    """Run retrieval, scoring and business rules; entries come back sorted by final score.
+
+    With a ``budget`` the pipeline degrades instead of running late or failing: fewer
+    candidates when the observed model cost would overrun the deadline, no NCF when it
+    does not fit or fails, and a popularity ranking when the DNN cannot score in time.
+    Without one (offline precomputation) model errors propagate.
+    """
+    scoring_limit = MAX_SCORED_CANDIDATES
+    if budget is not None:
+        affordable = budget.affordable_rows(DNN_COST, scoring_limit)
+        if affordable < scoring_limit:
+            budget.degrade(LEVEL_REDUCED_CANDIDATES)
+            scoring_limit = max(affordable, MIN_SCORED_ROWS)
+    # Over-fetch so allergy and category filtering still leave enough rows to score.
+    retrieval_limit = scoring_limit + 50
+
+    with stage("content_filter"):
+        preferred_ids = CONTENT_FILTER.select_candidates(
+            payload.get("search_query"),
+            skin_profile,
+            allergy_term=skin_profile.get("allergy_info"),
+            limit=retrieval_limit,
+        )
+    legacy_author_id = skin_profile.get("legacy_author_id")
+    if legacy_author_id and NCF_RETRIEVAL_K > 0:
+        with stage("embedding_retrieval"):
+            embedding_ids = _embedding_candidates(legacy_author_id, NCF_RETRIEVAL_K, budget)
+        record_count("embedding_candidates", len(embedding_ids))
+        preferred_ids = _merge_candidate_ids(
+            preferred_ids, embedding_ids, interleave=not payload.get("search_query"), limit=retrieval_limit
+        )
 
     candidates: List[dict] = []
-    products, category_terms = _candidate_queryset(
-        payload.get("search_query"),
-        preferred_ids=preferred_ids,
-    )
-    category_filters = {term.lower() for term in category_terms}
-
-    for product in products:
-        metadata_row = _metadata_for_product(product)
-        if not metadata_row:
-            continue
-        if not _allergy_safe(payload["skin_profile"], metadata_row):
-            continue
-        if category_filters and not _category_allows(metadata_row, product, category_filters):
-            continue
-        candidates.append(
-            {
-                "product": product,
-                "metadata": metadata_row,
-                "record": _build_record(metadata_row, skin_profile, author_id),
-            }
+    with stage("candidate_query"):
+        products, category_terms = _candidate_queryset(
+            payload.get("search_query"),
+            preferred_ids=preferred_ids,
+            limit=retrieval_limit,
         )
-        if len(candidates) >= 200:
-            break
+    category_filters = {term.lower() for term in category_terms}
+    record_count("candidates_considered", len(products))
+
+    with stage("metadata"):
+        for product, metadata_row in zip(products, _metadata_rows(products)):
+            if not metadata_row:
+                continue
+            if not _allergy_safe(skin_profile, metadata_row):
+                continue
+            if category_filters and not _category_allows(metadata_row, product, category_filters):
+                continue
+            candidates.append(
+                {
+                    "product": product,
+                    "metadata": metadata_row,
+                    "record": _build_product_record(metadata_row),
+                }
+            )
+            if len(candidates) >= scoring_limit:
+                break
 
     if not candidates:
-        return Response({"results": [], "personalized": False}, status=status.HTTP_200_OK)
+        record_count("candidates_scored", 0)
+        return []
+
+    if budget is not None:
+        # Re-check with the time retrieval actually took.
+        affordable = budget.affordable_rows(DNN_COST, len(candidates))
+        if affordable < min(MIN_SCORED_ROWS, len(candidates)):
+            budget.degrade(LEVEL_POPULARITY)
+        elif affordable < len(candidates):
+            budget.degrade(LEVEL_REDUCED_CANDIDATES)
+            candidates = candidates[:affordable]
+    record_count("candidates_scored", len(candidates))
+
+    dnn_scores = None
+    if budget is None or budget.level != LEVEL_POPULARITY:
+        dnn_scores = _dnn_scores(skin_profile, author_id, candidates, budget)
+    if dnn_scores is None:
+        entries = _popularity_entries(candidates)
+    else:
+        if legacy_author_id:
+            ncf_scores = _ncf_scores(legacy_author_id, candidates, budget)
+        else:
+            ncf_scores = [None] * len(candidates)
+        entries = []
+        for candidate, dnn_score, ncf_score in zip(candidates, dnn_scores, ncf_scores):
+            final_score = _blend_scores(dnn_score, ncf_score, config)
+            entries.append(
+                {
+                    "product": candidate["product"],
+                    "metadata": candidate["metadata"],
+                    "scores": {
+                        "dnn": round(dnn_score, 4),
+                        "ncf": round(ncf_score, 4) if ncf_score is not None else None,
+                        "final": round(final_score, 4),
+                    },
+                    "final_score": final_score,
+                }
+            )
 
-    dnn_scores = DNN_SERVICE.score_records([c["record"] for c in candidates])
+    if not entries:
+        return []
+
+    with stage("business_rules"):
+        _apply_business_rules(entries, skin_profile)
+        entries.sort(key=lambda item: item["final_score"], reverse=True)
+    return entries
+
+
+def _dnn_scores(
+    skin_profile: dict,
+    author_id: str,
+    candidates: List[dict],
+    budget: RequestBudget | None,
+) -> List[float] | None:
+    """DNN scores for the candidates; None (popularity fallback) when the model is unavailable."""
+    warm = DNN_SERVICE.is_loaded
+    started = time.perf_counter()
+    try:
+        dnn_scores = DNN_SERVICE.score_candidates(
+            _build_user_record(skin_profile, author_id),
+            [c["record"] for c in candidates],
+        )
+    except Exception as exc:
+        if budget is None:
+            raise
+        # An open breaker already logged the original failure.
+        LOGGER.warning(
+            "DNN scoring unavailable, falling back to popularity ranking: %s",
+            exc,
+            exc_info=not isinstance(exc, CircuitOpenError),
+        )
+        budget.degrade(LEVEL_POPULARITY)
+        return None
+    if warm:
+        # The first call includes loading the model, which says nothing about per-row cost.
+        DNN_COST.observe(len(candidates), (time.perf_counter() - started) * 1000.0)
     if dnn_scores:
         LOGGER.info(
             "DNN scores sample count=%s min=%.4f max=%.4f first_ten=%s",
@@ -576,106 +820,297 @@ def personalized_search(request):
             max(dnn_scores),
             [round(score, 4) for score in dnn_scores[:10]],
         )
-    legacy_author_id = skin_profile.get("legacy_author_id")
+    return dnn_scores
+
+
+def _ncf_scores(legacy_author_id: str, candidates: List[dict], budget: RequestBudget | None) -> List[float | None]:
+    """NCF scores for the candidates; all None when NCF is skipped for time or unavailable."""
+    skipped = [None] * len(candidates)
+    if budget is not None and not budget.can_afford(NCF_COST, len(candidates)):
+        budget.degrade(LEVEL_NO_NCF)
+        return skipped
+    warm = NCF_SERVICE.is_loaded
+    started = time.perf_counter()
+    try:
+        with stage("ncf"):
+            ncf_scores = NCF_SERVICE.score_many(
+                legacy_author_id, [c["metadata"].product_id for c in candidates]
+            )
+    except Exception as exc:
+        if budget is None:
+            raise
+        # An open breaker already logged the original failure.
+        LOGGER.warning(
+            "NCF scoring unavailable, ranking with the DNN only: %s",
+            exc,
+            exc_info=not isinstance(exc, CircuitOpenError),
+        )
+        budget.degrade(LEVEL_NO_NCF)
+        return skipped
+    if warm:
+        NCF_COST.observe(len(candidates), (time.perf_counter() - started) * 1000.0)
+    return ncf_scores
+
+
+def _popularity_entries(candidates: List[dict]) -> List[dict]:
+    """Rank candidates by the precomputed popularity score instead of the models."""
     entries: List[dict] = []
+    for candidate in candidates:
+        score = POPULARITY.score(candidate["product"].productid)
+        entries.append(
+            {
+                "product": candidate["product"],
+                "metadata": candidate["metadata"],
+                "scores": {"dnn": None, "ncf": None, "popularity": round(score, 4), "final": round(score, 4)},
+                "final_score": score,
+            }
+        )
+    return entries
 
-    for candidate, dnn_score in zip(candidates, dnn_scores):
-        product = candidate["product"]
-        metadata_row = candidate["metadata"]
-        ncf_score = NCF_SERVICE.score(legacy_author_id, metadata_row.product_id) if legacy_author_id else None
-        final_score = _blend_scores(dnn_score, ncf_score, config)
+
+def _rank_entries(entries: List[dict], limit: int) -> List[dict]:
+    """Match percentage and ranking for the top ``limit`` entries, with statistics over all of them."""
+    raw_scores = [entry["final_score"] for entry in entries]
+    # Score statistics span every candidate; per-entry work below only touches the top-k.
+    min_raw = min(raw_scores)
+    max_raw = max(raw_scores)
+    thresholds = _quantile_thresholds(raw_scores)
+    scores_array = np.array(raw_scores)
+    mean_raw = float(scores_array.mean())
+    std_raw = float(scores_array.std())
+    if std_raw < 1e-6:
+        std_raw = 1e-6
+
+    ranked: List[dict] = []
+    for entry in entries[:limit]:
+        score = entry["final_score"]
+        ranked.append(
+            {
+                "product": entry["product"],
+                "metadata": entry["metadata"],
+                "scores": entry["scores"],
+                "match_percentage": _display_match_percentage(score, min_raw, max_raw),
+                "ranking": {
+                    "bucket_label": _quantile_label(score, thresholds),
+                    "z_score": round((score - mean_raw) / std_raw, 2),
+                    "diff_percent": round(((score - mean_raw) / max(mean_raw, 1e-6)) * 100.0, 1),
+                },
+            }
+        )
+    return ranked
+
+
+def _present_entries(request, ranked: List[dict], skin_profile: dict) -> Tuple[List[dict], List[dict]]:
+    """Reasons and serialized products for ranked entries; return (results, log summary)."""
+    results: List[dict] = []
+    summary: List[dict] = []
+    for entry in ranked:
+        product = entry["product"]
+        metadata_row = entry["metadata"]
+        ranking = entry["ranking"]
         reasons = REASON_BUILDER.build_reasons(
             product_metadata={
                 "highlights": metadata_row.highlights,
-                "ingredients_text": " ".join(metadata_row.ingredients),
+                "ingredients_text": metadata_row.ingredients_text,
                 "skin_types": product.skin_types or "",
             },
             skin_profile=skin_profile,
             similar_user_count=metadata_row.reviews,
             allergy_match=True,
         )
-        entries.append(
+        results.append(
             {
-                "product": product,
-                "metadata": metadata_row,
+                "product": ProductSerializer(product, context={"request": request}).data,
+                "match_percentage": entry["match_percentage"],
                 "reasons": reasons,
-                "scores": {
-                    "dnn": round(dnn_score, 4),
-                    "ncf": round(ncf_score, 4) if ncf_score is not None else None,
-                    "final": round(final_score, 4),
-                },
-                "final_score": final_score,
+                "scores": entry["scores"],
+                "ranking": ranking,
             }
         )
-
+        summary.append(
+            {
+                "product_id": product.productid,
+                "score": entry["scores"]["final"],
+                "ranking": ranking,
+            }
+        )
+    return results, summary
+
+
+def _rank_candidates(
+    request,
+    payload: dict,
+    skin_profile: dict,
+    config: RecommendationConfig,
+    limit: int,
+    author_id: str,
+    budget: RequestBudget | None = None,
+) -> Tuple[List[dict], List[dict]]:
+    """Score online; return (results, log summary)."""
+    entries = _score_candidates(payload, skin_profile, config, author_id, budget)
     if not entries:
-        return Response({"results": [], "personalized": False}, status=status.HTTP_200_OK)
+        return [], []
+    with stage("serialization"):
+        return _present_entries(request, _rank_entries(entries, limit), skin_profile)
 
-    _apply_business_rules(entries, skin_profile)
 
-    entries.sort(key=lambda item: item["final_score"], reverse=True)
-    raw_scores = [entry["final_score"] for entry in entries]
+def _author_id(skin_profile: dict, user: User | None, session_id: str | None = None) -> str | None:
+    return skin_profile.get("legacy_author_id") or (
+        user.firebase_uid if user and user.firebase_uid else user.email if user else session_id
+    )
 
-    if raw_scores:
-        min_raw = min(raw_scores)
-        max_raw = max(raw_scores)
-        thresholds = _quantile_thresholds(raw_scores)
-        scores_array = np.array(raw_scores)
-        mean_raw = float(scores_array.mean())
-        std_raw = float(scores_array.std())
-        if std_raw < 1e-6:
-            std_raw = 1e-6
-        for entry, score in zip(entries, raw_scores):
-            entry["match_percentage"] = _display_match_percentage(score, min_raw, max_raw)
-            z_score = (score - mean_raw) / std_raw
-            diff_percent = ((score - mean_raw) / max(mean_raw, 1e-6)) * 100.0
-            entry["ranking"] = {
-                "bucket_label": _quantile_label(score, thresholds),
-                "z_score": round(z_score, 2),
-                "diff_percent": round(diff_percent, 1),
-            }
 
-    limited_entries = entries[:limit]
+def precompute_ranking(
+    user: User,
+    config: RecommendationConfig,
+    top_n: int,
+    legacy_author_id: str | None = None,
+) -> Tuple[dict, str, List[dict]]:
+    """No-query ranking for a user's saved profile, as stored by ``precompute_recommendations``.
+
+    Returns (skin profile, profile fingerprint, entries); the fingerprint matches what
+    ``personalized_search`` computes when the user searches without a query or profile
+    fields of their own. ``legacy_author_id`` is the user's MlEntityMap link, if known.
+    """
+    skin_profile = _resolve_skin_profile({}, user, legacy_author_id)
+    author_id = _author_id(skin_profile, user)
+    payload = {"search_query": "", "skin_profile": skin_profile}
+    fingerprint = _ranking_fingerprint(skin_profile, author_id)
+    entries = _score_candidates(payload, skin_profile, config, author_id)
+    ranked = _rank_entries(entries, top_n) if entries else []
+    stored = [
+        {
+            "product_id": entry["product"].productid,
+            "scores": entry["scores"],
+            "match_percentage": entry["match_percentage"],
+            "ranking": entry["ranking"],
+        }
+        for entry in ranked
+    ]
+    return skin_profile, fingerprint, stored
+
+
+def _precomputed_results(
+    request,
+    user: User | None,
+    payload: dict,
+    skin_profile: dict,
+    config: RecommendationConfig,
+    limit: int,
+    author_id: str,
+) -> Tuple[List[dict], List[dict]] | None:
+    """Serve a signed-in user's nightly ranking when there is no query; None means score online."""
+    if user is None or payload.get("search_query"):
+        return None
+    fingerprint = _ranking_fingerprint(skin_profile, author_id)
+    stored = PRECOMPUTED_STORE.lookup(user.pk, fingerprint, config, limit)
+    if not stored:
+        return None
+    product_ids = [item["product_id"] for item in stored]
+    products = {
+        product.productid: product
+        for product in _product_queryset().filter(productid__in=product_ids, stock__gt=0)
+    }
+    ordered = [products.get(product_id) for product_id in product_ids]
+    if None in ordered:
+        PRECOMPUTED_STORE.record("unavailable")
+        return None
+    ranked: List[dict] = []
+    for item, product, metadata_row in zip(stored, ordered, _metadata_rows(ordered)):
+        if metadata_row is None:
+            PRECOMPUTED_STORE.record("unavailable")
+            return None
+        ranked.append({**item, "product": product, "metadata": metadata_row})
+    PRECOMPUTED_STORE.record("hits")
+    return _present_entries(request, ranked, skin_profile)
+
 
-    results: List[dict] = []
-    for entry in limited_entries:
-        product_payload = ProductSerializer(entry["product"], context={"request": request}).data
-        results.append(
-            {
-                "product": product_payload,
-                "match_percentage": entry.get("match_percentage", round(entry["final_score"] * 100, 1)),
-                "reasons": entry["reasons"],
-                "scores": entry["scores"],
-                "ranking": entry.get("ranking"),
-            }
-        )
+@api_view(["POST"])
+def personalized_search(request):
+    with track_request() as timings:
+        response = _personalized_search(request)
+    PIPELINE_METRICS.observe(timings)
+    LOGGER.debug("personalized_search timings %s", timings.as_dict())
+    if SERVER_TIMING_HEADER:
+        response["Server-Timing"] = timings.server_timing()
+    return response
+
+
+def _personalized_search(request) -> Response:
+    budget = RequestBudget(DEADLINE_MS, DEADLINE_RESERVE_MS)
+    response = _personalized_response(request, budget)
+    level = budget.level
+    DEGRADATION_STATS.observe(level)
+    record_count("degradation_level", LEVELS.index(level))
+    response.data["degradation"] = budget.as_dict()
+    return response
+
+
+def _personalized_response(request, budget: RequestBudget) -> Response:
+    serializer = PersonalizedSearchRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    payload = serializer.validated_data
+    with stage("profile"):
+        user = _resolve_user(payload.get("user_email"))
+        skin_profile = _resolve_skin_profile(payload["skin_profile"], user)
+    session_id = payload.get("session_id") or uuid.uuid4().hex
+    config = CONFIG_CACHE.get()
+    system_limit = min(config.max_results, 10)
+    requested_limit = payload.get("limit") or system_limit
+    limit = max(1, min(requested_limit, system_limit))
 
-    PersonalizedSearchLog.objects.create(
-        session_id=session_id,
-        user=user,
-        search_query=payload.get("search_query", ""),
-        skin_profile=skin_profile,
-        response_summary={
-            "results": [
-                {
-                    "product_id": entry["product"].productid,
-                    "score": entry["scores"]["final"],
-                    "ranking": entry.get("ranking"),
-                }
-                for entry in limited_entries
-            ],
-            "search_query": payload.get("search_query", ""),
-        },
-    )
+    author_id = _author_id(skin_profile, user, session_id)
 
-    _maybe_update_user_profile(user, payload["skin_profile"])
+    with stage("result_cache"):
+        cache_key = _result_cache_key(request, payload, skin_profile, config, limit, author_id)
+        cached = RESULT_CACHE.get(cache_key)
+    record_count("result_cache_hit", int(cached is not None))
+    if cached is not None:
+        results, summary = cached
+    else:
+        index_built = CONTENT_FILTER.index is not None
+        with stage("precomputed"):
+            precomputed = _precomputed_results(request, user, payload, skin_profile, config, limit, author_id)
+        record_count("precomputed_hit", int(precomputed is not None))
+        if precomputed is not None:
+            results, summary = precomputed
+        else:
+            results, summary = _rank_candidates(request, payload, skin_profile, config, limit, author_id, budget)
+        if not results:
+            return Response({"results": [], "personalized": False}, status=status.HTTP_200_OK)
+        # Degraded rankings, and those retrieved before the first content index build, are not
+        # cached, so the next request gets a chance at the full one.
+        if budget.level == LEVEL_FULL and index_built:
+            RESULT_CACHE.set(cache_key, (results, summary))
+
+    with stage("log_write"):
+        SEARCH_LOG_WRITER.submit(
+            PersonalizedSearchLog(
+                session_id=session_id,
+                user=user,
+                search_query=payload.get("search_query", ""),
+                skin_profile=skin_profile,
+                response_summary={
+                    "results": summary,
+                    "search_query": payload.get("search_query", ""),
+                    "degradation": budget.level,
+                },
+            ),
+            after=partial(_maybe_update_user_profile, user, payload["skin_profile"]),
+        )
 
+    personalized = budget.level != LEVEL_POPULARITY
     response = {
         "session_id": session_id,
-        "personalized": True,
+        "personalized": personalized,
         "results": results,
         "explanation": {
-            "summary": "Kết quả dựa trên thông tin da và từ khóa bạn cung cấp",
+            "summary": (
+                "Kết quả dựa trên thông tin da và từ khóa bạn cung cấp"
+                if personalized
+                else "Hệ thống gợi ý đang bận, "
+                "kết quả được xếp theo độ phổ biến của sản phẩm"
+            ),
             "factors": {
                 "skin_type": skin_profile.get("skin_type"),
                 "concerns": skin_profile.get("skin_concerns"),
@@ -703,11 +1138,8 @@ def submit_personalized_feedback(request):
     payload = serializer.validated_data
     session_id = payload["session_id"]
 
-    log = (
-        PersonalizedSearchLog.objects.filter(session_id=session_id)
-        .order_by("-created_at")
-        .first()
-    )
+    # The search log may still be sitting in a write-behind queue (this worker's or another's).
+    log = SEARCH_LOG_WRITER.find_log(session_id)
     if not log:
         return Response(
             {"message": "Không tìm thấy phiên gợi ý để ghi nhận phản hồi."},
@@ -795,13 +1227,15 @@ def personalized_feedback_summary(request):
 
 @api_view(["GET", "PUT"])
 def recommendation_config_view(request):
-    config = RecommendationConfig.load()
     if request.method == "GET":
-        return Response(config.as_dict(), status=status.HTTP_200_OK)
+        return Response(CONFIG_CACHE.get().as_dict(), status=status.HTTP_200_OK)
 
     if not _ensure_admin(request):
         return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
+    # Edit a fresh row; the cached instance is shared with in-flight searches.
+    config = RecommendationConfig.load()
+
     try:
         dnn_weight = float(request.data.get("dnn_weight", config.dnn_weight))
         ncf_weight = float(request.data.get("ncf_weight", config.ncf_weight))
@@ -821,3 +1255,55 @@ def recommendation_config_view(request):
     config.save()
     return Response(config.as_dict(), status=status.HTTP_200_OK)
 
+
+@api_view(["GET"])
+def recommendation_runtime_stats(request):
+    if not _ensure_admin(request):
+        return Response({"detail": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    return Response(
+        {
+            "result_cache": RESULT_CACHE.stats(),
+            "search_log": SEARCH_LOG_WRITER.stats(),
+            "precomputed": PRECOMPUTED_STORE.stats(),
+            "dnn_batcher": DNN_SERVICE.batcher_stats(),
+            "dnn_two_tower": DNN_SERVICE.tower_stats(),
+            "degradation": DEGRADATION_STATS.snapshot(),
+            "circuit_breakers": _circuit_breaker_stats(),
+            "inference_server": _inference_server_status(),
+            "model_registry": MODEL_SWAPPER.stats() if MODEL_SWAPPER is not None else None,
+            "pipeline": PIPELINE_METRICS.snapshot(),
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def _circuit_breaker_stats():
+    breakers = [DNN_SERVICE.load_breaker, NCF_SERVICE.load_breaker]
+    if INFERENCE_CLIENT is not None:
+        breakers.append(INFERENCE_CLIENT.breaker)
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+def _inference_server_status():
+    if INFERENCE_CLIENT is None:
+        return None
+    try:
+        return INFERENCE_CLIENT.status()
+    except InferenceServerError as exc:
+        return {"error": str(exc)}
+
+
+@api_view(["GET"])
+def recommendation_health(request):
+    """Readiness probe: 503 while this worker is still warming its models.
+
+    A failed warm-up reports ``"degraded"`` with 200: the worker can still answer with
+    degraded (e.g. popularity) rankings and retries the failed component on use, so the
+    load balancer must not take it out of rotation for good.
+    """
+    payload = WARMUP.status()
+    payload["models"] = {"dnn": DNN_SERVICE.is_loaded, "ncf": NCF_SERVICE.is_loaded}
+    payload["content_index"] = CONTENT_FILTER.index is not None
+    warming = payload["status"] == "warming"
+    http_status = status.HTTP_503_SERVICE_UNAVAILABLE if warming else status.HTTP_200_OK
+    return Response(payload, status=http_status)
@@ -186,4 +186,64 @@ ML_ARTIFACTS = {
     "DNN_DIR": PROJECT_ROOT / "Model_AI_Sephora_DNN" / "artifacts",
     "PRODUCT_CSV": PROJECT_ROOT / "Model_AI_Sephora_DNN" / "data" / "product_info.csv",
     "NCF_DIR": PROJECT_ROOT / "Model_AI_Sephora_NCF" / "artifacts" / "ncf",
+    # Model runtime: "eager", "optimized" (traced + frozen) or "optimized_int8" (plus int8 Linear layers).
+    # Check the trained artifacts with manage.py check_inference_runtime before switching.
+    "INFERENCE_RUNTIME": "eager",
+    # Prefer the memory-mapped export (manage.py export_mmap_artifacts) so workers share model pages.
+    "MMAP_ARTIFACTS": True,
+    # Load both models and the content index in background threads when a serving worker starts.
+    "WARMUP_ON_STARTUP": True,
+    # Seconds between background rebuilds of the content-filter index (0 = build once).
+    "CONTENT_INDEX_REFRESH_SECONDS": 900,
+    # Relative IDF drift tolerated from incremental updates before a full rebuild.
+    "CONTENT_INDEX_MAX_IDF_DRIFT": 0.05,
+    # Personalized search result cache: in-process LRU, optionally shared through CACHES.
+    "RESULT_CACHE_MAX_ENTRIES": 512,
+    "RESULT_CACHE_TTL_SECONDS": 300,
+    "RESULT_CACHE_SHARED": False,
+    # Seconds a worker trusts its copy of the result cache version (bumped in the database on
+    # catalog/config changes) before re-reading it.
+    "RESULT_CACHE_VERSION_TTL_SECONDS": 2,
+    # Write-behind queue for personalized search logs (False = write inline).
+    "SEARCH_LOG_ASYNC": True,
+    "SEARCH_LOG_QUEUE_SIZE": 2000,
+    "SEARCH_LOG_BATCH_SIZE": 50,
+    "SEARCH_LOG_FLUSH_MS": 200,
+    # Seconds a worker trusts its in-memory RecommendationConfig before re-checking the version.
+    "RECOMMENDATION_CONFIG_TTL_SECONDS": 5,
+    # Serve no-query searches of signed-in users from manage.py precompute_recommendations output.
+    "PRECOMPUTED_RECOMMENDATIONS": True,
+    # Hours before a precomputed ranking is considered stale and scored online instead.
+    "PRECOMPUTED_MAX_AGE_HOURS": 26,
+    # Coalesce concurrent DNN forward passes arriving within this window (0 = one pass per request).
+    "DNN_BATCH_WINDOW_MS": 0,
+    # Upper bound on rows in one coalesced DNN batch.
+    "DNN_BATCH_MAX_ROWS": 1024,
+    # Items retrieved from NCF embeddings for users with a legacy author id (0 = content retrieval only).
+    "NCF_RETRIEVAL_K": 100,
+    # Inverted lists probed per query once the item catalog is large enough for an IVF index.
+    "NCF_RETRIEVAL_N_PROBE": 8,
+    # Add a Server-Timing header with per-stage durations to personalized search responses.
+    "SERVER_TIMING_HEADER": False,
+    # Unix socket of manage.py run_inference_server; when set, web workers keep only the feature
+    # encoder and send model scoring there ("" = load and run both models in every worker).
+    "INFERENCE_SERVER_SOCKET": "",
+    "INFERENCE_SERVER_TIMEOUT_SECONDS": 2.0,
+    # Window in which the inference server coalesces DNN requests from all workers.
+    "INFERENCE_SERVER_BATCH_WINDOW_MS": 2.0,
+    # Latency budget of personalized search; when the observed model cost would overrun it the
+    # request scores fewer candidates, skips NCF or ranks by popularity (0 = no deadline).
+    "RECOMMENDATION_DEADLINE_MS": 150,
+    # Part of the budget kept for business rules, serialization and logging.
+    "RECOMMENDATION_DEADLINE_RESERVE_MS": 20,
+    # Seconds between refreshes of the popularity fallback ranking.
+    "POPULARITY_REFRESH_SECONDS": 600,
+    # Consecutive model load (or inference server) failures before failing fast, and for how long.
+    "MODEL_BREAKER_FAILURES": 2,
+    "MODEL_BREAKER_RESET_SECONDS": 30,
+    # Versioned artifacts managed with manage.py model_registry; when set, DNN_DIR/NCF_DIR are
+    # only used for models without an active version ("" = fixed directories, no hot swap).
+    "MODEL_REGISTRY_DIR": "",
+    # Seconds between checks of the registry's active-version pointers.
+    "MODEL_REGISTRY_POLL_SECONDS": 10,
 }